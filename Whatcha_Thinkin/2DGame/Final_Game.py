@@ -4,7 +4,7 @@ import random
 import math
 
 from scripts.entities import PhysicsEntity, Player
-from scripts.utilities import load_image, load_picture, Animation
+from scripts.utilities import load_image, load_picture, AnimationData
 from scripts.tilemap import Tilemap
 from scripts.particles import Particle
 
@@ -30,21 +30,21 @@ class Game:
             'background1': load_image('layer_backgrounds/background_layer_1.png'),
             'background2': load_image('layer_backgrounds/background_layer_2.png'),
             'background3': load_image('layer_backgrounds/background_layer_3.png'),
-            'particles1/leaf': Animation(load_picture('particles1/leaf'), img_dur=20,loop=False),
-            'player/idle': Animation(
+            'particles1/leaf': AnimationData(load_picture('particles1/leaf'), img_dur=20,loop=False),
+            'player/idle': AnimationData(
                 [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/IDLETESTING1')],
                 img_dur=6
             ),
-            'player/jump': Animation(
+            'player/jump': AnimationData(
                 [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/JUMP')]
             ),
-            'player/run': Animation(
+            'player/run': AnimationData(
                 [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/RUNNING')]
             ),
-            'player/fall': Animation(
+            'player/fall': AnimationData(
                 [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/FALL')]
             ),
-            'player/wall_slide': Animation(
+            'player/wall_slide': AnimationData(
                 [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/WALLSLIDE')]
             ),
         }
@@ -1,8 +1,10 @@
+import os
 import sys
 import pygame as pg
 
-from scripts.utilities import load_picture, Animation
+from scripts.assets import load_assets
 from scripts.tilemap import Tilemap
+from scripts.edit_log import EditLog
 
 RENDER_SCALE = 2.0
 
@@ -16,22 +18,23 @@ class Editor:
 
         self.clock = pg.time.Clock()
         
-        self.assets = {
-            'decor': load_picture('tiles/decor'),
-            'grass': load_picture('tiles/grass'),
-            'large_decor': load_picture('tiles/large_decor'),
-            'stone': load_picture('tiles/stone'),
-        }
+        #Only the tiles atlas is read, the same bake the game uses
+        self.assets = load_assets(['decor', 'grass', 'large_decor', 'stone'])
         
         self.movement = [False, False, False, False]
         
         self.tilemap = Tilemap(self, tile_size=16)
         
+        #Edits are saved back in the format the map was loaded from
+        self.map_path = 'map.lvl' if os.path.exists('map.lvl') else 'map.json'
         try:
-            self.tilemap.load('map.json')
+            self.tilemap.load(self.map_path)
         except FileNotFoundError:
             pass
         
+        #Undo/redo (ctrl+z, ctrl+y) and saving only what changed (O), see scripts/edit_log.py
+        self.edits = EditLog(self.tilemap, self.map_path)
+        
         self.scroll = [0, 0]
         
         self.tile_list = list(self.assets)
@@ -42,6 +45,7 @@ class Editor:
         self.right_clicking = False
         self.shift = False
         self.ongrid = True
+        self.live_autotile = False #L toggles, painting and erasing then fix up the variants around the cursor
         
     def run(self):
         while True:
@@ -51,6 +55,7 @@ class Editor:
             self.scroll[1] += (self.movement[3] - self.movement[2]) * 2
             render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
             
+            self.tilemap.stream((render_scroll[0], render_scroll[1], self.display.get_width(), self.display.get_height()))
             self.tilemap.render(self.display, offset=render_scroll)
             
             current_tile_img = self.assets[self.tile_list[self.tile_group]][self.tile_variant].copy()
@@ -67,17 +72,11 @@ class Editor:
                 self.display.blit(current_tile_img, mpos)
             
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': self.tile_list[self.tile_group], 
-                                                                                   'variant': self.tile_variant, 'pos': tile_pos}
+                self.edits.set_tile(tile_pos, self.tile_list[self.tile_group], self.tile_variant, autotile=self.live_autotile)
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy():
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pg.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                self.edits.remove_tile(tile_pos, autotile=self.live_autotile)
+                for tile in self.tilemap.offgrid_at((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])):
+                    self.edits.remove_offgrid(tile)
             
             self.display.blit(current_tile_img, (5, 5))
             
@@ -87,10 +86,12 @@ class Editor:
                     sys.exit()
                     
                 if event.type == pg.MOUSEBUTTONDOWN:
+                    if event.button in (1, 3):
+                        self.edits.begin()
                     if event.button == 1:
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 
+                            self.edits.add_offgrid({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 
                             'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
                     if event.button == 3:
                         self.right_clicking = True
@@ -111,6 +112,8 @@ class Editor:
                         self.clicking = False
                     if event.button == 3:
                         self.right_clicking = False
+                    if not self.clicking and not self.right_clicking:
+                        self.edits.end()
                         
                 if event.type == pg.KEYDOWN:
                     if event.key == pg.K_a:
@@ -124,9 +127,15 @@ class Editor:
                     if event.key == pg.K_g:
                         self.ongrid = not self.ongrid
                     if event.key == pg.K_t:
-                        self.tilemap.autotile()
+                        self.edits.autotile()
+                    if event.key == pg.K_l:
+                        self.live_autotile = not self.live_autotile
                     if event.key == pg.K_o:
-                        self.tilemap.save('map.json')
+                        self.edits.save()
+                    if event.key == pg.K_z and event.mod & pg.KMOD_CTRL:
+                        self.edits.undo()
+                    if event.key == pg.K_y and event.mod & pg.KMOD_CTRL:
+                        self.edits.redo()
                     if event.key == pg.K_LSHIFT:
                         self.shift = True
                 if event.type == pg.KEYUP:
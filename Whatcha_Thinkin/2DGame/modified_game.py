@@ -4,19 +4,35 @@ import random
 import math
 import time
 import os
+import argparse
 
 from scripts.entities import PhysicsEntity, Player
-from scripts.utilities import load_image, load_picture, Animation
+from scripts.utilities import present, AnimationData
+from scripts.assets import load_assets
 from scripts.tilemap import Tilemap
-from scripts.particles import Particle
+from scripts.particles import ParticleSystem
+from scripts.collision import CollisionWorld
+from scripts.background import ParallaxBackground
+from scripts.hud import HUD
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 #Import the shared data bridge
 from shared_data import EEGDataBridge
+from latency import LatencyTracker
+
+#Physics runs in fixed steps of SIM_DT no matter how fast frames are drawn, the tuning values
+#(gravity 0.1, air resistance, speeds) are per step, so the game plays the same at any frame rate
+SIM_DT = 1 / 60
+MAX_FRAME_TIME = 0.25  #a longer stall is not caught up, or the catch-up itself would stall the next frame
+
+BACKGROUND_PARALLAX = (0, 0.1, 0.25)  #per background layer, far to near, 0 keeps a layer still
+INTEGER_SCALE = False                 #True keeps pixels square when the window isn't a whole multiple of the display
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False):
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
         pg.init()
 
         pg.display.set_caption('EEG Controlled 2D Scroller')
@@ -34,163 +50,266 @@ class Game:
         self.beta_threshold = 400     #For movement
         self.gamma_threshold = 400    #For jumping
         
+        #Per-electrode weights for multi-channel boards, None keeps the processor's plain average
+        self.channel_weights = None
+        
         #Control mode
         self.use_eeg_control = True
-        self.last_jump_time = 0
+        self.last_jump_time = -math.inf
         self.jump_cooldown = 1.0  
+        
+        #Fixed timestep state, sim_time is what the jump cooldown counts in
+        self.sim_time = 0.0
+        self.accumulator = 0.0
+        self.eeg_source = None  #callable(sim_time) -> (beta, gamma) replacing the bridge, for headless tuning
 
-        self.assets = {
-            'decor': load_picture('tiles/decor'),
-            'grass': load_picture('tiles/grass'),
-            'large_decor': load_picture('tiles/large_decor'),
-            'stone': load_picture('tiles/stone'),
-            'player': pg.transform.scale(load_image('entities/IDLETESTING.png'), (16, 16)),
-            'background1': load_image('layer_backgrounds/background_layer_1.png'),
-            'background2': load_image('layer_backgrounds/background_layer_2.png'),
-            'background3': load_image('layer_backgrounds/background_layer_3.png'),
-            'particles1/leaf': Animation(load_picture('particles1/leaf'), img_dur=20, loop=False),
-            'player/idle': Animation(
-                [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/IDLETESTING1')],
-                img_dur=6
-            ),
-            'player/jump': Animation(
-                [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/JUMP')]
-            ),
-            'player/run': Animation(
-                [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/RUNNING')]
-            ),
-            'player/fall': Animation(
-                [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/FALL')]
-            ),
-            'player/wall_slide': Animation(
-                [pg.transform.scale(img, (16, 16)) for img in load_picture('entities/Knight/120x80_PNGSheets/WALLSLIDE')]
-            ),
-        }
+        #The bridge is read once per frame into this snapshot, process_eeg_input and the HUD both use it
+        self.eeg_state = {'beta_power': 0.0, 'gamma_power': 0.0, 'is_eeg_running': False}
+        
+        #Sample to movement latency, F3 shows it on screen, GAME_LATENCY_STATS names a json file for it
+        self.latency = LatencyTracker(stats_file=os.environ.get('GAME_LATENCY_STATS'))
+        self.show_latency = False
+        self.last_sample_time = 0.0
+        self.pending_sample_time = None  #sample stamp of fresh EEG data not yet applied to the player
+
+        #Frames come already scaled out of the baked atlases (scripts/assets.py), the editor shares them
+        self.assets = load_assets()
+        self.assets.update({
+            'particles1/leaf': AnimationData(self.assets['particles1/leaf'], img_dur=20, loop=False),
+            'player/idle': AnimationData(self.assets['player/idle'], img_dur=6),
+            'player/jump': AnimationData(self.assets['player/jump']),
+            'player/run': AnimationData(self.assets['player/run']),
+            'player/fall': AnimationData(self.assets['player/fall']),
+            'player/wall_slide': AnimationData(self.assets['player/wall_slide']),
+        })
+
+        self.background = ParallaxBackground([self.assets['background1'], self.assets['background2'], self.assets['background3']],
+                                             self.display.get_size(), BACKGROUND_PARALLAX)
 
         self.player = Player(self, (50, 50), (8, 15))
 
+        #Entity vs entity broad phase, enemies and projectiles get added here too
+        self.collisions = CollisionWorld()
+        self.collisions.add(self.player)
+
         self.tilemap = Tilemap(self, tile_size=16)
-        self.tilemap.load('map.json')
+        #A converted map.lvl streams in around the camera, otherwise the whole map.json is loaded
+        self.tilemap.load('map.lvl' if os.path.exists('map.lvl') else 'map.json')
 
         self.leaf_spawners = []
         for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
             self.leaf_spawners.append(pg.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
 
-        self.particles = []
+        #Leaves drift sideways as they fall, pooled so thousands cost one vectorized update
+        self.particles = ParticleSystem.from_animation(self.assets['particles1/leaf'], sway=(0.035, 0.3))
 
         self.scroll = [0, 0] 
+        self.prev_scroll = [0, 0]
+        self.stream_tiles()
         
         #Setup font for EEG info display
         self.font = pg.font.SysFont(None, 24)
+        self.small_font = pg.font.SysFont(None, 16)
+        self.hud = HUD(self.font, self.small_font)
+
+    def combine_channels(self, channels, combined):
+        if not self.channel_weights or not channels:
+            return combined
+        weights = self.channel_weights[:len(channels)]
+        total = sum(weights)
+        if total == 0:
+            return combined
+        return sum(value * weight for value, weight in zip(channels, weights)) / total
 
     def process_eeg_input(self):
         if not self.use_eeg_control:
             return
             
-        #Get the EEG data
-        eeg_data = self.data_bridge.read_eeg_data()
-        beta_power = eeg_data['beta_power']
-        gamma_power = eeg_data['gamma_power']
+        if self.eeg_source is not None:
+            beta_power, gamma_power = self.eeg_source(self.sim_time)
+            self.eeg_state['beta_power'] = beta_power
+            self.eeg_state['gamma_power'] = gamma_power
+        else:
+            beta_power = self.eeg_state['beta_power']
+            gamma_power = self.eeg_state['gamma_power']
         
         #Set movement based on beta power
         self.movement[0] = beta_power < self.beta_threshold * 0.3  # Low beta = move left
         self.movement[1] = beta_power > self.beta_threshold  # High beta = move right
         
-        #Handle jumping with gamma power and cooldown
-        current_time = time.time()
-        if gamma_power > self.gamma_threshold and current_time - self.last_jump_time > self.jump_cooldown:
+        #Handle jumping with gamma power and cooldown, counted in simulated time
+        if gamma_power > self.gamma_threshold and self.sim_time - self.last_jump_time > self.jump_cooldown:
             self.player.jump()
-            self.last_jump_time = current_time
+            self.last_jump_time = self.sim_time
 
-    def display_eeg_info(self):
+    def poll_eeg(self):
+        #Get the EEG data, a synthetic eeg_source is sampled per step in process_eeg_input instead
+        if self.eeg_source is not None:
+            return
         eeg_data = self.data_bridge.read_eeg_data()
-        beta = eeg_data['beta_power']
-        gamma = eeg_data['gamma_power']
-        is_eeg_connected = eeg_data['is_eeg_running']
-        
-        #Background for info panel
-        pg.draw.rect(self.display, (0, 0, 0, 150), (5, 5, 150, 65))
-        
-        #Status indicator
-        status_text = "EEG: Connected" if is_eeg_connected else "EEG: Disconnected"
-        status_color = (0, 255, 0) if is_eeg_connected else (255, 0, 0)
-        status_surface = self.font.render(status_text, True, status_color)
-        self.display.blit(status_surface, (10, 10))
-        
-        #Control mode
-        mode_text = "Mode: EEG" if self.use_eeg_control else "Mode: Keyboard"
-        mode_surface = self.font.render(mode_text, True, (255, 255, 255))
-        self.display.blit(mode_surface, (10, 30))
+        self.track_latency(eeg_data)
+        self.eeg_state = {
+            'beta_power': self.combine_channels(eeg_data['beta_channels'], eeg_data['beta_power']),
+            'gamma_power': self.combine_channels(eeg_data['gamma_channels'], eeg_data['gamma_power']),
+            'is_eeg_running': eeg_data['is_eeg_running'],
+        }
+
+    def track_latency(self, eeg_data):
+        #The same record is read every frame until the processor publishes again, only fresh samples count
+        sample_time = eeg_data['sample_time']
+        if not sample_time or sample_time == self.last_sample_time:
+            return
+        self.last_sample_time = sample_time
+        self.latency.record('analysis', sample_time, eeg_data['analysis_time'])
+        self.latency.record('publish', sample_time, eeg_data['publish_time'])
+        self.latency.record('read', sample_time)
+        self.pending_sample_time = sample_time
+
+    def display_latency(self):
+        self.hud.render_latency(self.display, self.latency)
+
+    def display_eeg_info(self):
+        self.hud.render(self.display, self.eeg_state, self.use_eeg_control, (self.beta_threshold, self.gamma_threshold))
+
+    def stream_tiles(self):
+        #Keeps the tiles around the camera loaded for a streamed level, nothing to do for map.json
+        self.tilemap.stream((int(self.scroll[0]), int(self.scroll[1]), self.display.get_width(), self.display.get_height()))
+
+    def handle_events(self):
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                self.data_bridge.set_game_status(False)
+                pg.quit()
+                sys.exit()
+            #Toggle between EEG and keyboard control with Tab 
+            if event.type == pg.KEYDOWN:
+                if event.key == pg.K_TAB:
+                    self.use_eeg_control = not self.use_eeg_control
+                    print(f"Control mode: {'EEG' if self.use_eeg_control else 'Keyboard'}")
+                if event.key == pg.K_F3:
+                    self.show_latency = not self.show_latency
+
+                if not self.use_eeg_control:
+                    if event.key == pg.K_LEFT:
+                        self.movement[0] = True
+                    if event.key == pg.K_RIGHT:
+                        self.movement[1] = True
+                    if event.key == pg.K_UP:
+                        self.player.jump()
+
+            if event.type == pg.KEYUP and not self.use_eeg_control:
+                if event.key == pg.K_LEFT:
+                    self.movement[0] = False
+                if event.key == pg.K_RIGHT:
+                    self.movement[1] = False
+
+    def simulate(self):
+        #One fixed step of game logic, nothing here draws
+        self.process_eeg_input()
+
+        self.prev_scroll = self.scroll.copy()
+        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
+        self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
+        self.stream_tiles()
+
+        for rect in self.leaf_spawners:
+            if random.random() * 49999 < rect.width * rect.height:
+                pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
+                self.particles.spawn(pos, velocity=(-0.1, 0.3), frame=random.randint(0, 20))
+
+        self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
+        if self.pending_sample_time is not None:
+            self.latency.record('applied', self.pending_sample_time)
+            self.pending_sample_time = None
+        self.collisions.refresh()
+        self.collisions.resolve()
+
+        self.particles.update()
+
+        self.sim_time += SIM_DT
+
+    def render(self, alpha=1.0):
+        #alpha is how far we are between the last two simulation steps, positions are blended by it
+        render_scroll = (int(self.prev_scroll[0] + (self.scroll[0] - self.prev_scroll[0]) * alpha),
+                         int(self.prev_scroll[1] + (self.scroll[1] - self.prev_scroll[1]) * alpha))
+
+        self.background.render(self.display, render_scroll)
+
+        self.tilemap.render(self.display, offset=render_scroll)
+        self.player.render(self.display, offset=render_scroll, alpha=alpha)
+
+        self.particles.render(self.display, offset=render_scroll)
+
+        # Display EEG info
+        self.display_eeg_info()
+        if self.show_latency:
+            self.display_latency()
+
+        present(self.display, self.screen, INTEGER_SCALE)
+        pg.display.update()
+
+    def step(self, dt=SIM_DT):
+        #One frame: input, as many fixed simulation steps as dt covers, then one interpolated draw
+        self.handle_events()
+        self.poll_eeg()
+        self.accumulator += min(dt, MAX_FRAME_TIME)
+        while self.accumulator >= SIM_DT:
+            self.simulate()
+            self.accumulator -= SIM_DT
+        self.latency.maybe_write()
+        self.render(self.accumulator / SIM_DT)
+
+    def simulate_only(self, steps):
+        #Headless run of the game logic alone, for testing and tuning thresholds far faster than real time
+        start = time.perf_counter()
+        for _ in range(steps):
+            self.poll_eeg()
+            self.simulate()
+        return time.perf_counter() - start
 
     def run(self):
         try:
+            last = time.perf_counter()
             while True:
-                self.process_eeg_input()
-                
-                scaled_background1 = pg.transform.scale(self.assets['background1'], self.display.get_size())
-                scaled_background2 = pg.transform.scale(self.assets['background2'], self.display.get_size())
-                scaled_background3 = pg.transform.scale(self.assets['background3'], self.display.get_size())
-
-                self.display.blit(scaled_background1, (0, 0)) 
-                self.display.blit(scaled_background2, (0, 0)) 
-                self.display.blit(scaled_background3, (0, 0)) 
-
-                self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
-                self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
-                render_scroll = (int(self.scroll[0]), int(self.scroll[1])) 
-                
-                for rect in self.leaf_spawners:
-                    if random.random() * 49999 < rect.width * rect.height:
-                        pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
-                        self.particles.append(Particle(self, 'leaf', pos, velocity=[-0.1, 0.3], frame=random.randint(0, 20)))
-
-                self.tilemap.render(self.display, offset=render_scroll)
-
-                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-                self.player.render(self.display, offset=render_scroll)
-
-                for particle in self.particles.copy():
-                    kill = particle.update()
-                    particle.render(self.display, offset=render_scroll)
-                    if particle.type == 'leaf':
-                        particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                    if kill:
-                        self.particles.remove(particle) 
-
-                # Display EEG info
-                self.display_eeg_info()
-
-                for event in pg.event.get():
-                    if event.type == pg.QUIT:
-                        self.data_bridge.set_game_status(False)
-                        pg.quit()
-                        sys.exit()
-                    #Toggle between EEG and keyboard control with Tab 
-                    if event.type == pg.KEYDOWN:
-                        if event.key == pg.K_TAB:
-                            self.use_eeg_control = not self.use_eeg_control
-                            print(f"Control mode: {'EEG' if self.use_eeg_control else 'Keyboard'}")
-                        
-                        if not self.use_eeg_control:
-                            if event.key == pg.K_LEFT:
-                                self.movement[0] = True
-                            if event.key == pg.K_RIGHT:
-                                self.movement[1] = True
-                            if event.key == pg.K_UP:
-                                self.player.jump()
-                    
-                    if event.type == pg.KEYUP and not self.use_eeg_control:
-                        if event.key == pg.K_LEFT:
-                            self.movement[0] = False
-                        if event.key == pg.K_RIGHT:
-                            self.movement[1] = False
-
-                self.screen.blit(pg.transform.scale(self.display, self.screen.get_size()), (0, 0))
-                pg.display.update()
+                now = time.perf_counter()
+                self.step(now - last)
+                last = now
                 self.clock.tick(60)
         finally:
             self.data_bridge.set_game_status(False)
+            self.data_bridge.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='EEG controlled 2D scroller')
+    parser.add_argument('--simulate', type=int, metavar='STEPS', help='run this many simulation steps headless and report, no window')
+    parser.add_argument('--beta-threshold', type=float, help='movement threshold (default 400)')
+    parser.add_argument('--gamma-threshold', type=float, help='jump threshold (default 400)')
+    parser.add_argument('--eeg-source', metavar='SOURCE',
+                        help="'synthetic' or 'replay:<session file>', band powers computed in the game instead of read from the processor")
+    args = parser.parse_args()
+
+    eeg_source = None
+    if args.eeg_source:
+        from eeg_source import make_eeg_source  #needs scipy, only imported when asked for
+        try:
+            eeg_source = make_eeg_source(args.eeg_source)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+
+    game = Game(headless=args.simulate is not None)
+    game.eeg_source = eeg_source
+    if args.beta_threshold is not None:
+        game.beta_threshold = args.beta_threshold
+    if args.gamma_threshold is not None:
+        game.gamma_threshold = args.gamma_threshold
 
-    Game().run()
+    if args.simulate is not None:
+        start_pos = list(game.player.pos)
+        elapsed = game.simulate_only(args.simulate)
+        game.data_bridge.set_game_status(False)
+        game.data_bridge.close()
+        print(f"{args.simulate} steps ({args.simulate * SIM_DT:.1f} s of game time) in {elapsed:.3f} s, "
+              f"{args.simulate / max(elapsed, 1e-9):.0f} steps/s")
+        print(f"player moved from {start_pos} to {[round(v, 1) for v in game.player.pos]}")
+    else:
+        game.run()
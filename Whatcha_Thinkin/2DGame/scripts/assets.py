@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import hashlib
+import pygame as pg
+
+import scripts.utilities as utilities
+
+#Baked assets: every image the game and the editor use, already colour keyed and scaled, packed into one RGBA
+#atlas per category next to a manifest.json with the frame rects. Loading is one file read and one
+#pg.image.frombuffer per atlas, so startup no longer depends on how many PNGs there are.
+#    python -m scripts.assets          (run from 2DGame, re-bakes; needed after changing an image)
+#A missing or outdated bake (ASSETS changed, or an image was added, removed or edited) is redone automatically on the next load.
+
+MANIFEST_VERSION = 1
+ATLAS_WIDTH = 1024
+BAKED_PATH = None  #where the atlases go, None puts them in a baked folder next to the images folder
+
+#name -> (category, path under the images folder, size to scale to or None)
+#A folder becomes a list of frames in file name order, a single file a Surface
+ASSETS = {
+    'decor': ('tiles', 'tiles/decor', None),
+    'grass': ('tiles', 'tiles/grass', None),
+    'large_decor': ('tiles', 'tiles/large_decor', None),
+    'stone': ('tiles', 'tiles/stone', None),
+    'player': ('player', 'entities/IDLETESTING.png', (16, 16)),
+    'player/idle': ('player', 'entities/Knight/120x80_PNGSheets/IDLETESTING1', (16, 16)),
+    'player/jump': ('player', 'entities/Knight/120x80_PNGSheets/JUMP', (16, 16)),
+    'player/run': ('player', 'entities/Knight/120x80_PNGSheets/RUNNING', (16, 16)),
+    'player/fall': ('player', 'entities/Knight/120x80_PNGSheets/FALL', (16, 16)),
+    'player/wall_slide': ('player', 'entities/Knight/120x80_PNGSheets/WALLSLIDE', (16, 16)),
+    'particles1/leaf': ('particles', 'particles1/leaf', None),
+    'background1': ('backgrounds', 'layer_backgrounds/background_layer_1.png', None),
+    'background2': ('backgrounds', 'layer_backgrounds/background_layer_2.png', None),
+    'background3': ('backgrounds', 'layer_backgrounds/background_layer_3.png', None),
+}
+
+def baked_path():
+    #Follows utilities.BASE_IMG_PATH unless BAKED_PATH is set
+    if BAKED_PATH is not None:
+        return BAKED_PATH
+    return os.path.join(os.path.dirname(os.path.normpath(utilities.BASE_IMG_PATH)), 'baked')
+
+def source_files(source):
+    full = utilities.BASE_IMG_PATH + source
+    if os.path.isdir(full):
+        return [os.path.join(full, img_name) for img_name in sorted(os.listdir(full))]
+    return [full]
+
+def assets_hash():
+    #ASSETS plus the name, size and modification time of every source image, a stat per file and no reads
+    sources = []
+    for _, source, _ in ASSETS.values():
+        for path in source_files(source):
+            stat = os.stat(path)
+            sources.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha1(json.dumps([ASSETS, sources], sort_keys=True).encode('utf-8')).hexdigest()
+
+def _bake_image(path, size):
+    #What load_image does, colour key black, but as real alpha so the frame can live in an RGBA atlas
+    img = pg.image.load(path)
+    keyed = pg.Surface(img.get_size(), pg.SRCALPHA)
+    keyed.blit(img, (0, 0), None, pg.BLEND_RGBA_MAX) #a plain copy, works without a display too
+    black = (pg.surfarray.pixels3d(keyed) == 0).all(axis=2)
+    pg.surfarray.pixels_alpha(keyed)[black] = 0
+    if size is not None:
+        keyed = pg.transform.scale(keyed, size)
+    return keyed
+
+def _pack(frames):
+    #Shelf packing, tallest first: rows of frames left to right, a new row when one is full
+    order = sorted(range(len(frames)), key=lambda i: -frames[i].get_height())
+    rects = [None] * len(frames)
+    width = max([ATLAS_WIDTH] + [frame.get_width() for frame in frames])
+    x = y = row_height = 0
+    for i in order:
+        w, h = frames[i].get_size()
+        if x + w > width:
+            x, y, row_height = 0, y + row_height, 0
+        rects[i] = [x, y, w, h]
+        x += w
+        row_height = max(row_height, h)
+    return rects, (width, y + row_height)
+
+def bake(path=None):
+    path = path or baked_path()
+    os.makedirs(path, exist_ok=True)
+    source_hash = assets_hash() #before reading, an image saved during the bake makes the next load bake again
+    categories = {}
+    for name, (category, source, size) in ASSETS.items():
+        frames = [_bake_image(img_path, size) for img_path in source_files(source)]
+        categories.setdefault(category, []).append((name, frames, not os.path.isdir(utilities.BASE_IMG_PATH + source)))
+
+    manifest = {'version': MANIFEST_VERSION, 'assets_hash': source_hash, 'atlases': {}}
+    for category, entries in categories.items():
+        frames = [frame for _, entry_frames, _ in entries for frame in entry_frames]
+        rects, atlas_size = _pack(frames)
+        atlas = pg.Surface(atlas_size, pg.SRCALPHA)
+        atlas.fill((0, 0, 0, 0))
+        #MAX onto the zeroed atlas copies the pixels as they are, a normal blit would blend the translucent ones
+        atlas.blits([(frame, rect[:2], None, pg.BLEND_RGBA_MAX) for frame, rect in zip(frames, rects)], doreturn=False)
+        with open(os.path.join(path, category + '.rgba'), 'wb') as f:
+            f.write(pg.image.tobytes(atlas, 'RGBA'))
+        assets = {}
+        start = 0
+        for name, entry_frames, single in entries:
+            assets[name] = {'frames': rects[start:start + len(entry_frames)], 'single': single}
+            start += len(entry_frames)
+        manifest['atlases'][category] = {'file': category + '.rgba', 'size': list(atlas_size), 'assets': assets}
+
+    tmp = os.path.join(path, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(path, 'manifest.json')) #written last, a half finished bake is never used
+    return manifest
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('assets_hash') != assets_hash():
+        return None
+    return manifest
+
+def _frame(atlas, rect):
+    #A copy, not a subsurface, with the colour key load_image sets: SDL blits keyed surfaces (and the RLE encoded
+    #copies pg.transform.scale makes of them) much faster than per-pixel alpha, the backgrounds by about 10x
+    frame = atlas.subsurface(rect).copy()
+    frame.set_colorkey((0, 0, 0))
+    return frame
+
+def load_assets(names=None):
+    #{name: Surface or list of Surfaces} for the given ASSETS names (all by default), only their atlases are read
+    path = baked_path()
+    manifest = read_manifest(path)
+    if manifest is None:
+        manifest = bake(path)
+    names = list(ASSETS) if names is None else list(names)
+    wanted = {ASSETS[name][0] for name in names}
+    images = {}
+    for category in wanted:
+        entry = manifest['atlases'][category]
+        with open(os.path.join(path, entry['file']), 'rb') as f:
+            pixels = f.read()
+        atlas = pg.image.frombuffer(pixels, entry['size'], 'RGBA')
+        if pg.display.get_surface():
+            atlas = atlas.convert_alpha() #once per atlas instead of once per file
+        for name, asset in entry['assets'].items():
+            frames = [_frame(atlas, rect) for rect in asset['frames']]
+            images[name] = frames[0] if asset['single'] else frames
+    return {name: images[name] for name in names}
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        utilities.BASE_IMG_PATH = os.path.join(sys.argv[1], '')
+    pg.init()
+    manifest = bake()
+    for category, entry in manifest['atlases'].items():
+        print(f"{category:<12} {len(entry['assets'])} assets  atlas {entry['size'][0]}x{entry['size'][1]}")
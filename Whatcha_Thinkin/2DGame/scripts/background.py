@@ -0,0 +1,38 @@
+import pygame as pg
+
+#Background layers scaled to the display once (and again only on resize) instead of every frame.
+#Each layer has a parallax factor: 0 stays put, 0.5 scrolls at half the camera speed. Runs of static
+#layers are flattened into one opaque surface, so a fully static background is a single blit.
+#Scrolling layers wrap horizontally and are drawn twice at the seam.
+
+class ParallaxBackground:
+    def __init__(self, layers, size, factors=None):
+        self.layers = layers                                   #source images, far to near
+        self.factors = list(factors) if factors else [0] * len(layers)
+        self.resize(size)
+
+    def resize(self, size):
+        self.size = tuple(size)
+        self.groups = []   #[surface, factor], static neighbours already composited together
+        for layer, factor in zip(self.layers, self.factors):
+            scaled = pg.transform.scale(layer, self.size)
+            if factor == 0 and self.groups and self.groups[-1][1] == 0:
+                self.groups[-1][0].blit(scaled, (0, 0))
+            elif factor == 0:
+                #The bottom layer covers the whole display, so that group can skip per-pixel alpha
+                base = pg.Surface(self.size, pg.SRCALPHA if self.groups else 0)
+                base.blit(scaled, (0, 0))
+                self.groups.append([base, 0])
+            else:
+                self.groups.append([scaled, factor])
+
+    def render(self, surf, scroll=(0, 0)):
+        width = self.size[0]
+        for layer, factor in self.groups:
+            if factor == 0:
+                surf.blit(layer, (0, 0))
+                continue
+            x = -int(scroll[0] * factor) % width
+            surf.blit(layer, (x, 0))
+            if x:
+                surf.blit(layer, (x - width, 0))
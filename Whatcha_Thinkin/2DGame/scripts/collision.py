@@ -0,0 +1,46 @@
+from scripts.spatial import SpatialHash
+
+#Broad phase for entity vs entity collisions. Entities are bucketed in a spatial hash that is refreshed
+#once per frame after everything moved, then pairs() only compares entities that share a cell.
+#Entity vs tile collisions stay in PhysicsEntity.update, against the tilemap's cached static rects.
+
+class CollisionWorld:
+    def __init__(self, cell_size=32):
+        self.entities = SpatialHash(cell_size)
+
+    def add(self, entity):
+        self.entities.insert(entity, entity.rect())
+
+    def remove(self, entity):
+        self.entities.remove(entity)
+
+    def refresh(self):
+        #One batched pass per frame, entities only change buckets when they crossed a cell edge
+        for entity in self.entities:
+            self.entities.move(entity, entity.rect())
+
+    def query(self, rect):
+        return self.entities.query_rect(rect)
+
+    def pairs(self):
+        #Every overlapping pair once, as rects from the last refresh()
+        seen = set()
+        for bucket in self.entities.cells.values():
+            if len(bucket) < 2:
+                continue
+            members = list(bucket.items())
+            for i, (key_a, a) in enumerate(members):
+                rect_a = self.entities.rect_of(a)
+                for key_b, b in members[i + 1:]:
+                    pair = (key_a, key_b) if key_a < key_b else (key_b, key_a)
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    if rect_a.colliderect(self.entities.rect_of(b)):
+                        yield a, b
+
+    def resolve(self):
+        #Lets both entities react, PhysicsEntity.on_collision does nothing unless a subclass cares
+        for a, b in self.pairs():
+            a.on_collision(b)
+            b.on_collision(a)
@@ -0,0 +1,183 @@
+import os
+from collections import deque
+
+from scripts.level import LEVEL_CHUNK_SIZE, append_journal
+from scripts.tilemap import AUTOTILE_BITS
+
+#Every editor change goes through here. Writes that wouldn't change anything are dropped, so holding the mouse
+#over a painted tile costs nothing. The changes of one mouse stroke are one undo step. Changed chunks are marked
+#dirty, and save() only appends those chunks to a journal next to the map file; once the journal grows past
+#JOURNAL_COMPACT_BYTES the whole map is written out again and the journal deleted.
+
+UNDO_LIMIT = 200                     #strokes kept for undo
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+class EditLog:
+    def __init__(self, tilemap, path):
+        self.tilemap = tilemap
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.undo_stack = deque(maxlen=UNDO_LIMIT)
+        self.redo_stack = []
+        self.stroke = None            #changes of the stroke in progress
+        self.dirty_chunks = set()     #(cx, cy) in LEVEL_CHUNK_SIZE chunks, changed since the last save
+        self.offgrid_dirty = False
+
+    def begin(self):
+        self.end()
+        self.stroke = []
+
+    def end(self):
+        if self.stroke:
+            self.undo_stack.append(self.stroke)
+            self.redo_stack.clear()
+        self.stroke = None
+
+    def _record(self, change):
+        own_stroke = self._open()
+        self.stroke.append(change)
+        self._mark(change)
+        if own_stroke:
+            self.end()
+
+    def _open(self):
+        #An edit outside begin()/end() is an undo step of its own (with the neighbours autotile changed),
+        #opens that stroke and returns True when there was none
+        if self.stroke is not None:
+            return False
+        self.begin()
+        return True
+
+    def _mark(self, change):
+        if change[0] == 'tile':
+            loc = change[1]
+            self.dirty_chunks.add((loc[0] // LEVEL_CHUNK_SIZE, loc[1] // LEVEL_CHUNK_SIZE))
+        else:
+            self.offgrid_dirty = True
+
+    def _state(self, loc):
+        self.tilemap.make_resident(loc)
+        tile = self.tilemap.get_tile(loc)
+        return None if tile is None else (tile['type'], tile['variant'])
+
+    def _apply_state(self, loc, state):
+        if state is None:
+            self.tilemap.remove_tile(loc)
+        else:
+            self.tilemap.set_tile(loc, state[0], state[1])
+
+    def set_tile(self, loc, tile_type, variant, autotile=False):
+        #With autotile the variant is picked from the neighbours, so a tile of the same type is already right
+        loc = (int(loc[0]), int(loc[1]))
+        before = self._state(loc)
+        if before is not None and before[0] == tile_type and (autotile or before[1] == variant):
+            return False
+        own_stroke = self._open()
+        self.tilemap.set_tile(loc, tile_type, variant)
+        self._record(('tile', loc, before, (tile_type, variant)))
+        if autotile:
+            self._autotile_around(loc)
+        if own_stroke:
+            self.end()
+        return True
+
+    def remove_tile(self, loc, autotile=False):
+        loc = (int(loc[0]), int(loc[1]))
+        before = self._state(loc)
+        if before is None:
+            return False
+        own_stroke = self._open()
+        self.tilemap.remove_tile(loc)
+        self._record(('tile', loc, before, None))
+        if autotile:
+            self._autotile_around(loc)
+        if own_stroke:
+            self.end()
+        return True
+
+    def _autotile_around(self, loc):
+        cells = [loc] + [(loc[0] + dx, loc[1] + dy) for dx, dy in AUTOTILE_BITS]
+        before = [self._state(cell) for cell in cells]
+        self.tilemap.autotile_around(loc)
+        for cell, old in zip(cells, before):
+            new = self._state(cell)
+            if new != old:
+                self._record(('tile', cell, old, new))
+
+    def add_offgrid(self, tile):
+        self.tilemap.add_offgrid(tile)
+        self._record(('offgrid', tile, False, True))
+
+    def remove_offgrid(self, tile):
+        self.tilemap.remove_offgrid(tile)
+        self._record(('offgrid', tile, True, False))
+
+    def autotile(self):
+        #The whole map pass as one undo step, only the tiles whose variant changed are remembered.
+        #Chunks a streamed level reads in for the pass aren't in before and aren't changed by it.
+        before = {loc: tile['variant'] for loc, tile in self.tilemap.tilemap.items()}
+        self.tilemap.autotile()
+        self.begin()
+        for loc, tile in self.tilemap.tilemap.items():
+            if loc in before and tile['variant'] != before[loc]:
+                self._record(('tile', loc, (tile['type'], before[loc]), (tile['type'], tile['variant'])))
+        self.end()
+
+    def _replay(self, stroke, undo):
+        for change in reversed(stroke) if undo else stroke:
+            kind, target, before, after = change
+            state = before if undo else after
+            if kind == 'tile':
+                self._apply_state(target, state)
+            elif state:
+                self.tilemap.add_offgrid(target)
+            else:
+                self.tilemap.remove_offgrid(target)
+            self._mark(change)
+
+    def undo(self):
+        self.end()
+        if not self.undo_stack:
+            return False
+        stroke = self.undo_stack.pop()
+        self._replay(stroke, undo=True)
+        self.redo_stack.append(stroke)
+        return True
+
+    def redo(self):
+        self.end()
+        if not self.redo_stack:
+            return False
+        stroke = self.redo_stack.pop()
+        self._replay(stroke, undo=False)
+        self.undo_stack.append(stroke)
+        return True
+
+    def save(self):
+        #Appends the dirty chunks to the journal, or writes the whole map when there's no map file yet or it's time to compact
+        if not os.path.exists(self.path) or (os.path.exists(self.journal_path) and
+                                             os.path.getsize(self.journal_path) >= JOURNAL_COMPACT_BYTES):
+            self.compact()
+            return
+        if not self.dirty_chunks and not self.offgrid_dirty:
+            return
+        chunks = {}
+        for chunk in self.dirty_chunks:
+            tiles = []
+            for x in range(chunk[0] * LEVEL_CHUNK_SIZE, (chunk[0] + 1) * LEVEL_CHUNK_SIZE):
+                for y in range(chunk[1] * LEVEL_CHUNK_SIZE, (chunk[1] + 1) * LEVEL_CHUNK_SIZE):
+                    tile = self.tilemap.get_tile((x, y))
+                    if tile is not None:
+                        tiles.append([x, y, tile['type'], tile['variant']])
+            chunks[chunk] = tiles
+        append_journal(self.journal_path, LEVEL_CHUNK_SIZE, chunks, self.tilemap.offgrid_tiles if self.offgrid_dirty else None)
+        self.dirty_chunks.clear()
+        self.offgrid_dirty = False
+
+    def compact(self):
+        #The map file first, a crash before the journal is gone just replays chunks the file already has
+        self.tilemap.save(self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.dirty_chunks.clear()
+        self.offgrid_dirty = False
@@ -1,16 +1,20 @@
 import pygame as pg
 
+from scripts.utilities import Animation
+
 class PhysicsEntity:
     def __init__(self,game, e_type, pos, size):
         self.game = game
         self.type = e_type
         self.pos = list(pos)
+        self.prev_pos = list(pos) #where the last simulation step started, for interpolated drawing
         self.size = size
         self.velocity = [0,0]
         self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
 
         #animation stuff
         self.action = ''
+        self.animation = Animation(self.game.assets[self.type + '/idle']) #the entity's one playhead, set_action retargets it
         self.anim_offset = (-2,-2) #used to create padding for animations
         self.flip = False
         self.set_action('idle')
@@ -20,19 +24,29 @@ class PhysicsEntity:
     def set_action(self,action):
         if action != self.action:
             self.action = action
-            self.animation = self.game.assets[self.type + '/' + self.action].copy()
+            self.animation.switch(self.game.assets[self.type + '/' + self.action])
 
     def rect(self):
         return pg.Rect(self.pos[0],self.pos[1], self.size[0], self.size[1])
 
+    def on_collision(self, other):
+        #Called by CollisionWorld.resolve for every entity this one overlaps
+        pass
+
     def update(self, tilemap, movement=(0,0)):
+        self.prev_pos = self.pos.copy()
         self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
 
         frame_movement = (movement[0]+ self.velocity[0], movement[1]+self.velocity[1])
 
+        #One query for the whole move: every solid tile the entity could touch this frame, padded for rounding
+        entity_rect = self.rect()
+        sweep = entity_rect.union(entity_rect.move(int(frame_movement[0]), int(frame_movement[1]))).inflate(4, 4)
+        solid_rects = tilemap.physics_rects_in(sweep)
+
         self.pos[0] += frame_movement[0]
         entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
+        for rect in solid_rects:
             if entity_rect.colliderect(rect):
                 if frame_movement[0] > 0:
                     entity_rect.right = rect.left
@@ -45,7 +59,7 @@ class PhysicsEntity:
 
         self.pos[1] += frame_movement[1]
         entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
+        for rect in solid_rects:
             if entity_rect.colliderect(rect):
                 if frame_movement[1] > 0:
                     entity_rect.bottom = rect.top
@@ -70,9 +84,14 @@ class PhysicsEntity:
 
         self.animation.update()
         
-    def render(self, surf, offset=(0,0)):
-        surf.blit(pg.transform.flip(self.animation.img(), self.flip, False), (self.pos[0] - offset[0] + self.anim_offset[0], 
-                                                                              self.pos[1] - offset[1] + self.anim_offset[1]))
+    def render(self, surf, offset=(0,0), alpha=1.0):
+        #alpha blends between the previous and the current simulation step
+        if alpha >= 1:
+            x, y = self.pos
+        else:
+            x = self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * alpha
+            y = self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * alpha
+        surf.blit(self.animation.img(self.flip), (x - offset[0] + self.anim_offset[0], y - offset[1] + self.anim_offset[1]))
 
 class Player(PhysicsEntity):
     def __init__(self, game, pos, size):
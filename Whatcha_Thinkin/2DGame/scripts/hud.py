@@ -0,0 +1,127 @@
+import time
+import numpy as np
+import pygame as pg
+from collections import OrderedDict
+
+#On screen EEG panel. Font rendering is the expensive part of a HUD, so every text surface is cached by
+#its content and only rendered again when the text or colour changes. The bars and sparkline are a fixed
+#number of rects and points whatever the values, so the panel costs the same every frame: the static
+#parts are drawn once into a panel surface and the sparkline scrolls by a pixel and adds one segment.
+
+BETA_COLOR = (80, 160, 255)
+GAMMA_COLOR = (255, 170, 60)
+PANEL_RECT = (5, 5, 150, 95)
+BAR_WIDTH = 120
+SPARKLINE_RECT = (22, 72, 120, 24)
+LATENCY_REFRESH = 0.5  #seconds between latency percentile updates, they need a sort of the whole window
+
+class TextCache:
+    def __init__(self, limit=128):
+        self.limit = limit
+        self.surfaces = OrderedDict()  #(font id, text, colour) -> surface, least recently used first
+
+    def render(self, font, text, color):
+        key = (id(font), text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = font.render(text, True, color)
+            if len(self.surfaces) > self.limit:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+class HUD:
+    def __init__(self, font, small_font, history=SPARKLINE_RECT[2]):
+        self.font = font
+        self.small_font = small_font
+        self.text = TextCache()
+        self.history = np.zeros((2, history))  #beta and gamma ring buffers, one column per frame
+        self.head = 0
+        self.thresholds = None
+        self.latency_lines = []
+        self.latency_updated = -float('inf')
+        self.panel = self.build_panel()
+        self.sparkline = pg.Surface(SPARKLINE_RECT[2:])
+
+    def build_panel(self):
+        #Everything that never changes, drawn once: background, labels and bar tracks
+        panel = pg.Surface(PANEL_RECT[2:])
+        panel.fill((0, 0, 0))
+        for row, (label, color) in enumerate((('B', BETA_COLOR), ('G', GAMMA_COLOR))):
+            y = 50 + row * 10 - PANEL_RECT[1]
+            panel.blit(self.small_font.render(label, True, color), (10 - PANEL_RECT[0], y - 1))
+            pg.draw.rect(panel, (40, 40, 40), (22 - PANEL_RECT[0], y, BAR_WIDTH, 6))
+        return panel
+
+    def level(self, value, threshold):
+        #0..1, full at twice the threshold so the middle is where the player reacts
+        return min(max(value / (2 * threshold), 0), 1) if threshold > 0 else 0
+
+    def push(self, beta, gamma, thresholds):
+        self.history[:, self.head] = beta, gamma
+        self.head = (self.head + 1) % self.history.shape[1]
+        if thresholds != self.thresholds:
+            self.thresholds = thresholds
+            self.redraw_sparkline()
+            return
+        #Scroll the graph a pixel and draw only the newest segment, the cost doesn't depend on the history length
+        w, h = SPARKLINE_RECT[2:]
+        self.sparkline.scroll(-1, 0)
+        self.sparkline.fill((20, 20, 20), (w - 1, 0, 1, h))
+        self.sparkline.set_at((w - 1, h // 2), (70, 70, 70))
+        previous = self.history[:, self.head - 2]
+        for row, color in enumerate((BETA_COLOR, GAMMA_COLOR)):
+            pg.draw.line(self.sparkline, color, (w - 2, self.spark_y(previous[row], thresholds[row])),
+                         (w - 1, self.spark_y(self.history[row, self.head - 1], thresholds[row])))
+
+    def spark_y(self, value, threshold):
+        return round((SPARKLINE_RECT[3] - 1) * (1 - self.level(value, threshold)))
+
+    def redraw_sparkline(self):
+        #Whole graph from the history, only needed when the scale changes
+        w, h = SPARKLINE_RECT[2:]
+        self.sparkline.fill((20, 20, 20))
+        pg.draw.line(self.sparkline, (70, 70, 70), (0, h // 2), (w - 1, h // 2))
+        history = np.roll(self.history, -self.head, axis=1)
+        for row, color in enumerate((BETA_COLOR, GAMMA_COLOR)):
+            points = [(x, self.spark_y(value, self.thresholds[row])) for x, value in enumerate(history[row].tolist())]
+            pg.draw.lines(self.sparkline, color, False, points)
+
+    def render(self, surf, eeg_state, use_eeg_control, thresholds):
+        beta, gamma = eeg_state['beta_power'], eeg_state['gamma_power']
+        self.push(beta, gamma, tuple(thresholds))
+
+        #Background for info panel
+        surf.blit(self.panel, PANEL_RECT[:2])
+
+        #Status indicator
+        if eeg_state['is_eeg_running']:
+            surf.blit(self.text.render(self.font, "EEG: Connected", (0, 255, 0)), (10, 10))
+        else:
+            surf.blit(self.text.render(self.font, "EEG: Disconnected", (255, 0, 0)), (10, 10))
+
+        #Control mode
+        mode_text = "Mode: EEG" if use_eeg_control else "Mode: Keyboard"
+        surf.blit(self.text.render(self.font, mode_text, (255, 255, 255)), (10, 30))
+
+        #Live bars with a tick at the threshold
+        for row, (value, color) in enumerate(((beta, BETA_COLOR), (gamma, GAMMA_COLOR))):
+            y = 50 + row * 10
+            fill = int(BAR_WIDTH * self.level(value, thresholds[row]))
+            if fill:
+                surf.fill(color, (22, y, fill, 6))
+            surf.fill((255, 255, 255), (22 + BAR_WIDTH // 2, y - 1, 1, 8))
+
+        surf.blit(self.sparkline, SPARKLINE_RECT[:2])
+
+    def render_latency(self, surf, latency, pos=(10, 105)):
+        #Percentiles only change slowly, recomputing them every frame would cost more than the whole HUD
+        now = time.monotonic()
+        if now - self.latency_updated >= LATENCY_REFRESH:
+            self.latency_updated = now
+            self.latency_lines = latency.lines()
+        x, y = pos
+        for line in self.latency_lines:
+            surf.blit(self.text.render(self.small_font, line, (200, 200, 200)), (x, y))
+            y += 12
@@ -0,0 +1,179 @@
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+
+#Level files on disk. map.json is the original format: {"tilemap": {"x;y": tile}, "tile_size": 16, "offgrid": [...]}.
+#The binary .lvl format is for big worlds: 8 byte magic, uint32 header length, JSON header (tile size, chunk size,
+#the palette of [type, variant] pairs and the offgrid tiles), padding to 8 bytes, the sorted int64 keys of the
+#non-empty chunks, then one chunk_size x chunk_size uint16 array of palette ids per chunk (0 is no tile).
+#The file is memory mapped, so opening it reads only the header and a chunk is only read when asked for.
+#    python -m scripts.level map.json map.lvl     (run from 2DGame, converts either way)
+#Either format can have a journal next to it (map.lvl.journal), one JSON line per incremental save holding the
+#complete contents of the chunks that changed, applied on top of the map when it's loaded.
+
+LEVEL_MAGIC = b'WTLEVL\x00\x01'
+LEVEL_CHUNK_SIZE = 16
+
+#Tiles are keyed by (x, y) integer tuples in memory, map.json keeps the old "x;y" string keys
+def loc_to_key(loc):
+    return str(loc[0]) + ';' + str(loc[1])
+
+def key_to_loc(key):
+    x, y = key.split(';')
+    return (int(x), int(y))
+
+def tilemap_from_json(json_tilemap):
+    tilemap = {}
+    for key, tile in json_tilemap.items():
+        loc = key_to_loc(key)
+        tile['pos'] = list(loc)
+        tilemap[loc] = tile
+    return tilemap
+
+def tilemap_to_json(tilemap):
+    return {loc_to_key(loc): tile for loc, tile in tilemap.items()}
+
+def chunk_key(chunk):
+    #(cx, cy) packed in one int64, cy as its low 32 bits unsigned. The file keeps the keys sorted only so LevelFile.chunk
+    #can binary search them: within a column negative cy sort after positive ones, it is not a spatial order
+    return (chunk[0] << 32) | (chunk[1] & 0xFFFFFFFF)
+
+def key_chunk(key):
+    cy = key & 0xFFFFFFFF
+    return (key >> 32, cy - (1 << 32) if cy >= 1 << 31 else cy)
+
+def tiles_to_chunks(tilemap, palette, chunk_size=LEVEL_CHUNK_SIZE):
+    #(x, y) -> tile dicts into {(cx, cy): uint16 array}, new [type, variant] pairs are appended to palette
+    ids = {tuple(pair): i + 1 for i, pair in enumerate(palette)}
+    chunks = {}
+    for (x, y), tile in tilemap.items():
+        pair = (tile['type'], tile['variant'])
+        tile_id = ids.get(pair)
+        if tile_id is None:
+            palette.append(list(pair))
+            tile_id = ids[pair] = len(palette)
+        chunk = (x // chunk_size, y // chunk_size)
+        array = chunks.get(chunk)
+        if array is None:
+            array = chunks[chunk] = np.zeros((chunk_size, chunk_size), dtype='<u2')
+        array[y % chunk_size, x % chunk_size] = tile_id
+    return chunks
+
+def chunk_to_tiles(chunk, array, palette):
+    chunk_size = array.shape[0]
+    ys, xs = np.nonzero(array)
+    first_x = chunk[0] * chunk_size
+    first_y = chunk[1] * chunk_size
+    tiles = {}
+    for x, y, tile_id in zip((xs + first_x).tolist(), (ys + first_y).tolist(), array[ys, xs].tolist()):
+        tile_type, variant = palette[tile_id - 1]
+        tiles[(x, y)] = {'type': tile_type, 'variant': variant, 'pos': [x, y]}
+    return tiles
+
+def write_level(path, tile_size, chunks, palette, offgrid, chunk_size=LEVEL_CHUNK_SIZE):
+    #chunks maps (cx, cy) to uint16 arrays, views into another LevelFile are fine and are copied one at a time
+    arrays = {chunk_key(chunk): array for chunk, array in chunks.items() if array.any()}
+    keys = sorted(arrays)
+    header = json.dumps({'tile_size': tile_size, 'chunk_size': chunk_size, 'palette': palette,
+                         'chunks': len(keys), 'offgrid': offgrid}).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(LEVEL_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(b'\x00' * (-(len(LEVEL_MAGIC) + 4 + len(header)) % 8))
+        f.write(np.array(keys, dtype='<i8').tobytes())
+        for key in keys:
+            f.write(np.ascontiguousarray(arrays[key], dtype='<u2').tobytes())
+
+class LevelFile:
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self.data[:len(LEVEL_MAGIC)]) != LEVEL_MAGIC:
+            raise ValueError(f"{path} is not a level file")
+        header_length = struct.unpack_from('<I', self.data, len(LEVEL_MAGIC))[0]
+        start = len(LEVEL_MAGIC) + 4
+        self.header = json.loads(bytes(self.data[start:start + header_length]).decode('utf-8'))
+        self.tile_size = self.header['tile_size']
+        self.chunk_size = self.header['chunk_size']
+        self.palette = self.header['palette']
+        self.offgrid = self.header['offgrid']
+
+        count = self.header['chunks']
+        pos = start + header_length
+        pos += -pos % 8
+        self.keys = self.data[pos:pos + count * 8].view('<i8')
+        pos += count * 8
+        self.chunks = self.data[pos:pos + count * self.chunk_size ** 2 * 2].view('<u2').reshape(count, self.chunk_size, self.chunk_size)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def chunk_list(self):
+        return [key_chunk(key) for key in self.keys.tolist()]
+
+    def chunk(self, chunk):
+        #View of the chunk's palette ids straight out of the memory map, None when the chunk is empty
+        key = chunk_key(chunk)
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.chunks[i]
+        return None
+
+    def tiles(self, chunk):
+        array = self.chunk(chunk)
+        if array is None:
+            return {}
+        return chunk_to_tiles(chunk, array, self.palette)
+
+    def close(self):
+        #Drops the views so the memory map can be released (and the file replaced on Windows)
+        self.keys = self.chunks = self.data = None
+
+def append_journal(path, chunk_size, chunks, offgrid=None):
+    #chunks maps (cx, cy) to [[x, y, type, variant], ...], the whole chunk, so replaying a record twice is harmless
+    record = {'chunk_size': chunk_size, 'chunks': {loc_to_key(chunk): tiles for chunk, tiles in chunks.items()}}
+    if offgrid is not None:
+        record['offgrid'] = offgrid
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+def read_journal(path):
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break #the editor was stopped halfway through writing the last record
+            record['chunks'] = {key_to_loc(key): tiles for key, tiles in record['chunks'].items()}
+            yield record
+
+def convert(source, target):
+    if source.endswith('.json'):
+        with open(source) as f:
+            map_data = json.load(f)
+        palette = []
+        chunks = tiles_to_chunks(tilemap_from_json(map_data['tilemap']), palette)
+        write_level(target, map_data['tile_size'], chunks, palette, map_data['offgrid'])
+    else:
+        level = LevelFile(source)
+        tilemap = {}
+        for chunk in level.chunk_list():
+            tilemap.update(level.tiles(chunk))
+        with open(target, 'w') as f:
+            json.dump({'tilemap': tilemap_to_json(tilemap), 'tile_size': level.tile_size, 'offgrid': level.offgrid}, f)
+        level.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a level between map.json and the binary .lvl format')
+    parser.add_argument('source', help='.json or .lvl file to read')
+    parser.add_argument('target', help='file to write, a .json target gets JSON, anything else the binary format')
+    args = parser.parse_args(argv)
+    if args.source.endswith('.json') == args.target.endswith('.json'):
+        parser.error('one of source and target has to be a .json file')
+    convert(args.source, args.target)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,12 @@
+import numpy as np
+
 class Particle:
     def __init__(self, game, p_type, pos, velocity = [0,0], frame = 0):
         self.game = game
         self.type = p_type
         self.pos = list(pos)
         self.velocity = list(velocity)
-        self.animation = self.game.assets['particles1/' + p_type].copy()
-        self.animation.frame = frame
+        self.animation = self.game.assets['particles1/' + p_type].play(frame)
 
     def update(self):
         kill = False
@@ -21,4 +22,73 @@ class Particle:
     
     def render(self, surf, offset = (0,0)):
         img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
\ No newline at end of file
+        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
+
+
+class ParticleSystem:
+    #All particles of one kind in preallocated arrays: position, velocity and animation frame per slot.
+    #Dead slots go on a free list and get reused, one update moves every particle at once and
+    #drawing is a single Surface.blits call. The arrays double when they run out of room.
+    def __init__(self, images, img_dur=5, capacity=256, sway=None):
+        self.images = images
+        self.img_duration = img_dur
+        self.last_frame = img_dur * len(images) - 1
+        self.sway = sway  #(frequency, amplitude) of the sideways drift, like the falling leaves
+        self.half_sizes = np.array([(img.get_width() // 2, img.get_height() // 2) for img in images], dtype=float)
+
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    @classmethod
+    def from_animation(cls, animation, capacity=256, sway=None):
+        return cls(animation.images, animation.img_duration, capacity, sway)
+
+    def __len__(self):
+        return len(self.pos) - len(self.free)
+
+    def _grow(self):
+        capacity = len(self.pos)
+        self.pos = np.concatenate((self.pos, np.zeros((capacity, 2))))
+        self.velocity = np.concatenate((self.velocity, np.zeros((capacity, 2))))
+        self.frame = np.concatenate((self.frame, np.zeros(capacity, dtype=np.int32)))
+        self.alive = np.concatenate((self.alive, np.zeros(capacity, dtype=bool)))
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def spawn(self, pos, velocity=(0, 0), frame=0):
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.pos[slot] = pos
+        self.velocity[slot] = velocity
+        self.frame[slot] = frame
+        self.alive[slot] = True
+        return slot
+
+    def update(self):
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        #A particle whose animation already finished is removed, the others move one step
+        done = self.frame[live] >= self.last_frame
+        if done.any():
+            dead = live[done]
+            self.alive[dead] = False
+            self.free.extend(dead.tolist())
+            live = live[~done]
+        self.pos[live] += self.velocity[live]
+        self.frame[live] = np.minimum(self.frame[live] + 1, self.last_frame)
+        if self.sway is not None:
+            frequency, amplitude = self.sway
+            self.pos[live, 0] += np.sin(self.frame[live] * frequency) * amplitude
+
+    def render(self, surf, offset=(0, 0)):
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        image_index = self.frame[live] // self.img_duration
+        corner = self.pos[live] - offset - self.half_sizes[image_index]
+        images = self.images
+        surf.blits([(images[i], xy) for i, xy in zip(image_index.tolist(), corner.tolist())], doreturn=False)
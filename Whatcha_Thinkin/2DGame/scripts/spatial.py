@@ -0,0 +1,108 @@
+import pygame as pg
+
+#Spatial hash: the world is cut into square cells and every item is listed in each cell its rect touches.
+#Queries only look at the cells under the query area, removal is a couple of dict deletes.
+#Items can be anything (tile dicts are not hashable), they are tracked by id().
+
+class SpatialHash:
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}   #(cx, cy) -> {item id: item}
+        self.items = {}   #item id -> [item, rect, insertion number], in insertion order
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        #In insertion order, like the list this replaces
+        for item, _, _ in list(self.items.values()):
+            yield item
+
+    def __contains__(self, item):
+        return id(item) in self.items
+
+    def _cells(self, rect):
+        size = self.cell_size
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (cx, cy)
+
+    def insert(self, item, rect):
+        rect = pg.Rect(rect)
+        key = id(item)
+        if key in self.items:
+            self.remove(item)
+        self.items[key] = [item, rect, self.counter]
+        self.counter += 1
+        for cell in self._cells(rect):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                bucket = self.cells[cell] = {}
+            bucket[key] = item
+
+    def remove(self, item):
+        entry = self.items.pop(id(item), None)
+        if entry is None:
+            return False
+        key = id(item)
+        for cell in self._cells(entry[1]):
+            bucket = self.cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self.cells[cell]
+        return True
+
+    def move(self, item, rect):
+        #Only touches the buckets when the item actually changed cells
+        entry = self.items.get(id(item))
+        if entry is None:
+            self.insert(item, rect)
+            return
+        rect = pg.Rect(rect)
+        old = entry[1]
+        size = self.cell_size
+        if (old.left // size, old.top // size, (old.right - 1) // size, (old.bottom - 1) // size) != \
+           (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size):
+            key = id(item)
+            for cell in self._cells(old):
+                bucket = self.cells[cell]
+                del bucket[key]
+                if not bucket:
+                    del self.cells[cell]
+            for cell in self._cells(rect):
+                bucket = self.cells.get(cell)
+                if bucket is None:
+                    bucket = self.cells[cell] = {}
+                bucket[key] = item
+        entry[1] = rect
+
+    def rect_of(self, item):
+        return self.items[id(item)][1]
+
+    def query_rect(self, rect, ordered=False):
+        #Items whose rect overlaps `rect`, in insertion order when `ordered`
+        rect = pg.Rect(rect)
+        found = {}
+        for cell in self._cells(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        items = self.items
+        hits = [key for key in found if items[key][1].colliderect(rect)]
+        if ordered:
+            hits.sort(key=lambda key: items[key][2])
+        return [items[key][0] for key in hits]
+
+    def query_point(self, pos):
+        #collidepoint truncates float positions towards zero, the cell has to come from the same pixel
+        pos = (int(pos[0]), int(pos[1]))
+        cell = (pos[0] // self.cell_size, pos[1] // self.cell_size)
+        bucket = self.cells.get(cell)
+        if not bucket:
+            return []
+        return [item for key, item in bucket.items() if self.items[key][1].collidepoint(pos)]
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
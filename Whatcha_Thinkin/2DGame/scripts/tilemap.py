@@ -1,5 +1,15 @@
+import os
 import pygame as pg
 import json
+import math
+import itertools
+import numpy as np
+from operator import itemgetter
+from collections import OrderedDict
+
+from scripts.spatial import SpatialHash
+from scripts.level import (LevelFile, LEVEL_CHUNK_SIZE, write_level, tiles_to_chunks, read_journal,
+                           tilemap_from_json, tilemap_to_json)
 
 AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, 1)])): 0,
@@ -13,29 +23,67 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
 }
 
+#The same table as a 16 entry lookup on a bitmask of same-type neighbours, -1 where AUTOTILE_MAP has no entry
+AUTOTILE_BITS = {(1, 0): 1, (-1, 0): 2, (0, -1): 4, (0, 1): 8}
+AUTOTILE_BITMASK = [-1] * 16
+for _neighbors, _variant in AUTOTILE_MAP.items():
+    AUTOTILE_BITMASK[sum(AUTOTILE_BITS[shift] for shift in _neighbors)] = _variant
+AUTOTILE_LOOKUP = np.array(AUTOTILE_BITMASK)
+AUTOTILE_MAX_GRID = 1 << 26  #cells, a bulk autotile over a sparser bounding box than this goes tile by tile
+
 NEIGHBOR_OFFSETS = [(-1,0),(-1,-1),(0,-1),(1,-1),(1,0),(0,0),(-1,1),(0,1),(1,1)]
 PHYSICS_TILES = {'grass', 'stone'}#this creates a set, it allows no duplicates and is more efficent in searching values than a list
 AUTOTILE_TYPES = {'grass' , 'stone'}
 
+CHUNK_SIZE = 16          #tiles per side of a pre-rendered chunk
+MAX_CACHED_CHUNKS = 256  #least recently drawn chunks are dropped past this, 256 chunks of 256x256 px is 64 MB
+OFFGRID_CELL_SIZE = 64   #pixels per spatial hash cell for offgrid tiles
+STREAM_RADIUS = 2        #level chunks loaded around the view for .lvl maps
+STREAM_KEEP = 4          #chunks further than this from the view are dropped again, the gap stops load/drop flicker
+
 class Tilemap:
     def __init__(self, game, tile_size=16):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {} #the static tile grid
-        self.offgrid_tiles = [] #anything that may not align with the grid
+        self.tilemap = {} #the static tile grid, (x, y) -> tile
+        self.offgrid = SpatialHash(OFFGRID_CELL_SIZE) #anything that may not align with the grid, indexed by where it's drawn
+
+        #Pre-rendered CHUNK_SIZE x CHUNK_SIZE regions (offgrid and grid tiles together), rebuilt only after
+        #something inside them changes, so a frame is a handful of chunk blits instead of one blit per tile
+        self.chunk_cache = OrderedDict() #(cx, cy) -> Surface, or None for an empty chunk
+        self.tile_margin = None          #how many tiles a grid tile's image can spill right or down
+
+        #Collision rects depend only on the location, so they are made once and shared (callers must not modify them)
+        self.physics_rects = {}          #(x, y) -> Rect
+
+        #Streaming from a .lvl file: only chunks near the view are in self.tilemap, edited ones stay until saved
+        self.level = None                #LevelFile, None when the whole map is in memory
+        self.resident_chunks = set()     #level chunks currently in self.tilemap
+        self.dirty_chunks = set()        #level chunks edited since the last load or save
+        self.stream_view = None          #chunk range of the last stream() call
+
+    @property
+    def offgrid_tiles(self):
+        #Plain list in placement order, what map.json stores
+        return list(self.offgrid)
+
+    @offgrid_tiles.setter
+    def offgrid_tiles(self, tiles):
+        self.offgrid.clear()
+        for tile in tiles:
+            self.offgrid.insert(tile, self._tile_rect(tile, offgrid=True))
 
     def extract(self, id_pairs, keep = False):
         #id_pairs is type and variant combined(these 2 are how we identify tiles)
         #the function is going to locate specific tiles in our map and return their location
         matches = []
-        for tile in self.offgrid_tiles.copy():
+        for tile in self.offgrid:
             if (tile['type'], tile['variant']) in id_pairs:
                 matches.append(tile.copy())
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
+                    self.remove_offgrid(tile)
         
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
+        for loc, tile in list(self.tilemap.items()):
             if (tile['type'], tile['variant']) in id_pairs:
                 matches.append(tile.copy())
                 matches[-1]['pos'] = matches[-1]['pos'].copy() #this changes the pos of the tile were referencing
@@ -43,69 +91,381 @@ class Tilemap:
                 matches[-1]['pos'][1] *= self.tile_size 
                 #these return pixel cords
                 if not keep:
-                    del self.tilemap[loc]
+                    self.remove_tile(loc)
 
         return matches        
 
 
+    def get_tile(self, loc):
+        return self.tilemap.get(loc)
+
+    def set_tile(self, loc, tile_type, variant):
+        loc = (int(loc[0]), int(loc[1]))
+        self._edit(loc)
+        old = self.tilemap.get(loc)
+        if old is not None:
+            self.invalidate_tile(old)
+        self.tilemap[loc] = {'type': tile_type, 'variant': variant, 'pos': list(loc)}
+        self.invalidate_tile(self.tilemap[loc])
+
+    def remove_tile(self, loc):
+        self._edit(loc)
+        tile = self.tilemap.pop(loc, None)
+        if tile is not None:
+            self.invalidate_tile(tile)
+        return tile
+
+    def add_offgrid(self, tile):
+        self.offgrid.insert(tile, self._tile_rect(tile, offgrid=True))
+        self.invalidate_tile(tile, offgrid=True)
+
+    def remove_offgrid(self, tile):
+        if self.offgrid.remove(tile):
+            self.invalidate_tile(tile, offgrid=True)
+
+    def offgrid_at(self, pos):
+        #Offgrid tiles whose image covers the pixel position pos
+        tiles = []
+        for tile in self.offgrid.query_point(pos):
+            img = self.game.assets[tile['type']][tile['variant']]
+            if pg.Rect(tile['pos'][0], tile['pos'][1], img.get_width(), img.get_height()).collidepoint(pos):
+                tiles.append(tile)
+        return tiles
+
+    def clear_cache(self):
+        #For bulk changes (load, autotile), every chunk is rebuilt the next time it is drawn
+        self.chunk_cache.clear()
+        self.tile_margin = None
+
+    def _tile_rect(self, tile, offgrid=False):
+        img = self.game.assets[tile['type']][tile['variant']]
+        if offgrid:
+            return pg.Rect(math.floor(tile['pos'][0]), math.floor(tile['pos'][1]), img.get_width(), img.get_height())
+        return pg.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, img.get_width(), img.get_height())
+
+    def _chunks_in_rect(self, rect):
+        chunk_px = self.tile_size * CHUNK_SIZE
+        for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+            for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                yield (cx, cy)
+
+    def invalidate_tile(self, tile, offgrid=False):
+        #Drops every cached chunk the tile's image overlaps
+        if not self.chunk_cache:
+            return
+        self.invalidate_rect(self._tile_rect(tile, offgrid))
+
+    def invalidate_rect(self, rect):
+        for chunk in self._chunks_in_rect(rect):
+            self.chunk_cache.pop(chunk, None)
+
+    def make_resident(self, loc):
+        #Streamed levels: reads in the chunk holding loc, for anything that looks at tiles away from the view
+        if self.level is None:
+            return None
+        chunk = (loc[0] // self.level.chunk_size, loc[1] // self.level.chunk_size)
+        if chunk not in self.resident_chunks:
+            self.load_chunk(chunk)
+        return chunk
+
+    def _edit(self, loc):
+        #A streamed chunk is read in before it's changed and then kept in memory until the next save
+        if self.level is not None:
+            self.dirty_chunks.add(self.make_resident(loc))
+
+    def load_chunk(self, chunk):
+        self.resident_chunks.add(chunk)
+        tiles = self.level.tiles(chunk)
+        if not tiles:
+            return
+        self.tilemap.update(tiles)
+        if self.chunk_cache:
+            #The chunk's area plus what its tiles spill into, the cache is only filled once tile_margin is known
+            chunk_px = self.tile_size * self.level.chunk_size
+            spill = self.tile_margin * self.tile_size
+            self.invalidate_rect(pg.Rect(chunk[0] * chunk_px, chunk[1] * chunk_px, chunk_px + spill, chunk_px + spill))
+
+    def unload_chunk(self, chunk):
+        self.resident_chunks.discard(chunk)
+        size = self.level.chunk_size
+        for x in range(chunk[0] * size, (chunk[0] + 1) * size):
+            for y in range(chunk[1] * size, (chunk[1] + 1) * size):
+                if self.tilemap.pop((x, y), None) is not None:
+                    self.physics_rects.pop((x, y), None)
+
+    def stream(self, rect):
+        #Keeps the level chunks within STREAM_RADIUS of rect (the view, in pixels) in memory and drops the ones
+        #past STREAM_KEEP unless they have unsaved edits. Costs nothing while the view stays in the same chunks.
+        if self.level is None:
+            return
+        chunk_px = self.tile_size * self.level.chunk_size
+        rect = pg.Rect(rect)
+        view = (rect.left // chunk_px, rect.top // chunk_px, (rect.right - 1) // chunk_px, (rect.bottom - 1) // chunk_px)
+        if view == self.stream_view:
+            return
+        self.stream_view = view
+        left, top, right, bottom = view
+        for cx in range(left - STREAM_RADIUS, right + STREAM_RADIUS + 1):
+            for cy in range(top - STREAM_RADIUS, bottom + STREAM_RADIUS + 1):
+                if (cx, cy) not in self.resident_chunks:
+                    self.load_chunk((cx, cy))
+        for chunk in list(self.resident_chunks):
+            if chunk in self.dirty_chunks:
+                continue
+            if not (left - STREAM_KEEP <= chunk[0] <= right + STREAM_KEEP and top - STREAM_KEEP <= chunk[1] <= bottom + STREAM_KEEP):
+                self.unload_chunk(chunk)
+
+    def all_tiles(self):
+        #Every tile of the map, for a streamed level that means reading the chunks that aren't resident
+        if self.level is None:
+            return self.tilemap
+        tiles = {}
+        for chunk in self.level.chunk_list():
+            if chunk not in self.resident_chunks:
+                tiles.update(self.level.tiles(chunk))
+        tiles.update(self.tilemap)
+        return tiles
+
+    def close_level(self):
+        if self.level is not None:
+            self.level.close()
+        self.level = None
+        self.resident_chunks.clear()
+        self.dirty_chunks.clear()
+        self.stream_view = None
+
     def tile_around(self, pos):
         tiles = []
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        tilemap = self.tilemap
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            tile = tilemap.get((tile_x + offset[0], tile_y + offset[1]))
+            if tile is not None:
+                tiles.append(tile)
         return tiles
     
     def save(self, path):
-        f = open(path, 'w')
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
-        f.close()
+        #A .json path writes map.json, anything else the chunked binary format (see scripts/level.py)
+        if path.endswith('.json'):
+            f = open(path, 'w')
+            json.dump({'tilemap': tilemap_to_json(self.all_tiles()), 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
+            f.close()
+            return
+
+        #Chunks that were never loaded are copied over as they are, the rest is encoded from memory
+        level = self.level
+        chunk_size = level.chunk_size if level else LEVEL_CHUNK_SIZE
+        palette = list(level.palette) if level else []
+        chunks = {}
+        if level is not None:
+            for chunk in level.chunk_list():
+                if chunk not in self.resident_chunks:
+                    chunks[chunk] = level.chunk(chunk)
+        chunks.update(tiles_to_chunks(self.tilemap, palette, chunk_size))
+        tmp = f'{path}.tmp'
+        write_level(tmp, self.tile_size, chunks, palette, self.offgrid_tiles, chunk_size)
+        chunks.clear()
+        if level is None:
+            os.replace(tmp, path)
+            return
+
+        #From now on the map streams from the new file, everything in memory matches it
+        resident = set(self.resident_chunks)
+        self.close_level()
+        os.replace(tmp, path)
+        self.level = LevelFile(path)
+        self.resident_chunks = resident
 
     def load(self, path):
-        f = open(path, 'r')
-        map_data = json.load(f)  
-        f.close()
+        self.close_level()
+        if path.endswith('.json'):
+            f = open(path, 'r')
+            map_data = json.load(f)  
+            f.close()
+
+            self.tilemap = tilemap_from_json(map_data['tilemap'])
+            self.tile_size = map_data['tile_size']
+            self.offgrid_tiles = map_data['offgrid']
+        else:
+            #Only the header is read here, tiles come in chunk by chunk through stream()
+            self.level = LevelFile(path)
+            self.tilemap = {}
+            self.tile_size = self.level.tile_size
+            self.offgrid_tiles = self.level.offgrid
+        if os.path.exists(path + '.journal'):
+            self.apply_journal(path + '.journal')
+        self.physics_rects.clear()
+        self.clear_cache()
 
-        self.tilemap = map_data['tilemap']
-        self.tile_size = map_data['tile_size']
-        self.offgrid_tiles = map_data['offgrid']
+    def apply_journal(self, path):
+        #Edits saved incrementally since the map file was last written in full (see scripts/edit_log.py)
+        for record in read_journal(path):
+            size = record['chunk_size']
+            for chunk, tiles in record['chunks'].items():
+                for x in range(chunk[0] * size, (chunk[0] + 1) * size):
+                    for y in range(chunk[1] * size, (chunk[1] + 1) * size):
+                        self.remove_tile((x, y))
+                for x, y, tile_type, variant in tiles:
+                    self.set_tile((x, y), tile_type, variant)
+            if 'offgrid' in record:
+                self.offgrid_tiles = record['offgrid']
+
+    def physics_rect(self, loc):
+        rect = self.physics_rects.get(loc)
+        if rect is None:
+            rect = self.physics_rects[loc] = pg.Rect(loc[0] * self.tile_size, loc[1] * self.tile_size, self.tile_size, self.tile_size)
+        return rect
 
     def physics_rects_around(self, pos):
         rects = []
         for tile in self.tile_around(pos):
             if tile['type'] in PHYSICS_TILES:
-                rects.append(pg.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
+                rects.append(self.physics_rect((tile['pos'][0], tile['pos'][1])))
         return rects        
+
+    def physics_rects_in(self, rect):
+        #Solid tiles overlapping rect, e.g. everything an entity could touch during one frame's move
+        rects = []
+        tilemap = self.tilemap
+        for x in range(rect.left // self.tile_size, (rect.right - 1) // self.tile_size + 1):
+            for y in range(rect.top // self.tile_size, (rect.bottom - 1) // self.tile_size + 1):
+                tile = tilemap.get((x, y))
+                if tile is not None and tile['type'] in PHYSICS_TILES:
+                    rects.append(self.physics_rect((x, y)))
+        return rects
     
+    def autotile_tile(self, loc):
+        #Picks the variant for one tile from its four neighbours, True when it changed
+        tile = self.tilemap.get(loc)
+        if tile is None or tile['type'] not in AUTOTILE_TYPES:
+            return False
+        mask = 0
+        for shift, bit in AUTOTILE_BITS.items():
+            neighbor = self.tilemap.get((loc[0] + shift[0], loc[1] + shift[1]))
+            if neighbor is not None and neighbor['type'] == tile['type']:
+                mask |= bit
+        variant = AUTOTILE_BITMASK[mask]
+        if variant < 0 or variant == tile['variant']:
+            return False
+        self._edit(loc)
+        self.invalidate_tile(tile)
+        tile['variant'] = variant
+        self.invalidate_tile(tile)
+        return True
+
+    def autotile_around(self, loc):
+        #After an edit at loc only that cell and its 4 neighbours can need a different variant
+        loc = (int(loc[0]), int(loc[1]))
+        if self.level is not None:
+            #The neighbours' neighbours count too, all of them have to be in memory
+            for dx in (-2, 2):
+                for dy in (-2, 2):
+                    self.make_resident((loc[0] + dx, loc[1] + dy))
+        changed = self.autotile_tile(loc)
+        for shift in AUTOTILE_BITS:
+            changed |= self.autotile_tile((loc[0] + shift[0], loc[1] + shift[1]))
+        return changed
+
     def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1,0), (-1,0), (0,-1), (0,1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]      
+        #Whole map at once: tile types go on a dense NumPy grid and the neighbour masks of every tile come
+        #from four gathers. Only the resident part of a streamed level is autotiled.
+        core = self._autotile_core()
+        count = len(self.tilemap)
+        if not count:
+            return
+        locs = np.fromiter(itertools.chain.from_iterable(self.tilemap), dtype=np.int64, count=2 * count).reshape(count, 2)
+        low = locs.min(axis=0) - 1
+        shape = locs.max(axis=0) - low + 2
+        if shape[0] * shape[1] > AUTOTILE_MAX_GRID:
+            for loc in list(self.tilemap):
+                if core is None or (loc[0] // self.level.chunk_size, loc[1] // self.level.chunk_size) in core:
+                    self.autotile_tile(loc)
+            return
+
+        tiles = list(self.tilemap.values())
+        names = list(map(itemgetter('type'), tiles))
+        type_ids = {name: i + 1 for i, name in enumerate(set(names))}
+        types = np.fromiter(map(type_ids.__getitem__, names), dtype=np.uint8, count=count)
+        grid = np.zeros(shape, dtype=np.uint8)
+        xs, ys = (locs - low).T
+        grid[xs, ys] = types
+        mask = np.zeros(count, dtype=np.intp)
+        for (dx, dy), bit in AUTOTILE_BITS.items():
+            mask |= (grid[xs + dx, ys + dy] == types) * bit
+
+        variants = AUTOTILE_LOOKUP[mask]
+        autotiled = np.isin(types, [type_id for tile_type, type_id in type_ids.items() if tile_type in AUTOTILE_TYPES])
+        current = np.fromiter(map(itemgetter('variant'), tiles), dtype=np.intp, count=count)
+        changed = np.flatnonzero(autotiled & (variants >= 0) & (variants != current))
+        edited = False
+        for i in changed.tolist():
+            if core is not None:
+                loc = tiles[i]['pos']
+                chunk = (loc[0] // self.level.chunk_size, loc[1] // self.level.chunk_size)
+                if chunk not in core:
+                    continue #border read in for its neighbours, its own aren't all loaded
+                self.dirty_chunks.add(chunk) #has to survive the chunk being unloaded
+            tiles[i]['variant'] = int(variants[i])
+            edited = True
+        if edited:
+            self.clear_cache()
+
+    def _autotile_core(self):
+        #Streamed levels: the resident chunks, after reading in the chunks next to them so tiles on the
+        #edge see their real neighbours instead of empty space. None when the whole map is in memory.
+        if self.level is None:
+            return None
+        core = set(self.resident_chunks)
+        for cx, cy in core:
+            for dx, dy in AUTOTILE_BITS:
+                if (cx + dx, cy + dy) not in self.resident_chunks:
+                    self.load_chunk((cx + dx, cy + dy))
+        return core
+
+    def _build_chunk(self, chunk):
+        chunk_px = self.tile_size * CHUNK_SIZE
+        origin = (chunk[0] * chunk_px, chunk[1] * chunk_px)
+        if self.tile_margin is None:
+            biggest = max([img.get_width() for imgs in self.game.assets.values() if isinstance(imgs, list) for img in imgs] +
+                          [img.get_height() for imgs in self.game.assets.values() if isinstance(imgs, list) for img in imgs] + [1])
+            self.tile_margin = -(-biggest // self.tile_size) - 1
+
+        #Same order as drawing tile by tile: offgrid first, then the grid column by column.
+        #Grid tiles up to tile_margin to the left or above can spill into this chunk.
+        #Offgrid positions are floored, blit would truncate the negative ones at a chunk's left or top edge the other way
+        blits = [(self.game.assets[tile['type']][tile['variant']],
+                  (math.floor(tile['pos'][0]) - origin[0], math.floor(tile['pos'][1]) - origin[1]))
+                 for tile in self.offgrid.query_rect((origin[0], origin[1], chunk_px, chunk_px), ordered=True)]
+        first_x = chunk[0] * CHUNK_SIZE
+        first_y = chunk[1] * CHUNK_SIZE
+        for x in range(first_x - self.tile_margin, first_x + CHUNK_SIZE):
+            for y in range(first_y - self.tile_margin, first_y + CHUNK_SIZE):
+                tile = self.tilemap.get((x, y))
+                if tile is not None:
+                    blits.append((self.game.assets[tile['type']][tile['variant']],
+                                  (x * self.tile_size - origin[0], y * self.tile_size - origin[1])))
+        if not blits:
+            return None
+        surf = pg.Surface((chunk_px, chunk_px), pg.SRCALPHA)
+        surf.blits(blits, doreturn=False)
+        return surf
 
     def render(self, surf, offset=(0,0)):
-        for tile in self.offgrid_tiles:
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            # range(offset[0] // self.tile_size finds tile in the top left
-            # (offset[0] + surf.get_width()) finds the top right edge of the screen
-            # // self.tile_size + 1 gives us the cords of the right top edge
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y) 
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - 
-                                                                                offset[0], tile['pos'][1] * self.tile_size - offset[1])) 
-
-
-       
-    
\ No newline at end of file
+        chunk_px = self.tile_size * CHUNK_SIZE
+        offset = (int(offset[0]), int(offset[1]))
+        blits = []
+        for cx in range(offset[0] // chunk_px, (offset[0] + surf.get_width()) // chunk_px + 1):
+            for cy in range(offset[1] // chunk_px, (offset[1] + surf.get_height()) // chunk_px + 1):
+                chunk = (cx, cy)
+                if chunk in self.chunk_cache:
+                    self.chunk_cache.move_to_end(chunk)
+                    chunk_surf = self.chunk_cache[chunk]
+                else:
+                    chunk_surf = self._build_chunk(chunk)
+                    self.chunk_cache[chunk] = chunk_surf
+                    if len(self.chunk_cache) > MAX_CACHED_CHUNKS:
+                        self.chunk_cache.popitem(last=False)
+                if chunk_surf is not None:
+                    blits.append((chunk_surf, (cx * chunk_px - offset[0], cy * chunk_px - offset[1])))
+        surf.blits(blits, doreturn=False)
@@ -14,25 +14,70 @@ def load_picture(path):
         images.append(load_image(path + '/' + img_name)) 
     return images
 
-class Animation:
+def present(display, screen, integer_scale=False):
+    #Scales the low-res display straight into the window surface, no new surface per frame.
+    #integer_scale keeps pixels square: the largest whole multiple that fits, centred with black bars.
+    screen_w, screen_h = screen.get_size()
+    display_w, display_h = display.get_size()
+    if integer_scale:
+        factor = max(1, min(screen_w // display_w, screen_h // display_h))
+        size = (display_w * factor, display_h * factor)
+        if size != (screen_w, screen_h):
+            screen.fill((0, 0, 0))
+            target = screen.subsurface(((screen_w - size[0]) // 2, (screen_h - size[1]) // 2), size)
+        else:
+            target = screen
+    else:
+        size = (screen_w, screen_h)
+        target = screen
+    if size == (display_w, display_h):
+        target.blit(display, (0, 0))
+    else:
+        pg.transform.scale(display, size, target)
+
+#Animations are split in two: AnimationData holds what every user of an animation shares (the frames, one entry
+#per tick so no division is needed, and the same frames already flipped for facing left), built once with the
+#assets. Animation is the playhead each entity or particle owns, just a frame counter, and switching to another
+#animation points it at different data instead of allocating a new one.
+
+class AnimationData:
     def __init__(self, images, img_dur=5, loop=True):
         self.images = images
         self.img_duration = img_dur
         self.loop = loop
+        self.length = img_dur * len(images)
+        self.frames = [img for img in images for _ in range(img_dur)]
+        flipped = [pg.transform.flip(img, True, False) for img in images]
+        self.flipped_frames = [img for img in flipped for _ in range(img_dur)]
+
+    def play(self, frame=0):
+        return Animation(self, frame)
+
+class Animation:
+    __slots__ = ('data', 'frame', 'done')
+
+    def __init__(self, data, frame=0):
+        self.data = data
+        self.frame = frame
         self.done = False
+
+    def switch(self, data):
+        #Starts another animation from its first frame, reusing this playhead
+        self.data = data
         self.frame = 0
+        self.done = False
 
     def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
-    
+        return Animation(self.data)
+
     def update(self):
-        if self.loop:
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
+        last = self.data.length - 1
+        if self.data.loop:
+            self.frame = self.frame + 1 if self.frame < last else 0
         else:
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
+            self.frame = min(self.frame + 1, last)
+            if self.frame >= last:
                 self.done = True
-    
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
-        
\ No newline at end of file
+
+    def img(self, flip=False):
+        return self.data.flipped_frames[self.frame] if flip else self.data.frames[self.frame]
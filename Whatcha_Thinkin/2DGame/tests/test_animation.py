@@ -0,0 +1,87 @@
+import pygame as pg
+import pytest
+
+from scripts.utilities import AnimationData, Animation
+
+def frames(n):
+    #Asymmetric so a flip is visible
+    images = []
+    for i in range(n):
+        surf = pg.Surface((4 + i, 3))
+        surf.fill((0, 0, 0))
+        surf.set_at((0, 0), (255, i * 40, 0))
+        images.append(surf)
+    return images
+
+class OldAnimation:
+    #The single class animations used before the split, kept here as the reference
+    def __init__(self, images, img_dur=5, loop=True):
+        self.images = images
+        self.loop = loop
+        self.img_duration = img_dur
+        self.done = False
+        self.frame = 0
+
+    def update(self):
+        if self.loop:
+            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
+        else:
+            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
+            if self.frame >= self.img_duration * len(self.images) - 1:
+                self.done = True
+
+    def img(self):
+        return self.images[int(self.frame / self.img_duration)]
+
+@pytest.mark.parametrize('loop', [True, False])
+@pytest.mark.parametrize('img_dur,count', [(1, 1), (5, 4), (20, 3)])
+def test_playhead_matches_the_old_animation(img_dur, count, loop):
+    images = frames(count)
+    old = OldAnimation(images, img_dur, loop)
+    new = AnimationData(images, img_dur, loop).play()
+    for _ in range(3 * img_dur * count + 2):
+        assert new.img() is old.img()
+        assert (new.frame, new.done) == (old.frame, old.done)
+        old.update()
+        new.update()
+
+def test_frames_are_expanded_per_tick():
+    images = frames(3)
+    data = AnimationData(images, img_dur=4)
+    assert data.length == 12
+    assert data.frames == [images[0]] * 4 + [images[1]] * 4 + [images[2]] * 4
+    #Flipped once per image and shared between the ticks of that image
+    assert data.flipped_frames[0] is data.flipped_frames[3] and data.flipped_frames[3] is not data.flipped_frames[4]
+    flipped = data.flipped_frames[0]
+    assert flipped.get_size() == images[0].get_size()
+    assert flipped.get_at((3, 0)) == images[0].get_at((0, 0))
+
+def test_img_flip_picks_the_flipped_frame():
+    data = AnimationData(frames(2), img_dur=2)
+    playhead = data.play(frame=2)
+    assert playhead.img() is data.frames[2] and playhead.img(flip=True) is data.flipped_frames[2]
+
+def test_switch_reuses_the_playhead():
+    idle = AnimationData(frames(2), img_dur=3)
+    jump = AnimationData(frames(3), img_dur=2, loop=False)
+    playhead = idle.play()
+    for _ in range(4):
+        playhead.update()
+    for _ in range(10):
+        playhead.switch(jump)
+    assert (playhead.data, playhead.frame, playhead.done) == (jump, 0, False)
+    for _ in range(jump.length):
+        playhead.update()
+    assert playhead.done and playhead.img() is jump.frames[-1]
+    playhead.switch(idle)
+    assert not playhead.done and playhead.img() is idle.frames[0]
+
+def test_playheads_share_data_and_stay_small():
+    data = AnimationData(frames(2))
+    a = data.play()
+    b = a.copy()
+    a.update()
+    assert b.data is data and (a.frame, b.frame) == (1, 0)
+    assert not hasattr(a, '__dict__')
+    with pytest.raises(AttributeError):
+        a.extra = 1
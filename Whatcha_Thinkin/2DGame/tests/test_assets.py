@@ -0,0 +1,109 @@
+import os
+import json
+
+import pygame as pg
+import pytest
+
+import scripts.assets as assets
+import scripts.utilities as utilities
+
+def save_png(path, size, color, dot=None):
+    #Black background (the colour key) with a coloured block, dot adds one pixel of another colour
+    surf = pg.Surface(size)
+    surf.fill((0, 0, 0))
+    surf.fill(color, (1, 1, size[0] - 2, size[1] - 2))
+    if dot:
+        surf.set_at((1, 1), dot)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pg.image.save(surf, path)
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    root = tmp_path / 'images'
+    for i, color in enumerate(((200, 0, 0), (0, 200, 0), (0, 0, 200))):
+        save_png(str(root / 'tiles' / 'grass' / f'{i}.png'), (16, 16), color)
+    save_png(str(root / 'tiles' / 'decor' / '0.png'), (8, 12), (90, 90, 90))
+    save_png(str(root / 'hero.png'), (40, 30), (250, 250, 0))
+    monkeypatch.setattr(utilities, 'BASE_IMG_PATH', str(root) + os.sep)
+    monkeypatch.setattr(assets, 'BAKED_PATH', str(tmp_path / 'baked'))
+    monkeypatch.setattr(assets, 'ASSETS', {
+        'grass': ('tiles', 'tiles/grass', None),
+        'decor': ('tiles', 'tiles/decor', None),
+        'player': ('player', 'hero.png', (16, 12)),
+    })
+    return root
+
+def count_bakes(monkeypatch):
+    bakes = []
+    real_bake = assets.bake
+    monkeypatch.setattr(assets, 'bake', lambda path=None: bakes.append(path) or real_bake(path))
+    return bakes
+
+def visible(surf):
+    #What a blit shows: colour keyed pixels count as transparent
+    key = tuple(surf.get_colorkey())[:3]
+    pixels = [[tuple(surf.get_at((x, y)))[:3] for y in range(surf.get_height())] for x in range(surf.get_width())]
+    return [[None if pixel == key else pixel for pixel in column] for column in pixels]
+
+def test_baked_frames_match_the_images(images):
+    loaded = assets.load_assets()
+    assert [frame.get_size() for frame in loaded['grass']] == [(16, 16)] * 3
+    for i, frame in enumerate(loaded['grass']):
+        source = pg.image.load(str(images / 'tiles' / 'grass' / f'{i}.png'))
+        source.set_colorkey((0, 0, 0))
+        assert visible(frame) == visible(source)
+    assert isinstance(loaded['player'], pg.Surface) and loaded['player'].get_size() == (16, 12)
+    assert loaded['decor'][0].get_size() == (8, 12)
+
+def test_manifest_rects_are_packed_without_overlap(images):
+    manifest = assets.bake()
+    for entry in manifest['atlases'].values():
+        rects = [pg.Rect(rect) for asset in entry['assets'].values() for rect in asset['frames']]
+        atlas = pg.Rect((0, 0), entry['size'])
+        assert all(atlas.contains(rect) for rect in rects)
+        assert not any(a.colliderect(b) for i, a in enumerate(rects) for b in rects[i + 1:])
+        assert os.path.getsize(os.path.join(assets.BAKED_PATH, entry['file'])) == entry['size'][0] * entry['size'][1] * 4
+    assert manifest['atlases']['player']['assets']['player']['single']
+
+def test_unchanged_bake_is_reused(images, monkeypatch):
+    assets.load_assets()
+    bakes = count_bakes(monkeypatch)
+    assets.load_assets()
+    assets.load_assets(['player'])
+    assert bakes == []
+
+def test_edited_image_is_rebaked(images, monkeypatch):
+    assets.load_assets()
+    bakes = count_bakes(monkeypatch)
+    #Same size file, only the pixels and the modification time differ
+    path = str(images / 'tiles' / 'grass' / '1.png')
+    before = os.stat(path)
+    save_png(path, (16, 16), (0, 200, 0), dot=(255, 255, 255))
+    os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns + 10 ** 9))
+    frame = assets.load_assets(['grass'])['grass'][1]
+    assert len(bakes) == 1
+    assert tuple(frame.get_at((1, 1)))[:3] == (255, 255, 255)
+
+def test_added_image_and_changed_assets_are_rebaked(images, monkeypatch):
+    assets.load_assets()
+    bakes = count_bakes(monkeypatch)
+    save_png(str(images / 'tiles' / 'grass' / '3.png'), (16, 16), (10, 20, 30))
+    assert len(assets.load_assets()['grass']) == 4
+    monkeypatch.setitem(assets.ASSETS, 'player', ('player', 'hero.png', (20, 15)))
+    assert assets.load_assets()['player'].get_size() == (20, 15)
+    assert len(bakes) == 2
+
+def test_stale_or_broken_manifest_is_rebaked(images, monkeypatch):
+    assets.load_assets()
+    manifest_path = os.path.join(assets.BAKED_PATH, 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['version'] = assets.MANIFEST_VERSION + 1
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    bakes = count_bakes(monkeypatch)
+    assets.load_assets()
+    with open(manifest_path, 'w') as f:
+        f.write('{not json')
+    assets.load_assets()
+    assert len(bakes) == 2
@@ -0,0 +1,88 @@
+import types
+import itertools
+
+import pygame as pg
+
+from scripts.edit_log import EditLog
+from scripts.tilemap import Tilemap, AUTOTILE_MAP, AUTOTILE_BITS, AUTOTILE_BITMASK
+import scripts.tilemap as tilemap_module
+
+def make_game():
+    surf = pg.Surface((16, 16))
+    return types.SimpleNamespace(assets={name: [surf] * 16 for name in ('grass', 'stone', 'decor', 'large_decor')})
+
+def variants(tilemap):
+    return {loc: tile['variant'] for loc, tile in tilemap.all_tiles().items()}
+
+def test_bitmask_matches_autotile_map():
+    for mask in range(16):
+        neighbors = tuple(sorted(shift for shift, bit in AUTOTILE_BITS.items() if mask & bit))
+        assert AUTOTILE_BITMASK[mask] == AUTOTILE_MAP.get(neighbors, -1)
+
+def test_bulk_matches_tile_by_tile():
+    shapes = Tilemap(make_game())
+    for x, y in itertools.product(range(-6, 6), range(-4, 4)):
+        if (x * 7 + y * 3) % 5:
+            shapes.set_tile((x, y), 'grass' if x < 2 else 'stone', 0)
+    shapes.set_tile((20, 20), 'decor', 3)
+    single = Tilemap(make_game())
+    for loc, tile in shapes.tilemap.items():
+        single.set_tile(loc, tile['type'], tile['variant'])
+    shapes.autotile()
+    for loc in list(single.tilemap):
+        single.autotile_tile(loc)
+    assert variants(shapes) == variants(single)
+    assert shapes.get_tile((20, 20))['variant'] == 3
+
+def grass_rows(tilemap):
+    for x in range(-200, 200):
+        tilemap.set_tile((x, 10), 'grass', 1)
+        tilemap.set_tile((x, 11), 'grass', 1)
+
+def test_streamed_autotile_sees_neighbours_outside_the_view(tmp_path):
+    #Tiles at the edge of the resident chunks have neighbours in chunks that weren't streamed in
+    path = str(tmp_path / 'map.lvl')
+    full = Tilemap(make_game())
+    grass_rows(full)
+    full.save(path)
+    full.autotile()
+    expected = variants(full)
+
+    streamed = Tilemap(make_game())
+    streamed.load(path)
+    streamed.stream((0, 0, 400, 300))
+    size = streamed.level.chunk_size
+    core = set(streamed.resident_chunks)
+    edits = EditLog(streamed, path)
+    edits.autotile()
+    edits.compact()
+
+    saved = Tilemap(make_game())
+    saved.load(path)
+    for loc, variant in variants(saved).items():
+        if (loc[0] // size, loc[1] // size) in core:
+            assert variant == expected[loc], loc
+        else:
+            assert variant == 1, loc  #outside the pass, left as it was
+    streamed.close_level()
+    saved.close_level()
+
+def test_streamed_autotile_tile_by_tile(tmp_path, monkeypatch):
+    #The same on the sparse fallback path
+    monkeypatch.setattr(tilemap_module, 'AUTOTILE_MAX_GRID', 0)
+    path = str(tmp_path / 'map.lvl')
+    full = Tilemap(make_game())
+    grass_rows(full)
+    full.save(path)
+    full.autotile()
+    streamed = Tilemap(make_game())
+    streamed.load(path)
+    streamed.stream((0, 0, 400, 300))
+    core = set(streamed.resident_chunks)
+    streamed.autotile()
+    size = streamed.level.chunk_size
+    for loc, tile in streamed.tilemap.items():
+        if (loc[0] // size, loc[1] // size) in core:
+            assert tile['variant'] == full.get_tile(loc)['variant'], loc
+    assert streamed.dirty_chunks <= core
+    streamed.close_level()
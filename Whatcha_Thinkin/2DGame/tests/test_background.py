@@ -0,0 +1,72 @@
+import numpy as np
+import pygame as pg
+
+from scripts.background import ParallaxBackground
+from scripts.utilities import present
+
+SIZE = (120, 90)
+
+def noise(size, seed):
+    #Opaque, every column different so any shift shows up
+    surf = pg.Surface(size)
+    pg.surfarray.blit_array(surf, np.random.default_rng(seed).integers(0, 255, (size[0], size[1], 3)))
+    return surf
+
+def sprite(size, rect, color):
+    #Transparent layer with one opaque shape, like the cloud and hill layers
+    surf = pg.Surface(size, pg.SRCALPHA)
+    surf.fill(color, rect)
+    return surf
+
+def layers():
+    return [noise((64, 48), 0), sprite((64, 48), (5, 10, 20, 12), (250, 250, 0)), sprite((64, 48), (40, 30, 24, 18), (0, 250, 250))]
+
+def reference(layers, factors, scroll):
+    #Scaling every frame and tiling each scrolling layer without the modulo, what the background used to cost
+    surf = pg.Surface(SIZE)
+    for layer, factor in zip(layers, factors):
+        scaled = pg.transform.scale(layer, SIZE)
+        shift = int(scroll[0] * factor)
+        for k in range(shift // SIZE[0] - 1, shift // SIZE[0] + 2):
+            surf.blit(scaled, (k * SIZE[0] - shift, 0))
+    return pg.image.tobytes(surf, 'RGB')
+
+def render(background, scroll):
+    surf = pg.Surface(SIZE)
+    background.render(surf, scroll)
+    return pg.image.tobytes(surf, 'RGB')
+
+def test_static_layers_flatten_into_one_blit():
+    background = ParallaxBackground(layers(), SIZE)
+    assert len(background.groups) == 1
+    assert render(background, (37, 0)) == reference(layers(), (0, 0, 0), (37, 0))
+
+def test_scrolling_layers_wrap():
+    factors = (0, 0.25, 0.5)
+    background = ParallaxBackground(layers(), SIZE, factors)
+    assert [factor for _, factor in background.groups] == [0, 0.25, 0.5]
+    for scroll in (0, 1, 59, 240, 241.7, 1000, -1, -333.3):
+        assert render(background, (scroll, 12)) == reference(layers(), factors, (scroll, 12)), scroll
+
+def test_static_layers_above_a_scrolling_one_keep_their_alpha():
+    factors = (0, 0.5, 0)
+    background = ParallaxBackground(layers(), SIZE, factors)
+    assert len(background.groups) == 3
+    assert render(background, (77, 0)) == reference(layers(), factors, (77, 0))
+
+def test_resize_rescales_once():
+    background = ParallaxBackground(layers(), SIZE, (0, 0.5, 0.5))
+    background.resize((60, 45))
+    assert all(layer.get_size() == (60, 45) for layer, _ in background.groups)
+
+def test_present_scales_into_the_window():
+    display = noise((40, 30), 1)
+    screen = pg.Surface((100, 70))
+    present(display, screen)
+    assert pg.image.tobytes(screen, 'RGB') == pg.image.tobytes(pg.transform.scale(display, (100, 70)), 'RGB')
+
+    #Integer scale: 2x centred, black bars around it
+    screen.fill((255, 255, 255))
+    present(display, screen, integer_scale=True)
+    assert pg.image.tobytes(screen.subsurface((10, 5, 80, 60)), 'RGB') == pg.image.tobytes(pg.transform.scale(display, (80, 60)), 'RGB')
+    assert screen.get_at((0, 0)) == (0, 0, 0, 255) and screen.get_at((99, 69)) == (0, 0, 0, 255)
@@ -0,0 +1,97 @@
+import math
+import types
+
+import pygame as pg
+
+import scripts.tilemap as tilemap_module
+from scripts.tilemap import Tilemap, CHUNK_SIZE
+
+VIEW = (320, 240)
+
+def solid(size, color):
+    surf = pg.Surface(size)
+    surf.fill(color)
+    return surf
+
+def make_game():
+    #One colour per type, large_decor is bigger than a tile so it spills into the next chunk
+    return types.SimpleNamespace(assets={
+        'grass': [solid((16, 16), (0, 200, 0))] * 9,
+        'stone': [solid((16, 16), (120, 120, 120))] * 9,
+        'decor': [solid((8, 8), (200, 0, 0))] * 4,
+        'large_decor': [solid((32, 32), (0, 0, 200))] * 4,
+    })
+
+def render(tilemap, offset):
+    surf = pg.Surface(VIEW)
+    tilemap.render(surf, offset=offset)
+    return pg.image.tobytes(surf, 'RGB')
+
+def reference(tilemap, offset):
+    #Tile by tile, the way the map was drawn before chunks
+    surf = pg.Surface(VIEW)
+    for tile in tilemap.offgrid_tiles:
+        img = tilemap.game.assets[tile['type']][tile['variant']]
+        surf.blit(img, (math.floor(tile['pos'][0]) - offset[0], math.floor(tile['pos'][1]) - offset[1]))
+    for loc in sorted(tilemap.tilemap):
+        tile = tilemap.tilemap[loc]
+        img = tilemap.game.assets[tile['type']][tile['variant']]
+        surf.blit(img, (loc[0] * tilemap.tile_size - offset[0], loc[1] * tilemap.tile_size - offset[1]))
+    return pg.image.tobytes(surf, 'RGB')
+
+def make_map():
+    tilemap = Tilemap(make_game(), tile_size=16)
+    for x in range(-5, 30):
+        tilemap.set_tile((x, 10), 'grass', 1)
+        tilemap.set_tile((x, 11), 'stone', 0)
+    tilemap.add_offgrid({'type': 'decor', 'variant': 0, 'pos': [100.5, 140.25]})
+    return tilemap
+
+OFFSET = (-40, 20)
+
+def test_render_matches_tile_by_tile():
+    tilemap = make_map()
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+    assert tilemap.chunk_cache
+
+def test_edits_rebuild_only_the_touched_chunks():
+    tilemap = make_map()
+    render(tilemap, OFFSET)
+    cached = dict(tilemap.chunk_cache)
+
+    tilemap.set_tile((3, 4), 'stone', 2)
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+    rebuilt = {chunk for chunk, surf in tilemap.chunk_cache.items() if cached.get(chunk) is not surf}
+    assert rebuilt == {(0, 0)}
+
+    tilemap.remove_tile((3, 10))
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+
+    decor = tilemap.offgrid_tiles[0]
+    tilemap.remove_offgrid(decor)
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+    tilemap.add_offgrid({'type': 'decor', 'variant': 1, 'pos': [-7.5, 90.0]})
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+
+def test_tile_spilling_over_a_chunk_edge():
+    #A 32 px image on the last tile of a chunk draws into the chunk right of it and below it
+    tilemap = make_map()
+    render(tilemap, OFFSET)
+    edge = CHUNK_SIZE - 1
+    tilemap.set_tile((edge, 5), 'large_decor', 0)
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+    tilemap.remove_tile((edge, 5))
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+    tilemap.add_offgrid({'type': 'large_decor', 'variant': 0, 'pos': [edge * 16 + 4.0, 12.0]})
+    assert render(tilemap, OFFSET) == reference(tilemap, OFFSET)
+
+def test_least_recently_drawn_chunks_are_dropped(monkeypatch):
+    monkeypatch.setattr(tilemap_module, 'MAX_CACHED_CHUNKS', 6)
+    tilemap = make_map()
+    chunk_px = 16 * CHUNK_SIZE
+    for step in range(8):
+        render(tilemap, (step * chunk_px, 0))
+        assert len(tilemap.chunk_cache) <= 6
+    #The newest view is still cached and the first one is gone
+    assert (8, 0) in tilemap.chunk_cache and (0, 0) not in tilemap.chunk_cache
+    assert render(tilemap, (0, 0)) == reference(tilemap, (0, 0))
@@ -0,0 +1,97 @@
+import types
+import random
+
+import pygame as pg
+
+from scripts.collision import CollisionWorld
+from scripts.entities import PhysicsEntity
+from scripts.tilemap import Tilemap
+from scripts.utilities import AnimationData
+
+class Box:
+    #Just what CollisionWorld needs from an entity
+    def __init__(self, n, rect):
+        self.n = n
+        self.box = pg.Rect(rect)
+        self.hits = []
+
+    def rect(self):
+        return pg.Rect(self.box)
+
+    def on_collision(self, other):
+        self.hits.append(other.n)
+
+def brute_pairs(boxes):
+    return {(a.n, b.n) for i, a in enumerate(boxes) for b in boxes[i + 1:] if a.box.colliderect(b.box)}
+
+def found_pairs(world):
+    pairs = [tuple(sorted((a.n, b.n))) for a, b in world.pairs()]
+    assert len(pairs) == len(set(pairs)), 'a pair was reported twice'
+    return set(pairs)
+
+def test_pairs_match_every_overlap_once():
+    #Boxes up to 3 cells wide so pairs share several buckets
+    rng = random.Random(0)
+    world = CollisionWorld(cell_size=32)
+    boxes = [Box(n, (rng.randint(-200, 200), rng.randint(-200, 200), rng.randint(4, 90), rng.randint(4, 90))) for n in range(150)]
+    for box in boxes:
+        world.add(box)
+    for frame in range(20):
+        assert found_pairs(world) == brute_pairs(boxes)
+        for box in boxes:
+            box.box.move_ip(rng.randint(-12, 12), rng.randint(-12, 12))
+        world.refresh()
+
+def test_pairs_use_rects_from_the_last_refresh():
+    world = CollisionWorld(cell_size=32)
+    a, b = Box(0, (0, 0, 10, 10)), Box(1, (40, 0, 10, 10))
+    world.add(a)
+    world.add(b)
+    b.box.x = 5
+    assert found_pairs(world) == set()
+    world.refresh()
+    assert found_pairs(world) == {(0, 1)}
+    world.remove(b)
+    assert found_pairs(world) == set()
+
+def test_resolve_tells_both_entities():
+    world = CollisionWorld(cell_size=32)
+    boxes = [Box(0, (0, 0, 10, 10)), Box(1, (5, 5, 10, 10)), Box(2, (100, 100, 10, 10))]
+    for box in boxes:
+        world.add(box)
+    world.resolve()
+    assert [box.hits for box in boxes] == [[1], [0], []]
+
+def make_game():
+    surf = pg.Surface((16, 16))
+    assets = {name: [surf] * 16 for name in ('grass', 'stone', 'decor', 'large_decor')}
+    assets['enemy/idle'] = AnimationData([pg.Surface((8, 15))])
+    return types.SimpleNamespace(assets=assets)
+
+def test_physics_rects_in_are_the_cached_solid_tiles():
+    tilemap = Tilemap(make_game(), tile_size=16)
+    for x in range(-4, 8):
+        tilemap.set_tile((x, 3), 'grass', 1)
+    tilemap.set_tile((2, 2), 'decor', 0)  #not solid
+    rects = tilemap.physics_rects_in(pg.Rect(-20, 20, 60, 40))
+    assert sorted(rect.topleft for rect in rects) == [(x * 16, 48) for x in range(-2, 3)]
+    #The same Rect objects every time, nothing is allocated per query
+    assert all(rect is tilemap.physics_rect((rect.x // 16, 3)) for rect in tilemap.physics_rects_in(pg.Rect(-20, 20, 60, 40)))
+
+def test_entity_lands_on_tiles_and_walks_into_a_wall():
+    tilemap = Tilemap(make_game(), tile_size=16)
+    for x in range(0, 20):
+        tilemap.set_tile((x, 10), 'stone', 1)
+    tilemap.set_tile((12, 9), 'stone', 1)
+    entity = PhysicsEntity(make_game(), 'enemy', (40, 100), (8, 15))
+    #Resting on the ground it sinks under a pixel between snaps, the rect stays on top of the tiles
+    for _ in range(120):
+        entity.update(tilemap)
+        assert entity.rect().bottom <= 160
+    assert entity.rect().bottom == 160
+    walls = 0
+    for _ in range(150):
+        entity.update(tilemap, movement=(1, 0))
+        walls += entity.collisions['right']
+        assert entity.rect().right <= 12 * 16
+    assert walls and entity.rect().right == 12 * 16 and entity.rect().bottom == 160
@@ -0,0 +1,92 @@
+import types
+
+import pygame as pg
+
+from scripts.edit_log import EditLog
+from scripts.tilemap import Tilemap
+
+def make_game():
+    surf = pg.Surface((16, 16))
+    return types.SimpleNamespace(assets={name: [surf] * 16 for name in ('grass', 'stone', 'decor', 'large_decor')})
+
+def snapshot(tilemap):
+    return ({loc: (tile['type'], tile['variant']) for loc, tile in tilemap.all_tiles().items()},
+            [dict(tile, pos=list(tile['pos'])) for tile in tilemap.offgrid_tiles])
+
+def make_level(path):
+    tilemap = Tilemap(make_game())
+    for x in range(-40, 40):
+        tilemap.set_tile((x, 10), 'grass', 1)
+        tilemap.set_tile((x, 11), 'stone', 1)
+    tilemap.save(path)
+    tilemap = Tilemap(make_game())
+    tilemap.load(path)
+    tilemap.stream((0, 0, 400, 300))
+    return tilemap
+
+def test_strokes_undo_and_redo_as_one_step(tmp_path):
+    tilemap = make_level(str(tmp_path / 'map.lvl'))
+    edits = EditLog(tilemap, str(tmp_path / 'map.lvl'))
+    before = snapshot(tilemap)
+    edits.begin()
+    for x in range(5):
+        assert edits.set_tile((x, 5), 'stone', 2)
+    assert not edits.set_tile((4, 5), 'stone', 2)  #already there, not recorded
+    edits.remove_tile((0, 10))
+    edits.end()
+    after = snapshot(tilemap)
+
+    assert edits.undo()
+    assert snapshot(tilemap) == before
+    assert edits.redo()
+    assert snapshot(tilemap) == after
+    assert not edits.redo()
+    tilemap.close_level()
+
+def test_autotiled_edits_undo_their_neighbours(tmp_path):
+    tilemap = make_level(str(tmp_path / 'map.lvl'))
+    edits = EditLog(tilemap, str(tmp_path / 'map.lvl'))
+    before = snapshot(tilemap)
+    edits.set_tile((0, 9), 'grass', 0, autotile=True)
+    edits.remove_tile((5, 10), autotile=True)
+    assert snapshot(tilemap) != before
+    edits.undo()
+    edits.undo()
+    assert snapshot(tilemap) == before
+    tilemap.close_level()
+
+def test_undo_redo_after_journal_reload(tmp_path):
+    path = str(tmp_path / 'map.lvl')
+    tilemap = make_level(path)
+    edits = EditLog(tilemap, path)
+    edits.set_tile((3, 3), 'stone', 4)
+    edits.remove_tile((-35, 11))  #a chunk away from the view
+    edits.add_offgrid({'type': 'decor', 'variant': 2, 'pos': [40.5, 60.0]})
+    edits.save()
+    assert (tmp_path / 'map.lvl.journal').exists()
+    saved = snapshot(tilemap)
+    tilemap.close_level()
+
+    #The journal is replayed on load, edits on top of it undo back to the saved state, not the base file
+    reloaded = Tilemap(make_game())
+    reloaded.load(path)
+    assert snapshot(reloaded) == saved
+    edits = EditLog(reloaded, path)
+    edits.begin()
+    edits.set_tile((-36, 11), 'grass', 7)
+    edits.remove_tile((3, 3))
+    edits.end()
+    edited = snapshot(reloaded)
+    edits.undo()
+    assert snapshot(reloaded) == saved
+    edits.redo()
+    assert snapshot(reloaded) == edited
+
+    #Compacting folds the journal into the map file
+    edits.compact()
+    assert not (tmp_path / 'map.lvl.journal').exists()
+    reloaded.close_level()
+    final = Tilemap(make_game())
+    final.load(path)
+    assert snapshot(final) == edited
+    final.close_level()
@@ -0,0 +1,95 @@
+import math
+import types
+
+import pygame as pg
+
+from modified_game import Game, SIM_DT, MAX_FRAME_TIME
+from scripts.entities import PhysicsEntity
+from scripts.utilities import AnimationData
+
+class StepGame(Game):
+    #Just the frame loop: no window, assets or bridge, simulate and render only record what they were asked to do
+    def __init__(self):
+        self.accumulator = 0.0
+        self.sim_time = 0.0
+        self.steps = 0
+        self.alphas = []
+        self.latency = types.SimpleNamespace(maybe_write=lambda: None)
+
+    def handle_events(self):
+        pass
+
+    def poll_eeg(self):
+        pass
+
+    def simulate(self):
+        self.steps += 1
+        self.sim_time += SIM_DT
+
+    def render(self, alpha=1.0):
+        self.alphas.append(alpha)
+
+def run_frames(fps, seconds):
+    game = StepGame()
+    for _ in range(round(fps * seconds)):
+        game.step(1 / fps)
+    return game
+
+def test_steps_follow_game_time_not_frame_rate():
+    for fps in (24, 30, 60, 75, 144, 240):
+        game = run_frames(fps, 3)
+        assert abs(game.steps - 3 / SIM_DT) <= 1, fps
+        assert all(0 <= alpha < 1 for alpha in game.alphas)
+
+def test_alpha_is_the_leftover_fraction_of_a_step():
+    game = StepGame()
+    game.step(SIM_DT * 0.25)
+    game.step(SIM_DT * 0.5)
+    game.step(SIM_DT * 0.5)
+    assert game.steps == 1
+    for alpha, expected in zip(game.alphas, (0.25, 0.75, 0.25)):
+        assert math.isclose(alpha, expected, abs_tol=1e-9)
+
+def test_a_long_stall_is_capped():
+    game = StepGame()
+    game.step(5.0)
+    assert abs(game.steps - MAX_FRAME_TIME / SIM_DT) <= 1
+    assert 0 <= game.alphas[-1] < 1
+
+def test_jump_cooldown_counts_simulated_time():
+    #Gamma stays above the threshold, the player may jump once per cooldown at any frame rate
+    class JumpGame(StepGame):
+        def __init__(self):
+            super().__init__()
+            self.use_eeg_control = True
+            self.eeg_source = lambda sim_time: (200.0, 900.0)
+            self.eeg_state = {}
+            self.movement = [False, False]
+            self.beta_threshold = self.gamma_threshold = 400
+            self.last_jump_time = -math.inf
+            self.jump_cooldown = 1.0
+            self.jumps = []
+            self.player = types.SimpleNamespace(jump=lambda: self.jumps.append(self.sim_time))
+
+        def simulate(self):
+            self.process_eeg_input()
+            super().simulate()
+
+    for fps in (30, 60, 144):
+        game = JumpGame()
+        for _ in range(round(fps * 3.5)):
+            game.step(1 / fps)
+        assert len(game.jumps) == 4, fps
+        assert game.movement == [False, False]
+
+def test_entity_draws_between_its_last_two_steps():
+    game = types.SimpleNamespace(assets={'enemy/idle': AnimationData([pg.Surface((8, 15))])})
+    entity = PhysicsEntity(game, 'enemy', (10, 20), (8, 15))
+    entity.prev_pos = [10, 20]
+    entity.pos = [14, 28]
+    drawn = []
+    surf = types.SimpleNamespace(blit=lambda img, pos: drawn.append(pos))
+    for alpha in (0.0, 0.5, 1.0):
+        entity.render(surf, offset=(2, 4), alpha=alpha)
+    #anim_offset (-2, -2) on top of the blended position
+    assert drawn == [(6, 14), (8, 18), (10, 22)]
@@ -0,0 +1,80 @@
+import random
+
+import pygame as pg
+
+from scripts.hud import HUD, TextCache, SPARKLINE_RECT, PANEL_RECT
+
+class CountingFont:
+    #Wraps a real font and counts how often text is actually rendered
+    def __init__(self, size):
+        self.font = pg.font.Font(None, size)
+        self.calls = 0
+
+    def render(self, text, antialias, color):
+        self.calls += 1
+        return self.font.render(text, antialias, color)
+
+def make_hud():
+    pg.font.init()
+    return HUD(CountingFont(24), CountingFont(16))
+
+def test_text_is_rendered_once_per_content():
+    pg.font.init()
+    font = CountingFont(16)
+    cache = TextCache(limit=3)
+    first = cache.render(font, 'Mode: EEG', (255, 255, 255))
+    assert cache.render(font, 'Mode: EEG', (255, 255, 255)) is first
+    assert font.calls == 1
+    cache.render(font, 'Mode: EEG', (255, 0, 0))
+    assert font.calls == 2
+
+    #Least recently used goes first once past the limit
+    cache.render(font, 'a', (0, 0, 0))
+    cache.render(font, 'Mode: EEG', (255, 255, 255))
+    cache.render(font, 'b', (0, 0, 0))
+    assert ('Mode: EEG', (255, 0, 0)) not in {key[1:] for key in cache.surfaces}
+    assert cache.render(font, 'Mode: EEG', (255, 255, 255)) is first
+
+def test_steady_frames_render_no_text():
+    hud = make_hud()
+    surf = pg.Surface((400, 300))
+    state = {'beta_power': 120.0, 'gamma_power': 500.0, 'is_eeg_running': True}
+    hud.render(surf, state, True, (400, 400))
+    calls = hud.font.calls
+    for beta in range(0, 2000, 50):
+        hud.render(surf, dict(state, beta_power=float(beta)), True, (400, 400))
+    assert hud.font.calls == calls
+
+def sparkline_pixels(surface):
+    #Column 0 can hold the tail of a segment that started left of the graph, it scrolled in from outside
+    w, h = SPARKLINE_RECT[2:]
+    return [[tuple(surface.get_at((x, y))) for y in range(h)] for x in range(1, w)]
+
+def test_scrolled_sparkline_matches_a_full_redraw():
+    hud = make_hud()
+    surf = pg.Surface((400, 300))
+    rng = random.Random(0)
+    thresholds = (400, 300)
+    for frame in range(3 * SPARKLINE_RECT[2]):
+        if frame == 150:
+            thresholds = (250, 600)  #a threshold change redraws the graph in the new scale
+        #Beta above the threshold and gamma below it, where the lines cross only the drawing order differs
+        state = {'beta_power': rng.uniform(1.1, 2.5) * thresholds[0], 'gamma_power': rng.uniform(-0.2, 0.9) * thresholds[1],
+                 'is_eeg_running': True}
+        hud.render(surf, state, True, thresholds)
+        if frame % 37 == 0 or frame == 149:
+            scrolled = hud.sparkline.copy()
+            hud.redraw_sparkline()
+            assert sparkline_pixels(scrolled) == sparkline_pixels(hud.sparkline), frame
+            hud.sparkline = scrolled  #keep scrolling the incremental one
+
+def test_bars_follow_the_threshold():
+    hud = make_hud()
+    surf = pg.Surface((400, 300))
+    #At the threshold a bar is half full, twice the threshold fills it, negative values show nothing
+    hud.render(surf, {'beta_power': 400.0, 'gamma_power': -5.0, 'is_eeg_running': False}, False, (400, 400))
+    assert surf.get_at((22 + 59, 52))[:3] == (80, 160, 255) and surf.get_at((22 + 61, 52))[:3] == (40, 40, 40)
+    assert surf.get_at((22, 62))[:3] == (40, 40, 40)
+    hud.render(surf, {'beta_power': 5000.0, 'gamma_power': 800.0, 'is_eeg_running': False}, False, (400, 400))
+    assert surf.get_at((22 + 119, 52))[:3] == (80, 160, 255) and surf.get_at((22 + 119, 62))[:3] == (255, 170, 60)
+    assert surf.get_at((PANEL_RECT[0] + PANEL_RECT[2], 52))[:3] == (0, 0, 0)
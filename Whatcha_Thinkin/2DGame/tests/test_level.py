@@ -0,0 +1,111 @@
+import json
+import types
+import random
+
+import pygame as pg
+
+from scripts.level import (LevelFile, chunk_key, key_chunk, convert, append_journal, read_journal,
+                           LEVEL_CHUNK_SIZE)
+from scripts.tilemap import Tilemap
+
+def make_game():
+    surf = pg.Surface((16, 16))
+    return types.SimpleNamespace(assets={name: [surf] * 16 for name in ('grass', 'stone', 'decor', 'large_decor')})
+
+def make_map(seed=0, tiles=3000):
+    #Tiles on both sides of zero so negative chunk keys are covered
+    rng = random.Random(seed)
+    tilemap = Tilemap(make_game(), tile_size=16)
+    for _ in range(tiles):
+        tilemap.set_tile((rng.randint(-200, 200), rng.randint(-60, 60)), rng.choice(('grass', 'stone')), rng.randint(0, 8))
+    tilemap.offgrid_tiles = [{'type': 'decor', 'variant': 1, 'pos': [12.5, -40.0]}, {'type': 'large_decor', 'variant': 2, 'pos': [300, 20]}]
+    return tilemap
+
+def contents(tiles):
+    return {loc: (tile['type'], tile['variant'], tuple(tile['pos'])) for loc, tile in tiles.items()}
+
+def test_chunk_keys_round_trip():
+    chunks = [(-3, -1), (-3, 2), (0, -5), (0, 0), (4, -2), (4, 7), (-(1 << 20), 1 << 20)]
+    assert [key_chunk(chunk_key(chunk)) for chunk in chunks] == chunks
+    assert len({chunk_key(chunk) for chunk in chunks}) == len(chunks)
+
+def test_every_chunk_is_found_by_key(tmp_path):
+    original = make_map(seed=4)
+    path = str(tmp_path / 'map.lvl')
+    original.save(path)
+    level = LevelFile(path)
+    found = {}
+    for chunk in level.chunk_list():
+        assert level.chunk(chunk) is not None
+        found.update(level.tiles(chunk))
+    assert contents(found) == contents(original.tilemap)
+    level.close()
+
+def test_lvl_round_trip(tmp_path):
+    original = make_map()
+    path = str(tmp_path / 'map.lvl')
+    original.save(path)
+
+    loaded = Tilemap(make_game(), tile_size=8)
+    loaded.load(path)
+    assert loaded.tile_size == 16
+    assert loaded.tilemap == {}  #nothing is read until it's streamed in
+    assert contents(loaded.all_tiles()) == contents(original.tilemap)
+    assert loaded.offgrid_tiles == original.offgrid_tiles
+    assert loaded.level.chunk((1000, 1000)) is None
+    loaded.close_level()
+
+def test_json_and_lvl_convert_both_ways(tmp_path):
+    original = make_map(seed=1)
+    original.save(str(tmp_path / 'map.json'))
+    convert(str(tmp_path / 'map.json'), str(tmp_path / 'map.lvl'))
+    convert(str(tmp_path / 'map.lvl'), str(tmp_path / 'back.json'))
+    with open(tmp_path / 'map.json') as f, open(tmp_path / 'back.json') as g:
+        first, second = json.load(f), json.load(g)
+    assert first['tilemap'] == second['tilemap']
+    assert first['offgrid'] == second['offgrid']
+
+def test_stream_loads_only_chunks_near_the_view(tmp_path):
+    path = str(tmp_path / 'map.lvl')
+    make_map(seed=2).save(path)
+    tilemap = Tilemap(make_game())
+    tilemap.load(path)
+    tilemap.stream((0, 0, 400, 300))
+    chunk_px = 16 * LEVEL_CHUNK_SIZE
+    for x, y in tilemap.tilemap:
+        assert -3 * chunk_px <= x * 16 < 4 * chunk_px
+    assert tilemap.tilemap
+    #Moving far away drops the old chunks again
+    tilemap.stream((-3000, 0, 400, 300))
+    assert all(x * 16 < -1000 for x, _ in tilemap.tilemap)
+    tilemap.close_level()
+
+def test_saving_a_streamed_map_keeps_chunks_that_were_never_loaded(tmp_path):
+    original = make_map(seed=3)
+    path = str(tmp_path / 'map.lvl')
+    original.save(path)
+    tilemap = Tilemap(make_game())
+    tilemap.load(path)
+    tilemap.stream((0, 0, 400, 300))
+    tilemap.set_tile((2, 2), 'stone', 5)
+    tilemap.remove_tile((-150, 10))  #outside the view, its chunk is read in first
+    tilemap.save(path)
+
+    expected = contents(original.tilemap)
+    expected[(2, 2)] = ('stone', 5, (2, 2))
+    expected.pop((-150, 10), None)
+    reloaded = Tilemap(make_game())
+    reloaded.load(path)
+    assert contents(reloaded.all_tiles()) == expected
+    tilemap.close_level()
+    reloaded.close_level()
+
+def test_journal_skips_a_torn_last_record(tmp_path):
+    path = str(tmp_path / 'map.lvl.journal')
+    append_journal(path, 16, {(0, 0): [[1, 2, 'grass', 3]]})
+    append_journal(path, 16, {(-1, 0): []}, offgrid=[])
+    with open(path, 'a') as f:
+        f.write('{"chunk_size": 16, "chu')
+    records = list(read_journal(path))
+    assert [list(record['chunks']) for record in records] == [[(0, 0)], [(-1, 0)]]
+    assert records[1]['offgrid'] == []
@@ -0,0 +1,72 @@
+import math
+import types
+import random
+
+import numpy as np
+import pygame as pg
+
+from scripts.particles import Particle, ParticleSystem
+from scripts.utilities import AnimationData
+
+SWAY = (0.035, 0.3)
+
+def leaf_images():
+    #Different sizes per frame so the centring offset is checked too
+    return [pg.Surface((4 + i, 6 + i)) for i in range(4)]
+
+def test_matches_one_object_per_particle():
+    #The loop the game used to run: update each Particle, sway it on its new frame, drop it once killed
+    images = leaf_images()
+    leaf = AnimationData(images, img_dur=20, loop=False)
+    game = types.SimpleNamespace(assets={'particles1/leaf': leaf})
+    system = ParticleSystem.from_animation(leaf, capacity=4, sway=SWAY)
+    particles = []
+    rng = random.Random(0)
+    for step in range(400):
+        if step < 250 and rng.random() < 0.3:
+            pos = (rng.uniform(0, 300), rng.uniform(0, 200))
+            frame = rng.randint(0, 20)
+            particles.append(Particle(game, 'leaf', pos, velocity=[-0.1, 0.3], frame=frame))
+            system.spawn(pos, velocity=(-0.1, 0.3), frame=frame)
+
+        for particle in particles.copy():
+            kill = particle.update()
+            particle.pos[0] += math.sin(particle.animation.frame * SWAY[0]) * SWAY[1]
+            if kill:
+                particles.remove(particle)
+        system.update()
+
+        expected = sorted((round(p.pos[0], 6), round(p.pos[1], 6), p.animation.frame) for p in particles)
+        live = np.flatnonzero(system.alive)
+        got = sorted((round(x, 6), round(y, 6), f) for (x, y), f in zip(system.pos[live].tolist(), system.frame[live].tolist()))
+        assert got == expected, step
+    assert len(system) == 0
+
+def test_dead_slots_are_reused():
+    system = ParticleSystem(leaf_images(), img_dur=2, capacity=8)
+    #Steady spawning within the lifetime budget never grows the pool
+    for _ in range(200):
+        system.spawn((0, 0))
+        system.update()
+    assert len(system.pos) == 8
+    assert len(system) + len(system.free) == 8
+    assert len(set(system.free)) == len(system.free)
+    assert not system.alive[system.free].any()
+
+def test_grows_when_full():
+    system = ParticleSystem(leaf_images(), img_dur=5, capacity=4)
+    slots = [system.spawn((i, i), velocity=(1, 0)) for i in range(11)]
+    assert len(slots) == len(set(slots)) == 11
+    assert len(system.pos) == 16 and len(system) == 11
+    system.update()
+    np.testing.assert_array_equal(system.pos[slots, 0], np.arange(11) + 1)
+
+def test_render_draws_each_live_particle_centred():
+    images = leaf_images()
+    system = ParticleSystem(images, img_dur=5, capacity=4)
+    system.spawn((50, 40), frame=0)
+    system.spawn((10, 10), frame=12)
+    drawn = []
+    surf = types.SimpleNamespace(blits=lambda blits, doreturn=True: drawn.extend(blits))
+    system.render(surf, offset=(5, 5))
+    assert [(img.get_size(), pos) for img, pos in drawn] == [((4, 6), [43.0, 32.0]), ((6, 8), [2.0, 1.0])]
@@ -0,0 +1,80 @@
+import types
+import random
+
+import pygame as pg
+
+from scripts.spatial import SpatialHash
+from scripts.tilemap import Tilemap
+
+def brute_rect(placed, rect):
+    return [item for item, item_rect in placed if item_rect.colliderect(rect)]
+
+def brute_point(placed, pos):
+    return [item for item, item_rect in placed if item_rect.collidepoint(pos)]
+
+def random_rect(rng):
+    return pg.Rect(rng.randint(-300, 300), rng.randint(-300, 300), rng.randint(1, 150), rng.randint(1, 150))
+
+def test_queries_match_a_linear_scan():
+    #Insert, move and remove at random, negative coordinates and rects over several cells included
+    rng = random.Random(0)
+    grid = SpatialHash(cell_size=32)
+    placed = []  #[item, rect] in insertion order, what the queries are checked against
+    for step in range(2000):
+        action = rng.random()
+        if action < 0.5 or not placed:
+            item = {'n': step}
+            rect = random_rect(rng)
+            grid.insert(item, rect)
+            placed.append([item, rect])
+        elif action < 0.8:
+            entry = rng.choice(placed)
+            entry[1] = random_rect(rng) if rng.random() < 0.5 else entry[1].move(rng.randint(-3, 3), rng.randint(-3, 3))
+            grid.move(entry[0], entry[1])
+        else:
+            entry = placed.pop(rng.randrange(len(placed)))
+            assert grid.remove(entry[0])
+            assert not grid.remove(entry[0])
+
+        query = random_rect(rng)
+        assert grid.query_rect(query, ordered=True) == brute_rect(placed, query)
+        pos = (rng.uniform(-300, 450), rng.uniform(-300, 450))
+        assert sorted(item['n'] for item in grid.query_point(pos)) == sorted(item['n'] for item in brute_point(placed, pos))
+
+    assert len(grid) == len(placed)
+    assert list(grid) == [item for item, _ in placed]
+    #No empty buckets are left behind
+    assert all(grid.cells.values())
+
+def test_items_are_tracked_by_identity():
+    grid = SpatialHash(cell_size=16)
+    a = {'type': 'decor', 'pos': [0, 0]}
+    b = {'type': 'decor', 'pos': [0, 0]}  #equal to a but a different tile
+    grid.insert(a, (0, 0, 8, 8))
+    grid.insert(b, (4, 4, 8, 8))
+    assert a in grid and b in grid
+    grid.remove(a)
+    assert b in grid and a not in grid
+    assert grid.query_point((5, 5)) == [b]
+
+def test_reinsert_moves_to_the_end_of_the_order():
+    grid = SpatialHash(cell_size=16)
+    items = [{'n': i} for i in range(3)]
+    for item in items:
+        grid.insert(item, (0, 0, 10, 10))
+    grid.insert(items[0], (2, 2, 10, 10))
+    assert grid.query_rect((0, 0, 16, 16), ordered=True) == [items[1], items[2], items[0]]
+    assert grid.rect_of(items[0]) == pg.Rect(2, 2, 10, 10)
+
+def test_offgrid_lookup_uses_the_image_rect():
+    assets = {'decor': [pg.Surface((8, 8))], 'large_decor': [pg.Surface((40, 24))]}
+    tilemap = Tilemap(types.SimpleNamespace(assets=assets), tile_size=16)
+    bush = {'type': 'decor', 'variant': 0, 'pos': [-70.5, 10.0]}
+    tree = {'type': 'large_decor', 'variant': 0, 'pos': [50.0, 60.0]}
+    tilemap.offgrid_tiles = [bush, tree]
+    assert tilemap.offgrid_at((-66, 14)) == [bush]
+    assert tilemap.offgrid_at((89, 83)) == [tree]
+    assert tilemap.offgrid_at((90, 83)) == []
+    tilemap.remove_offgrid(bush)
+    assert tilemap.offgrid_at((-66, 14)) == []
+    assert tilemap.offgrid_tiles == [tree]
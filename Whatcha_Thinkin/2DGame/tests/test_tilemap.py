@@ -0,0 +1,59 @@
+import json
+import types
+
+import pygame as pg
+
+from scripts.tilemap import Tilemap
+
+def make_game():
+    surf = pg.Surface((16, 16))
+    return types.SimpleNamespace(assets={name: [surf] * 16 for name in ('grass', 'stone', 'decor', 'large_decor')})
+
+#map.json as the game and editor have always written it, "x;y" keys
+LEGACY_MAP = {
+    'tilemap': {
+        '0;0': {'type': 'grass', 'variant': 1, 'pos': [0, 0]},
+        '1;0': {'type': 'stone', 'variant': 0, 'pos': [1, 0]},
+        '-1;1': {'type': 'grass', 'variant': 2, 'pos': [-1, 1]},
+        '-12;-3': {'type': 'decor', 'variant': 0, 'pos': [-12, -3]},
+    },
+    'tile_size': 16,
+    'offgrid': [{'type': 'large_decor', 'variant': 2, 'pos': [40.5, -8.0]}],
+}
+
+def load_legacy(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_text(json.dumps(LEGACY_MAP))
+    tilemap = Tilemap(make_game())
+    tilemap.load(str(path))
+    return tilemap
+
+def test_json_keys_load_as_int_tuples(tmp_path):
+    tilemap = load_legacy(tmp_path)
+    assert set(tilemap.tilemap) == {(0, 0), (1, 0), (-1, 1), (-12, -3)}
+    assert tilemap.get_tile((-12, -3))['type'] == 'decor'
+    assert tilemap.tilemap[(-1, 1)]['pos'] == [-1, 1]
+
+def test_save_writes_the_same_json_keys(tmp_path):
+    tilemap = load_legacy(tmp_path)
+    tilemap.save(str(tmp_path / 'saved.json'))
+    saved = json.loads((tmp_path / 'saved.json').read_text())
+    assert saved == LEGACY_MAP
+
+def test_lookups_use_tuple_keys(tmp_path):
+    tilemap = load_legacy(tmp_path)
+    #Around (0, 0): grass, stone and the tile at (-1, 1), decor is far away and not a physics tile anyway
+    assert len(tilemap.tile_around((8, 8))) == 3
+    assert sorted(rect.topleft for rect in tilemap.physics_rects_around((8, 8))) == [(-16, 16), (0, 0), (16, 0)]
+    tilemap.set_tile((5.0, 6.0), 'stone', 3)
+    assert tilemap.get_tile((5, 6))['pos'] == [5, 6]
+    assert tilemap.remove_tile((5, 6))['variant'] == 3
+    assert tilemap.get_tile((5, 6)) is None
+
+def test_extract_removes_while_collecting(tmp_path):
+    tilemap = load_legacy(tmp_path)
+    matches = tilemap.extract([('grass', 1), ('grass', 2), ('large_decor', 2)])
+    #Grid tiles come back in pixels, offgrid ones as they were
+    assert sorted(tuple(tile['pos']) for tile in matches) == [(-16, 16), (0, 0), (40.5, -8.0)]
+    assert set(tilemap.tilemap) == {(1, 0), (-12, -3)}
+    assert tilemap.offgrid_tiles == []
@@ -24,6 +24,13 @@ float y[FILTER_ORDER+1] = {0}; // Output history
 unsigned long lastSampleTime = 0;
 const int samplingInterval = 4;  // 4ms = 250Hz sampling rate (needed for gamma waves)
 
+// Output format, 0 = "raw,voltage,filtered" text lines, 1 = compact binary frames.
+// Binary frame (little endian): uint16 sync word 0xA55A, uint16 sample counter, int16 filtered value in ADC counts.
+// Run the Python scripts with the environment variable EEG_SERIAL_FORMAT=binary to read it.
+#define BINARY_OUTPUT 0
+const uint16_t SYNC_WORD = 0xA55A;
+uint16_t sampleCounter = 0;
+
 void setup() {
   Serial.begin(115200);  // Fast serial for EEG data
   Wire.begin();          // Initialize I2C
@@ -41,7 +48,9 @@ void setup() {
   ads.setDataRate(RATE_ADS1115_860SPS);
   
   // Brief startup message
+#if !BINARY_OUTPUT
   Serial.println("raw,voltage,filtered");
+#endif
 }
 
 // Apply Butterworth filter to input sample
@@ -90,11 +99,23 @@ void loop() {
     // Apply bandpass filter to capture both beta (13-30Hz) and gamma (30-100Hz) waves
     float filtered = applyFilter(dc_removed);
     
+#if BINARY_OUTPUT
+    // 6 bytes per sample instead of ~20 characters of text
+    int16_t filtered_counts = (int16_t)constrain(filtered / 7.8125, -32768, 32767);
+    uint8_t frame[6] = {
+      (uint8_t)(SYNC_WORD & 0xFF), (uint8_t)(SYNC_WORD >> 8),
+      (uint8_t)(sampleCounter & 0xFF), (uint8_t)(sampleCounter >> 8),
+      (uint8_t)(filtered_counts & 0xFF), (uint8_t)((uint16_t)filtered_counts >> 8)
+    };
+    Serial.write(frame, sizeof(frame));
+    sampleCounter++;
+#else
     // Send data to Python in easily parseable format
     Serial.print(raw_value);
     Serial.print(",");
     Serial.print(voltage_uv);
     Serial.print(",");
     Serial.println(filtered);
+#endif
   }
 }
@@ -2,27 +2,41 @@ import serial
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from scipy import signal
+import os
 import time
-from collections import deque
+
+from ring_buffer import RingBuffer
+from serial_ingest import make_parser
+from timeline import SampleTimeline
+from band_power import StreamingBandPower, hann_window, rfft_freqs
 
 #Serial port configuration
-PORT = 'COM3' 
+PORT = os.environ.get('EEG_PORT', 'COM3')  #EEG_PORT points it at another port, e.g. the pty from synthetic_eeg.py
 BAUD_RATE = 115200
+SERIAL_FORMAT = os.environ.get('EEG_SERIAL_FORMAT', 'csv')  #'csv' for the text lines, 'binary' for the framed int16 output
+SERIAL_TIMEOUT = 0.05  #read() blocks at most this long when the port is idle
+CHANNELS = int(os.environ.get('EEG_CHANNELS', 1))  #Electrodes on the board, 1 reads the 'raw,voltage,filtered' lines, more reads one column per channel
 
 #Buffer size for analysis
 BUFFER_SIZE = 512  
-EEG_buffer = deque(maxlen=BUFFER_SIZE)
-time_buffer = deque(maxlen=BUFFER_SIZE)
+EEG_buffer = RingBuffer(BUFFER_SIZE, CHANNELS)  #Samples (channels x time) and their timestamps, written by the serial thread
 
 #Sampling parameters - 250Hz to match Arduino's
-sampling_rate = 250 
+sampling_rate = int(os.environ.get('EEG_SAMPLING_RATE', 250))
 nyquist = sampling_rate / 2
 
+#Per-sample timestamps from the sample counter, also tracks the effective rate and dropped samples
+timeline = SampleTimeline(sampling_rate)
+
 #Frequency bands (Hz)
 beta_band = [13, 30]    #Beta waves
 gamma_band = [30, 45]   #Gamma waves
 
+#Streaming band powers, fed only the samples that arrived since the last tick
+band_engine = StreamingBandPower({'beta': beta_band, 'gamma': gamma_band}, sampling_rate,
+                                 window_size=BUFFER_SIZE, channels=CHANNELS)
+samples_processed = 0
+
 #Initialize plots
 plt.style.use('dark_background')
 fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 8))
@@ -42,6 +56,7 @@ ax1.set_xlabel('Time (s)')
 ax1.set_ylabel('Amplitude (μV)')
 ax1.set_ylim(-100, 150)
 ax1.grid(True, alpha=0.3)
+reader_status_text = ax1.text(0.01, 0.92, '', transform=ax1.transAxes, color='gray', fontsize=9)
 
 ax2.set_title('Frequency Spectrum')
 ax2.set_xlabel('Frequency (Hz)')
@@ -54,79 +69,71 @@ ax3.set_title('Brain Wave Power')
 ax3.set_ylim(0, 1000)
 ax3.grid(True, alpha=0.3)
 
-def apply_bandpass_filter(data, lowcut, highcut, fs, order=4):
-    nyq = 0.5 * fs
-    low = lowcut / nyq
-    high = highcut / nyq
-    b, a = signal.butter(order, [low, high], btype='band')
-    return signal.filtfilt(b, a, data)
-
-def compute_band_power(data, fft_result, freqs, low, high):
-    indices = np.where((freqs >= low) & (freqs <= high))[0]
-    return np.sum(np.abs(fft_result[indices])**2) / len(indices) if len(indices) > 0 else 0
-
 def init():
-    return line_time, line_fft, beta_bar, gamma_bar
+    return line_time, line_fft, beta_bar, gamma_bar, reader_status_text
 
 #Update plots
-def update(frame): 
-    current_time = time.time()
-    data = np.array(list(EEG_buffer))
-    times = np.array(list(time_buffer)) - current_time
+def update(frame):
+    global samples_processed
+    current_time = timeline.clock()
+    data, times = EEG_buffer.latest()  #Copies of the newest samples, channels x time
+    times = times - current_time
     
-    if len(data) < BUFFER_SIZE/4:  #Wait for sufficient data
-        return line_time, line_fft, beta_bar, gamma_bar
+    #Feed the band engine only the samples that arrived since the last tick
+    new_data, _, samples_processed = EEG_buffer.since(samples_processed)
+    powers = band_engine.process(new_data)
+    
+    if len(times) < BUFFER_SIZE/4:  #Wait for sufficient data
+        return line_time, line_fft, beta_bar, gamma_bar, reader_status_text
+    
+    #Reader health, a rate well under nominal or a growing drop count means it is falling behind
+    stats = timeline.stats()
+    reader_status_text.set_text(f"{stats['effective_rate']:.1f} Hz, {stats['dropped']} dropped, lag {stats['lag'] * 1000:.0f} ms")
     
     #Update time domain plot
-    line_time.set_data(times, data)
+    line_time.set_data(times, data[0])  #First channel
     ax1.set_xlim(min(times), max(times))
     
-    #Apply additional bandpass filtering for analysis 
-    filtered_beta = apply_bandpass_filter(data, beta_band[0], beta_band[1], sampling_rate)
-    filtered_gamma = apply_bandpass_filter(data, gamma_band[0], gamma_band[1], sampling_rate)
-    
     #Perform FFT
-    n = len(data)
-    fft_data = np.fft.rfft(data * np.hanning(n))
-    freqs = np.fft.rfftfreq(n, d=1.0/sampling_rate)
+    n = len(times)
+    fft_data = np.fft.rfft(data * hann_window(n), axis=-1)  #All channels at once, window and axis cached per size
+    freqs = rfft_freqs(n, sampling_rate)
     
     
-    line_fft.set_data(freqs, np.abs(fft_data))    #Update frequency domain plot 
+    line_fft.set_data(freqs, np.abs(fft_data).mean(axis=0))    #Update frequency domain plot 
     
-    #Calculate band powers
-    beta_power = compute_band_power(filtered_beta, fft_data, freqs, beta_band[0], beta_band[1])
-    gamma_power = compute_band_power(filtered_gamma, fft_data, freqs, gamma_band[0], gamma_band[1])
+    #Band powers from the streaming engine, no refiltering of the whole buffer
+    beta_power = float(powers['beta'].mean())  #Channels combined for the bars
+    gamma_power = float(powers['gamma'].mean())
     
     #Update bar heights
     beta_bar.set_height(beta_power)
     gamma_bar.set_height(gamma_power)
     ax3.set_ylim(0, max(1000, beta_power * 1.2, gamma_power * 1.2))
     
-    return line_time, line_fft, beta_bar, gamma_bar
+    return line_time, line_fft, beta_bar, gamma_bar, reader_status_text
 
 def read_serial_data():
+    parser = make_parser(SERIAL_FORMAT, CHANNELS)
+    dropped_seen = 0
     try:
-        with serial.Serial(PORT, BAUD_RATE) as ser:
+        with serial.Serial(PORT, BAUD_RATE, timeout=SERIAL_TIMEOUT) as ser:
             print(f"Connected to {PORT} at {BAUD_RATE} baud")
             ser.flushInput()
+            parser.reset()
             time.sleep(2)
             
             while True:
-                if ser.in_waiting:
-                    try:
-                        line = ser.readline().decode('utf-8').strip()
-                        #Check if it's the header line
-                        if line == "raw,voltage,filtered":
-                            continue
-                            
-                        #Parse data line
-                        raw, voltage, filtered = map(float, line.split(','))
-                        EEG_buffer.append(filtered)
-                        time_buffer.append(time.time())
-                        
-                    except (ValueError, IndexError) as e:
-                        print(f"Error parsing data: {e}")
-                time.sleep(0.001)  #Short delay to prevent CPU overload
+                #Take everything that is waiting in one read, an idle port blocks here instead of spinning
+                chunk = ser.read(ser.in_waiting or 1)
+                samples = parser.feed(chunk)
+                if len(samples) == 0:
+                    continue
+                
+                #Timestamps come from the sample counter, not from when this thread got to the block
+                stamps = timeline.stamp(len(samples), dropped=parser.dropped - dropped_seen)
+                dropped_seen = parser.dropped
+                EEG_buffer.extend(samples, stamps)
                 
     except serial.SerialException as e:
         print(f"Serial connection error: {e}")
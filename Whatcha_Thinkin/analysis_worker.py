@@ -0,0 +1,77 @@
+import time
+import threading
+
+#Computes band powers on its own thread at a fixed hop, so the game's control latency no longer
+#depends on how fast the plot can redraw. Results go to the bridge and to any subscribers,
+#the plot is just one of them and renders whatever the latest snapshot is when it gets around to it.
+
+class AnalysisWorker(threading.Thread):
+    def __init__(self, buffer, engine, bridge=None, hop=0.02, latency=None, clock=time.monotonic):
+        super().__init__(daemon=True)
+        self.buffer = buffer
+        self.engine = engine
+        self.bridge = bridge
+        self.latency = latency  #LatencyTracker for the analysis and publish stages
+        self.hop = hop
+        self.clock = clock
+
+        self.subscribers = []
+        self.latest = None      #newest snapshot, replaced as a whole so readers never see half an update
+        self.samples_seen = 0
+        self.sample_time = 0.0  #timestamp of the newest sample analysed so far
+        self.ticks = 0
+        self.overruns = 0       #hops that took longer than the hop itself
+        self._stop_event = threading.Event()
+
+    def subscribe(self, callback):
+        #callback(snapshot) runs on the worker thread, keep it short
+        self.subscribers.append(callback)
+
+    def analyse_once(self):
+        new_data, timestamps, self.samples_seen = self.buffer.since(self.samples_seen)
+        fresh = len(timestamps) > 0
+        if fresh:
+            self.sample_time = float(timestamps[-1])
+        powers = self.engine.process(new_data)
+        if not self.engine.ready:
+            return None
+
+        snapshot = {
+            'beta_power': float(powers['beta'].mean()),
+            'gamma_power': float(powers['gamma'].mean()),
+            'beta_channels': powers['beta'],
+            'gamma_channels': powers['gamma'],
+            'sample_count': self.samples_seen,
+            'sample_time': self.sample_time,
+            'time': self.clock(),
+        }
+        self.latest = snapshot
+        if self.bridge is not None:
+            self.bridge.update_eeg_data(snapshot['beta_power'], snapshot['gamma_power'],
+                                        snapshot['beta_channels'], snapshot['gamma_channels'],
+                                        snapshot['sample_time'], snapshot['time'])
+        if self.latency is not None and fresh:
+            #Hops without new samples republish the same data and say nothing about latency
+            self.latency.record('analysis', self.sample_time, snapshot['time'])
+            self.latency.record('publish', self.sample_time)
+        for callback in self.subscribers:
+            callback(snapshot)
+        return snapshot
+
+    def run(self):
+        next_tick = self.clock()
+        while not self._stop_event.is_set():
+            self.analyse_once()
+            self.ticks += 1
+
+            next_tick += self.hop
+            delay = next_tick - self.clock()
+            if delay < 0:
+                #Fell behind, skip the missed hops instead of bursting to catch up
+                self.overruns += 1
+                next_tick = self.clock()
+                delay = 0
+            self._stop_event.wait(delay)
+
+    def stop(self):
+        self._stop_event.set()
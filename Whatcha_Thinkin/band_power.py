@@ -0,0 +1,121 @@
+import numpy as np
+from functools import lru_cache
+
+#Streaming band power for the EEG pipeline. Only depends on numpy so the game side
+#can run it without matplotlib and without waiting on the plot frame rate.
+#Samples are channels x time, every step runs along axis=-1 for all channels in one call.
+
+@lru_cache(maxsize=None)
+def hann_window(n):
+    #Periodic Hann, the window the engine's 3 tap kernel applies, so the plotted spectrum matches the bars
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)
+
+@lru_cache(maxsize=None)
+def rfft_freqs(n, fs):
+    return np.fft.rfftfreq(n, d=1.0/fs)
+
+@lru_cache(maxsize=None)
+def band_bins(n, fs, low, high):
+    #Bin indices that compute_band_power averages over, cached per buffer size
+    freqs = rfft_freqs(n, fs)
+    return np.where((freqs >= low) & (freqs <= high))[0]
+
+def compute_band_power(fft_result, freqs, low, high):
+    #Reference for StreamingBandPower: mean |X|^2 over the band's bins of a hann_window'd rfft,
+    #works on one spectrum or a channels x bins stack, giving one power per channel
+    indices = np.where((freqs >= low) & (freqs <= high))[0]
+    return np.sum(np.abs(fft_result[..., indices])**2, axis=-1) / len(indices) if len(indices) > 0 else 0
+
+class StreamingBandPower:
+    def __init__(self, bands, fs, window_size=512, channels=1, resync_interval=None):
+        #bands maps a name to its (low, high) edges in Hz, e.g. {'beta': (13, 30), 'gamma': (30, 45)}
+        self.bands = {name: (float(low), float(high)) for name, (low, high) in bands.items()}
+        self.fs = fs
+        self.n = window_size
+        self.channels = channels
+        self.resync_interval = resync_interval or window_size
+
+        #Sample history for the sliding window, oldest sample sits at self.pos
+        self.history = np.zeros((channels, self.n))
+        self.pos = 0
+        self.count = 0
+        self.since_resync = 0
+
+        #Sliding DFT over every bin a band needs plus one on each side for the Hann window
+        self.band_slices = {}
+        needed = set()
+        for name, (low, high) in self.bands.items():
+            bins = band_bins(self.n, fs, low, high)
+            self.band_slices[name] = bins
+            for k in bins:
+                needed.update((k - 1, k, k + 1))
+        self.bins = np.array(sorted(k for k in needed if 0 <= k <= self.n // 2))
+        lookup = {int(k): i for i, k in enumerate(self.bins)}
+        missing = len(self.bins) #points at the zero appended to the spectrum
+        self.band_taps = {}
+        for name, bins in self.band_slices.items():
+            self.band_taps[name] = tuple(np.array([lookup.get(int(k) + shift, missing) for k in bins], dtype=int)
+                                         for shift in (0, -1, 1))
+        self.twiddle = np.exp(2j * np.pi * self.bins / self.n)
+        self.spectrum = np.zeros((channels, len(self.bins)), dtype=complex)
+        self._block_twiddles = {}
+
+    @property
+    def ready(self):
+        #Same warm-up rule the plot used: wait for a quarter window of data
+        return self.count >= self.n // 4
+
+    def _block_twiddle(self, m):
+        #w^(m - i) for every sample i of an m-sample block, cached per block length
+        if m not in self._block_twiddles:
+            powers = np.arange(m, 0, -1)
+            self._block_twiddles[m] = (self.twiddle[None, :] ** powers[:, None], self.twiddle ** m)
+        return self._block_twiddles[m]
+
+    def _ordered_history(self):
+        return np.concatenate((self.history[:, self.pos:], self.history[:, :self.pos]), axis=-1)
+
+    def resync(self):
+        #Recompute the tracked bins exactly, this bounds the float drift the recursive update picks up
+        self.spectrum = np.fft.rfft(self._ordered_history(), axis=-1)[:, self.bins]
+        self.since_resync = 0
+
+    def process(self, samples):
+        #samples is channels x m, a 1-D block is taken as a single channel. Returns the band powers after the block
+        samples = np.asarray(samples, dtype=float).reshape(self.channels, -1)
+        m = samples.shape[-1]
+        if m == 0:
+            return self.powers()
+        if m > self.n:
+            #Only the last window matters for the spectrum
+            self.history[:] = samples[:, -self.n:]
+            self.pos = 0
+            self.count += m
+            self.resync()
+            return self.powers()
+
+        idx = (self.pos + np.arange(m)) % self.n
+        delta = samples - self.history[:, idx]
+        block_twiddle, shift = self._block_twiddle(m)
+        self.spectrum = self.spectrum * shift + delta @ block_twiddle
+
+        self.history[:, idx] = samples
+        self.pos = (self.pos + m) % self.n
+        self.count += m
+        self.since_resync += m
+        if self.since_resync >= self.resync_interval:
+            self.resync()
+        return self.powers()
+
+    def band_power(self, name):
+        #Same scale as compute_band_power: mean |X|^2 over the band's bins of the Hann windowed spectrum,
+        #one value per channel. Hann windowing in the frequency domain is a 3 tap kernel over neighbouring bins.
+        center, left, right = self.band_taps[name]
+        if len(center) == 0:
+            return np.zeros(self.channels)
+        padded = np.concatenate((self.spectrum, np.zeros((self.channels, 1))), axis=-1)
+        values = 0.5 * padded[:, center] - 0.25 * (padded[:, left] + padded[:, right])
+        return np.sum(np.abs(values)**2, axis=-1) / len(center)
+
+    def powers(self):
+        return {name: self.band_power(name) for name in self.bands}
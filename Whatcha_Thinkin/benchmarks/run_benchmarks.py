@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+
+#Standalone benchmarks for the hot paths: DSP, bridge, tilemap, entities, animation, particles, HUD, asset loading and one headless game frame.
+#    python benchmarks/run_benchmarks.py --output results.json
+#    python benchmarks/run_benchmarks.py --compare results.json   (exits 1 when something got slower)
+#Results are JSON: one entry per case with per-call timings in seconds, plus the machine and commit.
+#Every bridge the benchmarks open (their own and the game's) uses a private shared block and a scratch
+#eeg_data.json, so a run never touches a processor or game running at the same time.
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ['EEG_SHM_NAME'] = f'whatcha_thinkin_bench_{os.getpid()}'
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EEG_DIR = os.path.dirname(HERE)
+GAME_DIR = os.path.join(EEG_DIR, '2DGame')
+sys.path[:0] = [EEG_DIR, GAME_DIR]
+
+import numpy as np
+import pygame as pg
+
+BUFFER_SIZES = [256, 512, 2048]
+CHANNEL_COUNTS = [1, 8]
+TILE_COUNTS = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_TILE_COUNTS = [1_000, 10_000]
+ENTITY_COUNTS = [10, 100, 500]
+PARTICLE_COUNTS = [100, 1_000, 10_000]
+
+def measure(fn, min_time=0.2, repeat=5):
+    #Like timeit.autorange: grow the loop count until one run takes min_time, then keep the best of `repeat`
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    runs = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        runs.append((time.perf_counter() - start) / loops)
+    return {'loops': loops, 'min': min(runs), 'median': float(np.median(runs)), 'max': max(runs)}
+
+class Suite:
+    def __init__(self, pattern=None, min_time=0.2, repeat=5):
+        self.pattern = pattern
+        self.min_time = min_time
+        self.repeat = repeat
+        self.results = []
+
+    def wanted(self, name):
+        return self.pattern is None or self.pattern in name
+
+    def run(self, name, fn, min_time=None, **params):
+        if not self.wanted(name):
+            return
+        timing = measure(fn, self.min_time if min_time is None else min_time, self.repeat)
+        self.results.append({'name': name, 'params': params, **timing})
+        label = ', '.join(f'{k}={v}' for k, v in params.items())
+        print(f"{name:<32} {label:<28} {timing['min'] * 1e6:12.2f} us")
+
+    def skip(self, name, reason):
+        if self.wanted(name):
+            self.results.append({'name': name, 'skipped': reason})
+            print(f"{name:<32} skipped: {reason}")
+
+def bench_dsp(suite):
+    from band_power import StreamingBandPower, compute_band_power, hann_window, rfft_freqs
+    rng = np.random.default_rng(0)
+    fs = 250
+    for n in BUFFER_SIZES:
+        for channels in CHANNEL_COUNTS:
+            data = rng.standard_normal((channels, n)) * 20
+            engine = StreamingBandPower({'beta': (13, 30), 'gamma': (30, 45)}, fs, window_size=n, channels=channels)
+            engine.process(data)
+            block = data[:, :max(n // 16, 1)]
+            suite.run('dsp.StreamingBandPower.process', lambda: engine.process(block),
+                      buffer=n, channels=channels, block=block.shape[-1])
+            fft_result = np.fft.rfft(data * hann_window(n), axis=-1)
+            freqs = rfft_freqs(n, fs)
+            suite.run('dsp.compute_band_power', lambda: compute_band_power(fft_result, freqs, 13, 30),
+                      buffer=n, channels=channels)
+
+def bench_bridge(suite, workdir):
+    from shared_data import EEGDataBridge
+    for transport in ('shm', 'json'):
+        bridge = EEGDataBridge(os.path.join(workdir, 'eeg_data.json'), transport=transport)
+        for channels in CHANNEL_COUNTS:
+            values = [float(i) for i in range(channels)]
+            suite.run('bridge.update_eeg_data', lambda: bridge.update_eeg_data(1.0, 2.0, values, values, 1.0, 1.0),
+                      transport=transport, channels=channels)
+            suite.run('bridge.read_eeg_data', bridge.read_eeg_data, transport=transport, channels=channels)
+        bridge.close(unlink=True)
+
+def make_tilemap(tilemap, n_tiles, seed=0):
+    #Rolling ground with floating platforms, about n_tiles physics tiles
+    rng = random.Random(seed)
+    width = max(16, int((n_tiles * 4) ** 0.5))
+    x = y = 0
+    count = 0
+    while count < n_tiles:
+        ground = 40 + int(8 * np.sin(x / 23))
+        for depth in range(4):
+            if count >= n_tiles:
+                break
+            tilemap.set_tile((x, ground + depth + y * 60), 'grass' if depth == 0 else 'stone', 1)
+            count += 1
+        if rng.random() < 0.3 and count < n_tiles:
+            tilemap.set_tile((x, ground - rng.randint(4, 10) + y * 60), 'grass', 1)
+            count += 1
+        x += 1
+        if x >= width:
+            x = 0
+            y += 1
+    for i in range(n_tiles // 50):
+        kind = ('large_decor', 2) if i % 10 == 0 else ('decor', i % 4) #trees spawn leaves in the game
+        tilemap.add_offgrid({'type': kind[0], 'variant': kind[1],
+                             'pos': [rng.uniform(0, width * 16), rng.uniform(0, (y + 1) * 960)]})
+    return width, (y + 1) * 60
+
+def placeholder_assets():
+    surf = pg.Surface((16, 16))
+    return {name: [surf] * 16 for name in ('grass', 'stone', 'decor', 'large_decor')}
+
+def bench_tilemap(suite, workdir, tile_counts):
+    from scripts.tilemap import Tilemap
+    game = types.SimpleNamespace(assets=placeholder_assets())
+    display = pg.Surface((400, 300))
+    rng = random.Random(1)
+    for n in tile_counts:
+        tilemap = Tilemap(game, tile_size=16)
+        width, height = make_tilemap(tilemap, n)
+        points = [(rng.uniform(0, width * 16), rng.uniform(0, height * 16)) for _ in range(256)]
+        #The camera pans across the map like it follows a player, 2 px a frame
+        start = (rng.randrange(0, max(1, width * 16 - 2400)), rng.randrange(0, max(1, height * 16 - 300)))
+        offsets = [(start[0] + 2 * i, start[1] + i // 4) for i in range(1000)]
+
+        def physics():
+            for pos in points:
+                tilemap.physics_rects_around(pos)
+        suite.run('tilemap.physics_rects_around', physics, tiles=n, queries=len(points))
+
+        frame = iter(range(1 << 62))
+        suite.run('tilemap.render', lambda: tilemap.render(display, offset=offsets[next(frame) % len(offsets)]), tiles=n)
+
+        #A pass over the big maps takes long enough on its own, no need to loop it
+        suite.run('tilemap.autotile', tilemap.autotile, min_time=0 if n >= 100_000 else None, tiles=n)
+
+        #What a paint stroke in the editor costs with live autotiling, one cell per call
+        cells = [(int(x // 16), int(y // 16)) for x, y in points]
+
+        def paint():
+            for cell in cells:
+                tilemap.set_tile(cell, 'stone', 0)
+                tilemap.autotile_around(cell)
+        suite.run('tilemap.autotile_around', paint, tiles=n, edits=len(cells))
+
+        #Opening the same map from map.json and from the streamed binary format, then panning over the binary one
+        paths = {fmt: os.path.join(workdir, f'map{n}.{fmt}') for fmt in ('json', 'lvl')}
+        if suite.wanted('tilemap.load') or suite.wanted('tilemap.stream'):
+            for path in paths.values():
+                tilemap.save(path)
+        loaded = Tilemap(game, tile_size=16)
+        for fmt, path in paths.items():
+            suite.run('tilemap.load', lambda: loaded.load(path), min_time=0 if n >= 100_000 else None, tiles=n, format=fmt)
+
+        if suite.wanted('tilemap.stream'):
+            loaded.load(paths['lvl'])
+
+        def stream():
+            offset = offsets[next(frame) % len(offsets)]
+            loaded.stream((offset[0], offset[1], 400, 300))
+            loaded.render(display, offset=offset)
+        suite.run('tilemap.stream', stream, tiles=n)
+        loaded.close_level()
+
+def bench_entities(suite, tiles=100_000):
+    #Many physics entities walking around one map: tile collisions for each plus the entity broad phase
+    from scripts.tilemap import Tilemap
+    from scripts.entities import PhysicsEntity
+    from scripts.collision import CollisionWorld
+    from scripts.utilities import AnimationData
+    assets = placeholder_assets()
+    assets['enemy/idle'] = AnimationData([pg.Surface((8, 15))])
+    game = types.SimpleNamespace(assets=assets)
+    tilemap = Tilemap(game, tile_size=16)
+    width, _ = make_tilemap(tilemap, tiles)
+    rng = random.Random(2)
+    for count in ENTITY_COUNTS:
+        world = CollisionWorld()
+        entities = []
+        for _ in range(count):
+            entity = PhysicsEntity(game, 'enemy', (rng.uniform(0, min(width, 200) * 16), rng.uniform(0, 30 * 16)), (8, 15))
+            entities.append(entity)
+            world.add(entity)
+        moves = [rng.choice((-1, 0, 1)) for _ in range(count)]
+
+        def frame():
+            for entity, move in zip(entities, moves):
+                entity.update(tilemap, (move, 0))
+            world.refresh()
+            world.resolve()
+        suite.run('entities.frame', frame, entities=count)
+
+def bench_animation(suite):
+    #Entities changing action and facing every few frames and drawing themselves, playheads and flipped frames are reused
+    from scripts.entities import PhysicsEntity
+    from scripts.utilities import AnimationData
+    frames = [pg.Surface((16, 16), pg.SRCALPHA) for _ in range(8)]
+    assets = {'enemy/' + action: AnimationData(frames, img_dur=6) for action in ('idle', 'run', 'jump')}
+    game = types.SimpleNamespace(assets=assets)
+    display = pg.Surface((400, 300))
+    rng = random.Random(5)
+    for count in ENTITY_COUNTS:
+        entities = [PhysicsEntity(game, 'enemy', (rng.uniform(0, 384), rng.uniform(0, 284)), (8, 15)) for _ in range(count)]
+        plan = [(rng.choice(('idle', 'run', 'jump')), rng.random() < 0.5) for _ in range(64)]
+        tick = iter(range(1 << 62))
+
+        def frame():
+            i = next(tick)
+            for n, entity in enumerate(entities):
+                action, flip = plan[(i // 4 + n) % len(plan)]
+                entity.set_action(action)
+                entity.flip = flip
+                entity.animation.update()
+                entity.render(display)
+        suite.run('animation.frame', frame, entities=count)
+
+def bench_particles(suite):
+    #Falling leaves at a steady population: every frame a few die and as many are spawned into the freed slots
+    from scripts.particles import ParticleSystem
+    images = [pg.Surface((5, 5), pg.SRCALPHA) for _ in range(18)]
+    display = pg.Surface((400, 300))
+    rng = random.Random(3)
+    for count in PARTICLE_COUNTS:
+        particles = ParticleSystem(images, img_dur=20, sway=(0.035, 0.3))
+        spawn = lambda: particles.spawn((rng.uniform(0, 400), rng.uniform(0, 300)), (-0.1, 0.3), rng.randint(0, 359))
+        for _ in range(count):
+            spawn()
+
+        def frame():
+            particles.update()
+            while len(particles) < count:
+                spawn()
+            particles.render(display)
+        suite.run('particles.frame', frame, particles=count)
+
+def bench_hud(suite):
+    #The EEG panel with values that move every frame, should cost the same as with values that don't
+    from scripts.hud import HUD
+    hud = HUD(pg.font.Font(None, 24), pg.font.Font(None, 16))
+    display = pg.Surface((400, 300))
+    rng = np.random.default_rng(4)
+    values = rng.uniform(0, 800, (1000, 2)).tolist()
+    for name, states in (('steady', [values[0]]), ('changing', values)):
+        states = [{'beta_power': b, 'gamma_power': g, 'is_eeg_running': i % 2 == 0} for i, (b, g) in enumerate(states)]
+        frame = iter(range(1 << 62))
+        suite.run('hud.render', lambda: hud.render(display, states[next(frame) % len(states)], True, (400, 400)), values=name)
+
+def bench_assets(suite, workdir):
+    #Startup asset loading: every PNG on its own like it used to be, against the baked atlases
+    if not suite.wanted('assets.load'):
+        return
+    import scripts.utilities as utilities
+    import scripts.assets as assets
+    images = os.path.join(GAME_DIR, 'Data', 'images') + os.sep
+    if not os.path.isdir(images):
+        suite.skip('assets.load', f'no images in {images}')
+        return
+    utilities.BASE_IMG_PATH = images
+    assets.BAKED_PATH = os.path.join(workdir, 'baked')
+    pg.display.set_mode((1, 1)) #convert_alpha needs a display
+
+    def from_png():
+        for _, path, size in assets.ASSETS.values():
+            frames = utilities.load_picture(path) if os.path.isdir(images + path) else [utilities.load_image(path)]
+            if size is not None:
+                frames = [pg.transform.scale(frame, size) for frame in frames]
+    suite.run('assets.load', from_png, source='png')
+    assets.bake()
+    suite.run('assets.load', assets.load_assets, source='baked')
+
+def bench_game(suite, workdir, tiles):
+    name = 'game.step'
+    if not suite.wanted(name):
+        return
+    import scripts.utilities as utilities
+    import scripts.assets as assets
+    from scripts.tilemap import Tilemap
+    images = os.path.join(GAME_DIR, 'Data', 'images') + os.sep
+    if not os.path.isdir(images):
+        suite.skip(name, f'no images in {images}')
+        return
+
+    #A generated map.json in a scratch directory, the real images from the repo
+    tilemap = Tilemap(types.SimpleNamespace(assets=placeholder_assets()), tile_size=16)
+    make_tilemap(tilemap, tiles)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        tilemap.save('map.json')
+        utilities.BASE_IMG_PATH = images
+        assets.BAKED_PATH = os.path.join(workdir, 'baked')
+        import modified_game
+        game = modified_game.Game()
+        game.player.pos = [32, 20 * 16]
+        suite.run(name, game.step, tiles=tiles)
+        game.data_bridge.close(unlink=True)
+    finally:
+        os.chdir(cwd)
+        pg.quit()
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=EEG_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pygame': pg.version.ver,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'commit': commit,
+        'time': time.time(),
+    }
+
+def compare(results, baseline_path, threshold):
+    #A case regresses when its best time is more than `threshold` times the baseline's
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r['name'], json.dumps(r.get('params', {}), sort_keys=True))
+    old = {key(r): r for r in baseline['results'] if 'min' in r}
+    regressions = []
+    for result in results:
+        before = old.get(key(result))
+        if before is None or 'min' not in result:
+            continue
+        ratio = result['min'] / before['min']
+        if ratio > threshold:
+            regressions.append((result, ratio))
+            print(f"REGRESSION {result['name']} {result['params']}: {ratio:.2f}x slower")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the EEG and game hot paths')
+    parser.add_argument('--output', metavar='PATH', help='write the results to this json file')
+    parser.add_argument('--compare', metavar='PATH', help='baseline json to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown factor that counts as a regression')
+    parser.add_argument('-k', dest='pattern', help='only run cases whose name contains this')
+    parser.add_argument('--quick', action='store_true', help='small maps and short timings, for a smoke run')
+    args = parser.parse_args()
+
+    suite = Suite(args.pattern, min_time=0.05 if args.quick else 0.2, repeat=3 if args.quick else 5)
+    pg.init()
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_dsp(suite)
+        bench_bridge(suite, workdir)
+        bench_tilemap(suite, workdir, QUICK_TILE_COUNTS if args.quick else TILE_COUNTS)
+        bench_entities(suite)
+        bench_animation(suite)
+        bench_particles(suite)
+        bench_hud(suite)
+        bench_assets(suite, workdir)
+        bench_game(suite, workdir, tiles=10_000)
+
+    report = {'environment': environment(), 'unit': 's', 'results': suite.results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare and compare(suite.results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
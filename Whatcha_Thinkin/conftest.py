@@ -0,0 +1,11 @@
+import os
+import sys
+
+#The EEG modules live in this folder and the game ones are imported as scripts.* from 2DGame, the same
+#paths the programs themselves run with. pygame gets dummy drivers so nothing opens a window or a sound device.
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, '2DGame')]
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
@@ -0,0 +1,71 @@
+import numpy as np
+
+from band_power import StreamingBandPower
+from session_io import SessionReader
+from synthetic_eeg import SyntheticEEG
+
+#Band powers computed in process from a synthetic signal or a recorded session, for driving the game
+#(Game.eeg_source) without the board and without modified_eeg_processing.py running:
+#    python modified_game.py --simulate 6000 --eeg-source synthetic
+#    python modified_game.py --simulate 6000 --eeg-source replay:session.wts
+#Same bands and window as the processor, so thresholds tuned this way carry over to the live setup.
+
+BANDS = {'beta': (13, 30), 'gamma': (30, 45)}
+WINDOW_SIZE = 512
+
+class SessionSamples:
+    #read(n) over a recording: the next n samples as (n, channels), fewer once the recording ends
+    def __init__(self, reader):
+        self.channels = reader.channels
+        self.chunks = reader.chunks()
+        self.current = np.empty((0, reader.channels))
+        self.pos = 0
+
+    def __call__(self, n):
+        blocks = []
+        while n > 0:
+            if self.pos >= len(self.current):
+                chunk = next(self.chunks, None)
+                if chunk is None:
+                    break
+                self.current, self.pos = chunk[0], 0
+            block = self.current[self.pos:self.pos + n]
+            blocks.append(block)
+            self.pos += len(block)
+            n -= len(block)
+        if not blocks:
+            return np.empty((0, self.channels))
+        return np.concatenate(blocks)
+
+class BandPowerSource:
+    def __init__(self, read, sampling_rate, channels=1):
+        #read(n) returns the next n samples as (n, channels)
+        self.read = read
+        self.fs = sampling_rate
+        self.engine = StreamingBandPower(BANDS, sampling_rate, window_size=WINDOW_SIZE, channels=channels)
+        self.samples = 0
+        self.powers = (0.0, 0.0)
+
+    def __call__(self, sim_time):
+        #(beta, gamma) after every sample up to sim_time, channels averaged like the processor does.
+        #Stays at 0 until the window has warmed up and holds the last values once a recording runs out.
+        n = int(sim_time * self.fs) - self.samples
+        if n <= 0:
+            return self.powers
+        self.samples += n
+        samples = self.read(n)
+        if len(samples):
+            powers = self.engine.process(np.asarray(samples, dtype=float).T)
+            if self.engine.ready:
+                self.powers = (float(powers['beta'].mean()), float(powers['gamma'].mean()))
+        return self.powers
+
+def make_eeg_source(spec):
+    #'synthetic' or 'replay:<session file>'
+    if spec == 'synthetic':
+        generator = SyntheticEEG()
+        return BandPowerSource(generator.generate, generator.fs, generator.channels)
+    if spec.startswith('replay:'):
+        reader = SessionReader(spec[len('replay:'):])
+        return BandPowerSource(SessionSamples(reader), reader.sampling_rate, reader.channels)
+    raise ValueError(f"unknown EEG source {spec!r}, expected 'synthetic' or 'replay:<file>'")
@@ -0,0 +1,163 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+from band_power import hann_window, rfft_freqs
+
+#Blitting EEG monitor. Axes stay fixed (the time axis is in samples, newest at 0) so the cached
+#background stays valid and a frame only redraws the animated artists. Lines are min/max decimated
+#to the axes' pixel width, and limits only change when the data crosses a threshold. That costs one
+#full redraw, and the draw_event handler then re-caches the background.
+
+def minmax_decimate(y, buckets):
+    #Keeps the min and max of every bucket, so spikes survive while the line has at most 2 * buckets points
+    n = len(y)
+    if buckets <= 0 or n <= 2 * buckets:
+        return np.arange(-n + 1, 1), y
+    per_bucket = n // buckets
+    start = n - per_bucket * buckets
+    blocks = y[start:].reshape(buckets, per_bucket)
+    x = np.arange(buckets) * per_bucket + start + per_bucket // 2 - n + 1
+    return np.repeat(x, 2), np.column_stack((blocks.min(axis=1), blocks.max(axis=1))).ravel()
+
+class ThresholdScale:
+    #Limits that only move when the data leaves them or shrinks well inside them
+    def __init__(self, low, high, headroom=1.2, shrink=0.25):
+        self.base = (low, high)
+        self.low, self.high = low, high
+        self.headroom = headroom
+        self.shrink = shrink
+
+    def update(self, data_low, data_high):
+        low = min(self.base[0], data_low * self.headroom)
+        high = max(self.base[1], data_high * self.headroom)
+        grow = data_low < self.low or data_high > self.high
+        span = self.high - self.low
+        shrink = (high - low) < span * self.shrink and (self.low, self.high) != self.base
+        if not (grow or shrink):
+            return None
+        self.low, self.high = low, high
+        return low, high
+
+class FastEEGMonitor:
+    def __init__(self, buffer, worker, timeline, bridge, sampling_rate, window, interval_ms=33, max_freq=50):
+        self.buffer = buffer
+        self.worker = worker
+        self.timeline = timeline
+        self.bridge = bridge
+        self.sampling_rate = sampling_rate
+        self.window = window
+        self.max_freq = max_freq
+
+        plt.style.use('dark_background')
+        self.fig, (self.ax1, self.ax2, self.ax3) = plt.subplots(3, 1, figsize=(10, 8))
+        self.fig.suptitle('Real-time EEG Analysis', fontsize=16)
+
+        self.ax1.set_title('EEG Time Domain')
+        self.ax1.set_xlabel(f'Samples ({window / sampling_rate:.1f} s window)')
+        self.ax1.set_ylabel('Amplitude (μV)')
+        self.ax1.set_xlim(-window + 1, 0)
+        self.ax1.set_ylim(-100, 150)
+        self.ax1.grid(True, alpha=0.3)
+
+        self.ax2.set_title('Frequency Spectrum')
+        self.ax2.set_xlabel('Frequency (Hz)')
+        self.ax2.set_ylabel('Power')
+        self.ax2.set_xlim(0, max_freq)
+        self.ax2.set_ylim(0, 1500)
+        self.ax2.grid(True, alpha=0.3)
+
+        self.ax3.set_title('Brain Wave Power')
+        self.ax3.set_ylim(0, 1000)
+        self.ax3.grid(True, alpha=0.3)
+
+        #animated=True keeps these out of the cached background
+        self.line_time = self.ax1.plot([], [], 'c-', lw=1, animated=True)[0]
+        self.line_fft = self.ax2.plot([], [], 'g-', lw=1, animated=True)[0]
+        self.beta_bar = self.ax3.bar(['Beta'], [0], color=['cyan'])[0]
+        self.gamma_bar = self.ax3.bar(['Gamma'], [0], color=['magenta'])[0]
+        self.beta_bar.set_animated(True)
+        self.gamma_bar.set_animated(True)
+        self.reader_status_text = self.ax1.text(0.01, 0.92, '', transform=self.ax1.transAxes,
+                                                color='gray', fontsize=9, animated=True)
+        self.game_status_text = self.fig.text(0.5, 0.01, "Game Control: Inactive",
+                                              ha='center', color='yellow', fontsize=12, animated=True)
+        self.artists = (self.line_time, self.line_fft, self.beta_bar, self.gamma_bar,
+                        self.reader_status_text, self.game_status_text)
+
+        self.time_scale = ThresholdScale(-100, 150)
+        self.fft_scale = ThresholdScale(0, 1500)
+        self.power_scale = ThresholdScale(0, 1000)
+
+        self.background = None
+        self.frames = 0
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self.timer = self.fig.canvas.new_timer(interval=interval_ms)
+        self.timer.add_callback(self._frame)
+
+    def _on_draw(self, event):
+        #Any full draw (first show, resize, rescale) refreshes the background cache
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def _pixel_width(self, ax):
+        return max(1, int(ax.get_window_extent().width))
+
+    def _rescale(self, ax, scale, data_low, data_high):
+        limits = scale.update(data_low, data_high)
+        if limits is None:
+            return False
+        ax.set_ylim(*limits)
+        return True
+
+    def _frame(self):
+        if self.background is None:
+            return
+        data, _ = self.buffer.latest(self.window)
+        snapshot = self.worker.latest
+        if data.shape[-1] < self.window / 4 or snapshot is None:
+            return
+        rescaled = False
+
+        #Time domain, first channel decimated to the axes width
+        x, y = minmax_decimate(data[0], self._pixel_width(self.ax1))
+        self.line_time.set_data(x, y)
+        rescaled |= self._rescale(self.ax1, self.time_scale, y.min(), y.max())
+
+        #Spectrum, only the bins on screen
+        n = data.shape[-1]
+        freqs = rfft_freqs(n, self.sampling_rate)
+        shown = freqs <= self.max_freq
+        magnitude = np.abs(np.fft.rfft(data * hann_window(n), axis=-1)).mean(axis=0)[shown]
+        self.line_fft.set_data(freqs[shown], magnitude)
+        rescaled |= self._rescale(self.ax2, self.fft_scale, 0, magnitude.max())
+
+        beta_power = snapshot['beta_power']
+        gamma_power = snapshot['gamma_power']
+        self.beta_bar.set_height(beta_power)
+        self.gamma_bar.set_height(gamma_power)
+        rescaled |= self._rescale(self.ax3, self.power_scale, 0, max(beta_power, gamma_power))
+
+        stats = self.timeline.stats()
+        self.reader_status_text.set_text(f"{stats['effective_rate']:.1f} Hz, {stats['dropped']} dropped, lag {stats['lag'] * 1000:.0f} ms")
+        game_status = self.bridge.read_eeg_data()['is_game_running']
+        self.game_status_text.set_text(f"Game Control: {'Active' if game_status else 'Inactive'}")
+        self.game_status_text.set_color('lime' if game_status else 'yellow')
+
+        self.frames += 1
+        if rescaled:
+            #Limits moved, the background is stale, redraw everything once and re-cache in _on_draw
+            self.fig.canvas.draw_idle()
+            return
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def show(self):
+        plt.tight_layout()
+        plt.subplots_adjust(top=0.9, bottom=0.1)
+        self.timer.start()
+        plt.show()
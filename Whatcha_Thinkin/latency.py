@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import numpy as np
+from collections import deque
+
+#Latency from the moment a sample was taken to the moment it moved the player, split into stages.
+#Every stamp comes from time.monotonic, a system-wide clock, so a stamp taken in the EEG process can be
+#subtracted from one taken in the game. Each stage is measured from the sample time, so they add up:
+#  arrival   sample taken -> parsed off the serial port
+#  analysis  -> band powers computed by the worker
+#  publish   -> written to the bridge
+#  read      -> read by the game
+#  applied   -> used by player.update
+STAGES = ('arrival', 'analysis', 'publish', 'read', 'applied')
+
+class LatencyTracker:
+    def __init__(self, window=2000, stats_file=None, report_every=5.0, clock=time.monotonic):
+        self.window = window            #only the newest measurements count, so the numbers follow the current load
+        self.stats_file = stats_file
+        self.report_every = report_every
+        self.clock = clock
+        self.samples = {}
+        self.last_report = clock()
+
+    def record(self, stage, start, end=None):
+        end = self.clock() if end is None else end
+        if stage not in self.samples:
+            self.samples[stage] = deque(maxlen=self.window)
+        self.samples[stage].append(end - start)
+
+    def percentiles(self, stage):
+        #In milliseconds
+        values = np.array(self.samples.get(stage, ()))
+        if len(values) == 0:
+            return None
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+        return {'count': len(values), 'p50': p50, 'p95': p95, 'p99': p99, 'max': values.max() * 1000}
+
+    def summary(self):
+        stages = [stage for stage in STAGES if stage in self.samples]
+        stages += [stage for stage in self.samples if stage not in STAGES]
+        return {stage: self.percentiles(stage) for stage in stages}
+
+    def lines(self):
+        return [f"{stage:<8} p50 {p['p50']:6.1f}  p95 {p['p95']:6.1f}  p99 {p['p99']:6.1f} ms"
+                for stage, p in self.summary().items()]
+
+    def write(self, path=None):
+        path = path or self.stats_file
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'time': time.time(), 'unit': 'ms', 'stages': self.summary()}, f, indent=2)
+        os.replace(tmp, path) #readers never see a half written file
+
+    def maybe_write(self):
+        #Cheap enough to call every frame, only touches the disk every report_every seconds
+        if self.stats_file is None:
+            return
+        now = self.clock()
+        if now - self.last_report >= self.report_every:
+            self.last_report = now
+            self.write()
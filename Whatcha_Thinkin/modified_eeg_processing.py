@@ -1,166 +1,275 @@
 import serial
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from scipy import signal
+import os
 import time
-from collections import deque
 import threading
+import argparse
 
 #Import the shared data bridge
 from shared_data import EEGDataBridge
+from ring_buffer import RingBuffer
+from serial_ingest import make_parser
+from timeline import SampleTimeline
+from band_power import StreamingBandPower, hann_window, rfft_freqs
+from analysis_worker import AnalysisWorker
+from session_io import SessionRecorder, SessionReader, ReplaySource
+from latency import LatencyTracker
 
 #dSerial port configuration
-PORT = 'COM3'  
+PORT = os.environ.get('EEG_PORT', 'COM3')  #EEG_PORT points it at another port, e.g. the pty from synthetic_eeg.py
 BAUD_RATE = 115200
+SERIAL_FORMAT = os.environ.get('EEG_SERIAL_FORMAT', 'csv')  #'csv' for the text lines, 'binary' for the framed int16 output
+SERIAL_TIMEOUT = 0.05  #read() blocks at most this long when the port is idle
+CHANNELS = int(os.environ.get('EEG_CHANNELS', 1))  #Electrodes on the board, 1 reads the 'raw,voltage,filtered' lines, more reads one column per channel
 
 #Buffer size for analysis
 BUFFER_SIZE = 512  
-EEG_buffer = deque(maxlen=BUFFER_SIZE)
-time_buffer = deque(maxlen=BUFFER_SIZE)
+EEG_buffer = RingBuffer(BUFFER_SIZE, CHANNELS)  #Samples (channels x time) and their timestamps, written by the serial thread
 
 #Sampling parameters
-sampling_rate = 250  
+sampling_rate = int(os.environ.get('EEG_SAMPLING_RATE', 250))
 nyquist = sampling_rate / 2
 
+#Per-sample timestamps from the sample counter, also tracks the effective rate and dropped samples
+timeline = SampleTimeline(sampling_rate)
+
 #Frequency bands (Hz)
 beta_band = [13, 30]    # Beta waves
 gamma_band = [30, 45]   # Gamma waves
 
+#Streaming band powers, fed by the analysis worker with only the samples that arrived since its last hop
+band_engine = StreamingBandPower({'beta': beta_band, 'gamma': gamma_band}, sampling_rate,
+                                 window_size=BUFFER_SIZE, channels=CHANNELS)
+HOP_MS = 20  #How often the worker recomputes and publishes band powers
+PLOT_INTERVAL_MS = 100  #How often the plot tries to redraw, it never holds up the worker
+
 data_bridge = EEGDataBridge()
+recorder = None  #SessionRecorder when --record is given
+reader_stop = threading.Event()  #set at shutdown, the serial or replay thread returns within one read
+latency = LatencyTracker()  #arrival, analysis and publish stages, --latency-stats writes them to a file
 
-#Plot configuration
-plt.style.use('dark_background')
-fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 8))
-fig.suptitle('Real-time EEG Analysis', fontsize=16)
-
-line_time = ax1.plot([], [], 'c-', lw=1)[0]
-line_fft = ax2.plot([], [], 'g-', lw=1)[0]
-
-beta_bar = ax3.bar(['Beta'], [0], color=['cyan'])[0]
-gamma_bar = ax3.bar(['Gamma'], [0], color=['magenta'])[0]
-
-ax1.set_title('EEG Time Domain')
-ax1.set_xlabel('Time (s)')
-ax1.set_ylabel('Amplitude (μV)')
-ax1.set_ylim(-100, 150)
-ax1.grid(True, alpha=0.3)
-
-ax2.set_title('Frequency Spectrum')
-ax2.set_xlabel('Frequency (Hz)')
-ax2.set_ylabel('Power')
-ax2.set_xlim(0, 50)
-ax2.set_ylim(0, 1500)
-ax2.grid(True, alpha=0.3)
-
-ax3.set_title('Brain Wave Power')
-ax3.set_ylim(0, 1000)
-ax3.grid(True, alpha=0.3)
-
-#Add game control indicator
-game_status_text = fig.text(0.5, 0.01, "Game Control: Inactive", 
-                            ha='center', color='yellow', fontsize=12)
-
-def apply_bandpass_filter(data, lowcut, highcut, fs, order=4):
-    nyq = 0.5 * fs
-    low = lowcut / nyq
-    high = highcut / nyq
-    b, a = signal.butter(order, [low, high], btype='band')
-    return signal.filtfilt(b, a, data)
-
-def compute_band_power(data, fft_result, freqs, low, high):
-    indices = np.where((freqs >= low) & (freqs <= high))[0]
-    return np.sum(np.abs(fft_result[indices])**2) / len(indices) if len(indices) > 0 else 0
-
-def init():
-    return line_time, line_fft, beta_bar, gamma_bar
-
-def update(frame):
-    current_time = time.time()
-    data = np.array(list(EEG_buffer))
-    times = np.array(list(time_buffer)) - current_time
-    
-    if len(data) < BUFFER_SIZE/4:  #Wait for sufficient data
-        return line_time, line_fft, beta_bar, gamma_bar
-    
-    #Update time domain plot
-    line_time.set_data(times, data)
-    ax1.set_xlim(min(times), max(times))
-    
-    #Apply additional bandpass filtering for analysis
-    filtered_beta = apply_bandpass_filter(data, beta_band[0], beta_band[1], sampling_rate)
-    filtered_gamma = apply_bandpass_filter(data, gamma_band[0], gamma_band[1], sampling_rate)
-    
-    #FFT
-    n = len(data)
-    fft_data = np.fft.rfft(data * np.hanning(n))
-    freqs = np.fft.rfftfreq(n, d=1.0/sampling_rate)
-    
-    #Update frequency domain plot 
-    line_fft.set_data(freqs, np.abs(fft_data))
-    
-    #Calculate band powers
-    beta_power = compute_band_power(filtered_beta, fft_data, freqs, beta_band[0], beta_band[1])
-    gamma_power = compute_band_power(filtered_gamma, fft_data, freqs, gamma_band[0], gamma_band[1])
-    
-    #Share data with game
-    data_bridge.update_eeg_data(beta_power, gamma_power)
-    
-    #Update status text
-    game_status = data_bridge.read_eeg_data()['is_game_running']
-    game_status_text.set_text(f"Game Control: {'Active' if game_status else 'Inactive'}")
-    game_status_text.set_color('lime' if game_status else 'yellow')
-    
-    #Update bar heights
-    beta_bar.set_height(beta_power)
-    gamma_bar.set_height(gamma_power)
-    ax3.set_ylim(0, max(1000, beta_power * 1.2, gamma_power * 1.2))
-    
-    return line_time, line_fft, beta_bar, gamma_bar
+def run_plot(worker):
+    #Optional subscriber: redraws whatever the worker published last, at whatever rate matplotlib manages
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    #Plot configuration
+    plt.style.use('dark_background')
+    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 8))
+    fig.suptitle('Real-time EEG Analysis', fontsize=16)
+
+    line_time = ax1.plot([], [], 'c-', lw=1)[0]
+    line_fft = ax2.plot([], [], 'g-', lw=1)[0]
+
+    beta_bar = ax3.bar(['Beta'], [0], color=['cyan'])[0]
+    gamma_bar = ax3.bar(['Gamma'], [0], color=['magenta'])[0]
+
+    ax1.set_title('EEG Time Domain')
+    ax1.set_xlabel('Time (s)')
+    ax1.set_ylabel('Amplitude (μV)')
+    ax1.set_ylim(-100, 150)
+    ax1.grid(True, alpha=0.3)
+    reader_status_text = ax1.text(0.01, 0.92, '', transform=ax1.transAxes, color='gray', fontsize=9)
+
+    ax2.set_title('Frequency Spectrum')
+    ax2.set_xlabel('Frequency (Hz)')
+    ax2.set_ylabel('Power')
+    ax2.set_xlim(0, 50)
+    ax2.set_ylim(0, 1500)
+    ax2.grid(True, alpha=0.3)
+
+    ax3.set_title('Brain Wave Power')
+    ax3.set_ylim(0, 1000)
+    ax3.grid(True, alpha=0.3)
+
+    #Add game control indicator
+    game_status_text = fig.text(0.5, 0.01, "Game Control: Inactive", 
+                                ha='center', color='yellow', fontsize=12)
+
+    def init():
+        return line_time, line_fft, beta_bar, gamma_bar, reader_status_text
+
+    def update(frame):
+        current_time = timeline.clock()
+        data, times = EEG_buffer.latest()  #Copies of the newest samples, channels x time
+        times = times - current_time
+        snapshot = worker.latest
+        
+        if len(times) < BUFFER_SIZE/4 or snapshot is None:  #Wait for sufficient data
+            return line_time, line_fft, beta_bar, gamma_bar, reader_status_text
+        
+        #Reader health, a rate well under nominal or a growing drop count means it is falling behind
+        stats = timeline.stats()
+        reader_status_text.set_text(f"{stats['effective_rate']:.1f} Hz, {stats['dropped']} dropped, lag {stats['lag'] * 1000:.0f} ms")
+        
+        #Update time domain plot
+        line_time.set_data(times, data[0])  #First channel
+        ax1.set_xlim(min(times), max(times))
+        
+        #FFT, only for the spectrum plot, the band powers come from the worker
+        n = len(times)
+        fft_data = np.fft.rfft(data * hann_window(n), axis=-1)  #All channels at once, window and axis cached per size
+        freqs = rfft_freqs(n, sampling_rate)
+        
+        #Update frequency domain plot 
+        line_fft.set_data(freqs, np.abs(fft_data).mean(axis=0))
+        
+        beta_power = snapshot['beta_power']
+        gamma_power = snapshot['gamma_power']
+        
+        #Update status text
+        game_status = data_bridge.read_eeg_data()['is_game_running']
+        game_status_text.set_text(f"Game Control: {'Active' if game_status else 'Inactive'}")
+        game_status_text.set_color('lime' if game_status else 'yellow')
+        
+        #Update bar heights
+        beta_bar.set_height(beta_power)
+        gamma_bar.set_height(gamma_power)
+        ax3.set_ylim(0, max(1000, beta_power * 1.2, gamma_power * 1.2))
+        
+        return line_time, line_fft, beta_bar, gamma_bar, reader_status_text
+
+    #Start animation
+    ani = FuncAnimation(fig, update, init_func=init, 
+                       interval=PLOT_INTERVAL_MS, blit=True, cache_frame_data=False)
+    plt.tight_layout()
+    plt.subplots_adjust(top=0.9, bottom=0.1)
+    plt.show()
+
+def run_headless(worker):
+    #No display needed, just keep the process alive and report now and then
+    try:
+        while True:
+            time.sleep(5)
+            stats = timeline.stats()
+            snapshot = worker.latest or {'beta_power': 0, 'gamma_power': 0}
+            print(f"beta {snapshot['beta_power']:.1f}, gamma {snapshot['gamma_power']:.1f}, "
+                  f"{stats['effective_rate']:.1f} Hz, {stats['dropped']} dropped, {worker.overruns} analysis overruns")
+            for line in latency.lines():
+                print(f"  {line}")
+    except KeyboardInterrupt:
+        pass
+
+def ingest(samples, timestamps=None, dropped=0, record_latency=True):
+    #Single entry point for new samples, whether they come from the serial port or a replayed session.
+    #record_latency is off for offline replay, the recorded timestamps are not on this run's clock
+    if timestamps is None:
+        #Timestamps come from the sample counter, not from when the reader got to the block
+        timestamps = timeline.stamp(len(samples), dropped=dropped)
+    if record_latency:
+        latency.record('arrival', timestamps[-1])
+    if recorder is not None:
+        recorder.write(samples, timestamps)
+    EEG_buffer.extend(samples, timestamps)
+
+def replay_session(path, speed):
+    #Stands in for read_serial_data, feeding a recording at 1x, Nx or (speed 0) as fast as possible
+    source = ReplaySource(path, speed, block_size=max(1, sampling_rate // 25))
+    if source.reader.channels != CHANNELS:
+        print(f"Recording has {source.reader.channels} channels, CHANNELS is {CHANNELS}")
+        return
+    print(f"Replaying {path} at {'max' if speed <= 0 else speed}x speed")
+    source.run(ingest, stop=reader_stop)
+    print(f"Replay finished, {source.samples_played} samples")
+
+def replay_offline(path, worker):
+    #Deterministic replay for profiling: no threads and no sleeping, one analysis hop per hop's worth of samples
+    reader = SessionReader(path)
+    hop_samples = max(1, int(round(worker.hop * sampling_rate)))
+    hops = 0
+    start = time.perf_counter()
+    for samples, timestamps in reader.blocks(hop_samples):
+        ingest(np.asarray(samples, dtype=float), timestamps, record_latency=False)
+        worker.analyse_once()
+        hops += 1
+    elapsed = time.perf_counter() - start
+    snapshot = worker.latest or {'beta_power': 0, 'gamma_power': 0}
+    print(f"{EEG_buffer.count} samples in {hops} hops, {elapsed:.3f} s "
+          f"({EEG_buffer.count / max(elapsed, 1e-9):.0f} samples/s, {elapsed / max(hops, 1) * 1e6:.1f} us/hop)")
+    print(f"final beta {snapshot['beta_power']:.3f}, gamma {snapshot['gamma_power']:.3f}")
 
 def read_serial_data():
+    parser = make_parser(SERIAL_FORMAT, CHANNELS)
+    dropped_seen = 0
     try:
-        with serial.Serial(PORT, BAUD_RATE) as ser:
+        with serial.Serial(PORT, BAUD_RATE, timeout=SERIAL_TIMEOUT) as ser:
             print(f"Connected to {PORT} at {BAUD_RATE} baud")
             ser.flushInput()
-            time.sleep(2)  
+            parser.reset()
+            reader_stop.wait(2)
             
-            while True:
-                if ser.in_waiting:
-                    try:
-                        line = ser.readline().decode('utf-8').strip()
-                        #Check if it's the header line
-                        if line == "raw,voltage,filtered":
-                            continue
-                            
-                        #Parse data line
-                        raw, voltage, filtered = map(float, line.split(','))
-                        EEG_buffer.append(filtered)  
-                        time_buffer.append(time.time())
-                        
-                    except (ValueError, IndexError) as e:
-                        print(f"Error parsing data: {e}")
-                time.sleep(0.001)  #Short delay to prevent CPU overload
+            while not reader_stop.is_set():
+                #Take everything that is waiting in one read, an idle port blocks here instead of spinning
+                chunk = ser.read(ser.in_waiting or 1)
+                samples = parser.feed(chunk)
+                if len(samples) == 0:
+                    continue
+                
+                ingest(samples, dropped=parser.dropped - dropped_seen)
+                dropped_seen = parser.dropped
                 
     except serial.SerialException as e:
         print(f"Serial connection error: {e}")
         return
 
 if __name__ == "__main__":
-    #Start serial reading in background thread
-    serial_thread = threading.Thread(target=read_serial_data, daemon=True)
+    parser = argparse.ArgumentParser(description='EEG processing for the EEG controlled game')
+    parser.add_argument('--headless', action='store_true', help='run the analysis without the matplotlib window')
+    parser.add_argument('--hop-ms', type=float, default=HOP_MS, help='how often band powers are recomputed and published')
+    parser.add_argument('--plot', choices=['classic', 'fast'], default='classic',
+                        help="'fast' uses fixed axes, blitting and decimated lines to keep the monitor at 30+ FPS")
+    parser.add_argument('--record', metavar='PATH', help='save every incoming sample and its timestamp to a session file')
+    parser.add_argument('--replay', metavar='PATH', help='play a recorded session instead of reading the serial port')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed, 1 is real time, 0 is as fast as possible (with --headless: a deterministic offline run)')
+    parser.add_argument('--latency-stats', metavar='PATH', help='write p50/p95/p99 stage latencies to this json file every few seconds')
+    args = parser.parse_args()
+    
+    if args.record:
+        recorder = SessionRecorder(args.record, sampling_rate, CHANNELS, source=args.replay or PORT)
+    
+    worker = AnalysisWorker(EEG_buffer, band_engine, data_bridge, hop=args.hop_ms / 1000, latency=latency)
+    if args.latency_stats:
+        latency.stats_file = args.latency_stats
+        worker.subscribe(lambda snapshot: latency.maybe_write())
+    
+    if args.replay and args.speed <= 0 and args.headless:
+        worker.latency = None  #recorded timestamps are not on this run's clock
+        replay_offline(args.replay, worker)
+        if recorder is not None:
+            recorder.close()
+        data_bridge.close()
+        raise SystemExit
+    
+    #Start serial reading (or replay) in background thread
+    if args.replay:
+        serial_thread = threading.Thread(target=replay_session, args=(args.replay, args.speed), daemon=True)
+    else:
+        serial_thread = threading.Thread(target=read_serial_data, daemon=True)
     serial_thread.start()
     
     #Notify that EEG processing is running
     data_bridge.update_eeg_data(0, 0)
     
-    #Start animation
-    ani = FuncAnimation(fig, update, init_func=init, 
-                       interval=100, blit=True, cache_frame_data=False)
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.9, bottom=0.1)
-    plt.show()
+    #Band powers are computed and published on their own thread, independent of the plot
+    worker.start()
+    
+    if args.headless:
+        run_headless(worker)
+    elif args.plot == 'fast':
+        from eeg_visualizer import FastEEGMonitor
+        FastEEGMonitor(EEG_buffer, worker, timeline, data_bridge, sampling_rate, BUFFER_SIZE).show()
+    else:
+        run_plot(worker)
     
+    #The reader has to be finished before the recorder closes, it may be in the middle of recorder.write
+    reader_stop.set()
+    serial_thread.join()
+    worker.stop()
+    worker.join()
+    if recorder is not None:
+        recorder.close()
     data_bridge.update_eeg_data(0, 0)
+    data_bridge.close()
 
     print("EEG Processing stopped")
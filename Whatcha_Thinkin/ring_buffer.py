@@ -0,0 +1,76 @@
+import numpy as np
+
+#Single producer / single consumer ring buffer for EEG samples and their timestamps.
+#Samples are stored channels x time so analysis can run along axis=-1 for every channel at once.
+#Every value is written twice, at i and i + capacity, so the newest n samples are always one
+#contiguous slice that readers copy out in one go. No lock, it works like a seqlock instead: the producer
+#bumps self.writing before it touches the slots and self.count once the data is in, and a reader
+#copies its window and then checks self.writing again. If the producer got far enough to reuse a slot
+#of that window while it was being copied, the copy is torn and the reader takes it again.
+
+class RingBuffer:
+    def __init__(self, capacity, channels=1):
+        self.capacity = capacity
+        self.channels = channels
+        self.samples = np.zeros((channels, 2 * capacity))
+        self.timestamps = np.zeros(2 * capacity)
+        self.count = 0 #total samples ever written
+        self.writing = 0 #count once the write in progress lands, ahead of count only during a write
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, sample, timestamp):
+        #sample is one value per channel (or a plain number for a single channel)
+        i = self.count % self.capacity
+        self.writing = self.count + 1
+        self.samples[:, i] = self.samples[:, i + self.capacity] = sample
+        self.timestamps[i] = self.timestamps[i + self.capacity] = timestamp
+        self.count += 1
+
+    def extend(self, samples, timestamps):
+        #samples is (n, channels) as the parsers return it, or (n,) for a single channel
+        timestamps = np.asarray(timestamps, dtype=float)
+        total = len(timestamps)
+        if total == 0:
+            return
+        samples = np.asarray(samples, dtype=float).reshape(total, self.channels).T
+        if total > self.capacity:
+            #Anything older than one lap would be overwritten straight away
+            samples = samples[:, -self.capacity:]
+            timestamps = timestamps[-self.capacity:]
+
+        self.writing = self.count + total
+        kept = len(timestamps)
+        start = (self.count + total - kept) % self.capacity
+        first = min(self.capacity - start, kept)
+        rest = kept - first
+        for target, values in ((self.samples, samples), (self.timestamps, timestamps)):
+            target[..., start:start + first] = values[..., :first]
+            target[..., start + self.capacity:start + self.capacity + first] = values[..., :first]
+            if rest:
+                target[..., :rest] = values[..., first:]
+                target[..., self.capacity:self.capacity + rest] = values[..., first:]
+        self.count += total
+
+    def _copy(self, wanted):
+        #Copies of the newest wanted(count) samples and the count they end at, retried until no write overlapped them
+        while True:
+            count = self.count
+            n = wanted(count)
+            end = count % self.capacity + self.capacity
+            samples = self.samples[:, end - n:end].copy()
+            timestamps = self.timestamps[end - n:end].copy()
+            #A write reaching sample s reuses the slots of sample s - capacity
+            if self.writing - self.capacity <= count - n:
+                return samples, timestamps, count
+
+    def latest(self, n=None):
+        #Copies of the newest n samples (all stored samples by default), oldest first, samples are channels x n
+        limit = self.capacity if n is None else min(n, self.capacity)
+        samples, timestamps, _ = self._copy(lambda count: min(count, limit))
+        return samples, timestamps
+
+    def since(self, seen):
+        #Samples written after the consumer had seen `seen` of them, plus the new total to pass back next time
+        return self._copy(lambda count: min(count - seen, self.capacity))
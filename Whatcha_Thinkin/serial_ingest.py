@@ -0,0 +1,151 @@
+import numpy as np
+
+#Block parsers for the serial stream. The reader thread hands over whatever one read(n) returned
+#and gets back every complete sample in it as a (samples, channels) array, partial data is kept for the next call.
+
+#Single channel boards send 'raw,voltage,filtered' lines and only the filtered column is kept.
+#Multi-channel boards send one filtered value per channel, 'ch1,ch2,...,chN', after a header line of names.
+CSV_HEADER = b'raw,voltage,filtered'
+LEGACY_COLUMNS = 3
+LEGACY_VALUE_COLUMN = 2     #the filtered column
+
+#Optional compact framing the Arduino can emit instead of text (see BINARY_OUTPUT in EEG_collection.ino):
+#uint16 sync word, uint16 sample counter, then one int16 per channel in ADC counts, all little endian
+SYNC_WORD = 0xA55A
+SYNC_BYTES = SYNC_WORD.to_bytes(2, 'little')
+LSB_UV = 7.8125             #microvolts per count at GAIN_SIXTEEN
+
+class CsvParser:
+    def __init__(self, channels=1):
+        self.channels = channels
+        if channels == 1:
+            self.columns = LEGACY_COLUMNS
+            self.value_columns = slice(LEGACY_VALUE_COLUMN, LEGACY_VALUE_COLUMN + 1)
+        else:
+            self.columns = channels
+            self.value_columns = slice(0, channels)
+        self.pending = b''
+        self.skip_line = False
+        self.errors = 0
+        self.dropped = 0     #text lines carry no counter, the timeline estimates drops instead
+
+    def reset(self):
+        #Called once the port is open: the board was already sending, so everything up to the first newline
+        #may be the tail of a line (or of the header) and is dropped instead of counted as an error
+        self.pending = b''
+        self.skip_line = True
+
+    def feed(self, chunk):
+        data = self.pending + chunk
+        if self.skip_line:
+            start = data.find(b'\n')
+            if start < 0:
+                self.pending = b''
+                return np.empty((0, self.channels))
+            data = data[start + 1:]
+            self.skip_line = False
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            self.pending = data
+            return np.empty((0, self.channels))
+        complete, self.pending = data[:cut], data[cut + 1:]
+        complete = complete.replace(CSV_HEADER, b'')
+
+        fields = complete.replace(b',', b' ').split()
+        try:
+            #One vectorized conversion for every line and channel in the block
+            values = np.array(fields, dtype=float)
+            if values.size == (complete.count(b'\n') + 1) * self.columns and self._aligned(complete):
+                return values.reshape(-1, self.columns)[:, self.value_columns]
+        except ValueError:
+            pass
+        return self._parse_lines(complete)
+
+    def _aligned(self, block):
+        #Every line has exactly columns - 1 commas. The total alone isn't enough, a short line and a long one
+        #add up to the right count and would shift every column after them
+        data = np.frombuffer(block, dtype=np.uint8)
+        commas = np.cumsum(data == ord(','))
+        ends = np.flatnonzero(data == ord('\n'))
+        per_line = np.diff(np.concatenate(([0], commas[ends], commas[-1:])))
+        return bool((per_line == self.columns - 1).all())
+
+    def _parse_lines(self, block):
+        #Slow path for blocks holding a header or a corrupt line, keeps every line that still parses
+        rows = []
+        for line in block.split(b'\n'):
+            line = line.strip()
+            if not line or line[:1].isalpha():
+                continue #blank or a header of channel names
+            try:
+                values = [float(value) for value in line.split(b',')]
+                if len(values) != self.columns:
+                    raise ValueError(f"expected {self.columns} columns, got {len(values)}")
+                rows.append(values[self.value_columns])
+            except ValueError as e:
+                self.errors += 1
+                print(f"Error parsing data: {e}")
+        return np.array(rows, dtype=float).reshape(-1, self.channels)
+
+class BinaryParser:
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.frame = np.dtype([('sync', '<u2'), ('counter', '<u2'), ('samples', '<i2', (channels,))])
+        self.pending = b''
+        self.last_counter = None
+        self.dropped = 0     #frames the counter says never arrived
+        self.errors = 0      #bytes skipped while hunting for the next sync word
+
+    def reset(self):
+        #The sync word search already skips a partial first frame, only the counter history has to go
+        self.pending = b''
+        self.last_counter = None
+
+    def feed(self, chunk):
+        data = self.pending + chunk
+        size = self.frame.itemsize
+        blocks = []
+        pos = 0
+        while True:
+            start = data.find(SYNC_BYTES, pos)
+            if start < 0:
+                #Keep a trailing byte in case it is the first half of the next sync word
+                pos = max(pos, len(data) - 1)
+                break
+            self.errors += start - pos
+            count = (len(data) - start) // size
+            if count == 0:
+                pos = start
+                break
+            frames = np.frombuffer(data, dtype=self.frame, count=count, offset=start)
+            bad = np.flatnonzero(frames['sync'] != SYNC_WORD)
+            if len(bad) == 0:
+                blocks.append(frames)
+                pos = start + count * size
+                continue
+            #Lost alignment, keep the good run and search again one byte further on
+            blocks.append(frames[:bad[0]])
+            pos = start + bad[0] * size + 1
+            self.errors += 1
+        self.pending = data[pos:]
+
+        if not blocks:
+            return np.empty((0, self.channels))
+        frames = np.concatenate(blocks)
+        if len(frames) == 0:
+            return np.empty((0, self.channels))
+        self._count_dropped(frames['counter'])
+        return frames['samples'].astype(float) * LSB_UV
+
+    def _count_dropped(self, counters):
+        counters = counters.astype(np.int64)
+        if self.last_counter is not None:
+            counters = np.concatenate(([self.last_counter], counters))
+        gaps = (np.diff(counters) - 1) % 65536
+        self.dropped += int(gaps.sum())
+        self.last_counter = int(counters[-1])
+
+def make_parser(serial_format, channels=1):
+    if serial_format == 'binary':
+        return BinaryParser(channels)
+    return CsvParser(channels)
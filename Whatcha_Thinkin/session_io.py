@@ -0,0 +1,125 @@
+import json
+import struct
+import time
+import numpy as np
+
+#Compact recording of an EEG session so it can be replayed without the board.
+#File layout: 8 byte magic, uint32 header length, JSON header (sampling rate, channels, ...),
+#then chunks of: uint32 sample count n, n float64 timestamps, n x channels float32 samples.
+#Chunks are read back through a memory map, so a long session is never loaded all at once.
+
+SESSION_MAGIC = b'WTSESS\x00\x01'
+CHUNK_HEADER = struct.Struct('<I')
+
+class SessionRecorder:
+    def __init__(self, path, sampling_rate, channels=1, chunk_size=2048, **extra):
+        self.path = path
+        self.channels = channels
+        self.chunk_size = chunk_size
+        self.pending_samples = []
+        self.pending_times = []
+        self.pending_count = 0
+        self.samples_written = 0
+
+        header = json.dumps({'sampling_rate': sampling_rate, 'channels': channels,
+                             'created': time.time(), **extra}).encode('utf-8')
+        self.file = open(path, 'wb')
+        self.file.write(SESSION_MAGIC)
+        self.file.write(struct.pack('<I', len(header)))
+        self.file.write(header)
+
+    def write(self, samples, timestamps):
+        #samples is (n, channels) as the parsers return it
+        timestamps = np.asarray(timestamps, dtype='<f8')
+        if len(timestamps) == 0:
+            return
+        self.pending_samples.append(np.asarray(samples, dtype='<f4').reshape(len(timestamps), self.channels))
+        self.pending_times.append(timestamps)
+        self.pending_count += len(timestamps)
+        if self.pending_count >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_count:
+            return
+        self.file.write(CHUNK_HEADER.pack(self.pending_count))
+        self.file.write(np.concatenate(self.pending_times).tobytes())
+        self.file.write(np.concatenate(self.pending_samples).tobytes())
+        self.file.flush()
+        self.samples_written += self.pending_count
+        self.pending_samples.clear()
+        self.pending_times.clear()
+        self.pending_count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class SessionReader:
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self.data[:len(SESSION_MAGIC)]) != SESSION_MAGIC:
+            raise ValueError(f"{path} is not an EEG session recording")
+        header_length = struct.unpack_from('<I', self.data, len(SESSION_MAGIC))[0]
+        start = len(SESSION_MAGIC) + 4
+        self.header = json.loads(bytes(self.data[start:start + header_length]).decode('utf-8'))
+        self.sampling_rate = self.header['sampling_rate']
+        self.channels = self.header['channels']
+        self.data_start = start + header_length
+
+    def chunks(self):
+        #(samples n x channels, timestamps n) views straight out of the memory map
+        pos = self.data_start
+        end = len(self.data)
+        while pos + CHUNK_HEADER.size <= end:
+            n = CHUNK_HEADER.unpack_from(self.data, pos)[0]
+            pos += CHUNK_HEADER.size
+            times_end = pos + n * 8
+            samples_end = times_end + n * self.channels * 4
+            if samples_end > end:
+                break #recording was cut off mid chunk
+            timestamps = self.data[pos:times_end].view('<f8')
+            samples = self.data[times_end:samples_end].view('<f4').reshape(n, self.channels)
+            yield samples, timestamps
+            pos = samples_end
+
+    def blocks(self, block_size):
+        #Re-slices the chunks into blocks about the size the serial reader would have delivered
+        for samples, timestamps in self.chunks():
+            for i in range(0, len(timestamps), block_size):
+                yield samples[i:i + block_size], timestamps[i:i + block_size]
+
+class ReplaySource:
+    #Plays a recording back where read_serial_data would normally deliver samples.
+    #speed 1 is real time, N is N times faster, 0 is as fast as possible.
+    def __init__(self, path, speed=1.0, block_size=10, clock=time.monotonic):
+        self.reader = SessionReader(path)
+        self.speed = speed
+        self.block_size = block_size
+        self.clock = clock
+        self.samples_played = 0
+
+    def run(self, sink, loop=False, stop=None):
+        #sink(samples, timestamps) gets each block, timestamps are shifted so the session starts now.
+        #stop is an optional threading.Event, setting it ends the playback before the next block
+        while True:
+            start = self.clock()
+            first_time = None
+            for samples, timestamps in self.reader.blocks(self.block_size):
+                if stop is not None and stop.is_set():
+                    return
+                if first_time is None:
+                    first_time = timestamps[0]
+                session_time = timestamps[-1] - first_time
+                if self.speed > 0:
+                    delay = start + session_time / self.speed - self.clock()
+                    if delay > 0 and stop is not None:
+                        if stop.wait(delay):
+                            return
+                    elif delay > 0:
+                        time.sleep(delay)
+                sink(np.asarray(samples, dtype=float), timestamps - first_time + start)
+                self.samples_played += len(timestamps)
+            if not loop:
+                return
@@ -1,61 +1,263 @@
-import os
-import json
-from pathlib import Path
-
-class EEGDataBridge:   
-    def __init__(self, data_file='eeg_data.json'):
-        self.data_file = Path(data_file)
-        self.data = {
-            'beta_power': 0,
-            'gamma_power': 0,
-            'is_game_running': False,
-            'is_eeg_running': False
-        }
-        self._ensure_file_exists()
-    
-    def _ensure_file_exists(self):
-        if not self.data_file.exists():
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f)
-    
-    def update_eeg_data(self, beta_power, gamma_power):
-        try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-            
-            self.data['beta_power'] = beta_power
-            self.data['gamma_power'] = gamma_power
-            self.data['is_eeg_running'] = True
-            
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f)
-                
-            return True
-        except Exception as e:
-            print(f"Error updating EEG data: {e}")
-            return False
-    
-    def read_eeg_data(self):
-        try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-            return self.data
-        except Exception as e:
-            print(f"Error reading EEG data: {e}")
-            return self.data
-    
-    def set_game_status(self, is_running):
-        try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-            
-            self.data['is_game_running'] = is_running
-            
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f)
-                
-            return True
-        except Exception as e:
-            print(f"Error updating game status: {e}")
-
-            return False
+import os
+import json
+import struct
+import threading
+import time
+from pathlib import Path
+from multiprocessing import shared_memory
+
+
+#Fixed layout of the shared block. Every record starts with its own sequence counter (seqlock):
+#the writer bumps it to an odd value, writes the payload, then bumps it to the next even value.
+#A reader retries whenever it sees an odd counter or the counter changed while it was copying.
+#Each record has exactly one writing process (EEG processor or game), so the counters never race.
+#The process that creates the block owns it and unlinks it on close (main.py starts the processor first),
+#processes that attach only drop their mapping.
+SHM_MAGIC = b'WTEG'
+SHM_VERSION = 3
+MAX_CHANNELS = 16
+HEADER_FORMAT = '<4sHH'            #magic, version, reserved
+SEQ_FORMAT = '<Q'
+#beta, gamma, timestamp, sample/analysis/publish stamps (time.monotonic, for latency tracking),
+#is_eeg_running, channel count, per-channel beta, per-channel gamma
+EEG_RECORD_FORMAT = f'<dddddd?B6x{MAX_CHANNELS}d{MAX_CHANNELS}d'
+GAME_RECORD_FORMAT = '<d?7x'       #timestamp, is_game_running
+
+EEG_RECORD_OFFSET = struct.calcsize(HEADER_FORMAT)
+GAME_RECORD_OFFSET = EEG_RECORD_OFFSET + struct.calcsize(SEQ_FORMAT) + struct.calcsize(EEG_RECORD_FORMAT)
+SHM_SIZE = GAME_RECORD_OFFSET + struct.calcsize(SEQ_FORMAT) + struct.calcsize(GAME_RECORD_FORMAT)
+
+#Name of the shared memory block both processes attach to, versioned so a stale block with an older layout is never reused
+SHM_NAME = f'whatcha_thinkin_eeg_v{SHM_VERSION}'
+
+def _set_tracked(shm, tracked):
+    #Before python 3.13 the resource tracker unlinks every block a process attached to when it exits,
+    #which would pull the block out from under its owner. Only the creator stays tracked, so the block
+    #is still removed if the owner dies without calling close().
+    if os.name == 'nt':
+        return
+    try:
+        from multiprocessing import resource_tracker
+        if tracked:
+            resource_tracker.register(shm._name, 'shared_memory')
+        else:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+class JsonFileTransport:
+    #The original transport, every call goes through eeg_data.json on disk
+    def __init__(self, data_file='eeg_data.json'):
+        self.data_file = Path(data_file)
+        self.data = {
+            'beta_power': 0,
+            'gamma_power': 0,
+            'beta_channels': [],
+            'gamma_channels': [],
+            'sample_time': 0.0,
+            'analysis_time': 0.0,
+            'publish_time': 0.0,
+            'is_game_running': False,
+            'is_eeg_running': False
+        }
+        self._ensure_file_exists()
+
+    def _ensure_file_exists(self):
+        if not self.data_file.exists():
+            with open(self.data_file, 'w') as f:
+                json.dump(self.data, f)
+
+    def _load(self):
+        with open(self.data_file, 'r') as f:
+            self.data = json.load(f)
+
+    def _dump(self):
+        with open(self.data_file, 'w') as f:
+            json.dump(self.data, f)
+
+    def write_eeg(self, beta_power, gamma_power, beta_channels, gamma_channels, sample_time, analysis_time):
+        self._load()
+        self.data['beta_power'] = beta_power
+        self.data['gamma_power'] = gamma_power
+        self.data['beta_channels'] = beta_channels
+        self.data['gamma_channels'] = gamma_channels
+        self.data['sample_time'] = sample_time
+        self.data['analysis_time'] = analysis_time
+        self.data['publish_time'] = time.monotonic()
+        self.data['is_eeg_running'] = True
+        self._dump()
+
+    def write_game(self, is_running):
+        self._load()
+        self.data['is_game_running'] = is_running
+        self._dump()
+
+    def read(self):
+        self._load()
+        #Files written before per-channel values existed only carry the combined powers
+        self.data.setdefault('beta_channels', [self.data['beta_power']])
+        self.data.setdefault('gamma_channels', [self.data['gamma_power']])
+        for stamp in ('sample_time', 'analysis_time', 'publish_time'):
+            self.data.setdefault(stamp, 0.0)
+        return self.data
+
+    def close(self, unlink=None):
+        pass
+
+class SharedMemoryTransport:
+    #Fixed-layout record in a multiprocessing.shared_memory block, reads cost a few struct unpacks and no syscalls
+    def __init__(self, name=SHM_NAME):
+        self.name = name
+        self.shm, self.created = self._open(name)
+        self.buf = self.shm.buf
+        self._write_lock = threading.Lock()
+        self._last_good = {}  #offset -> last consistent copy of that record
+
+        magic, version, _ = struct.unpack_from(HEADER_FORMAT, self.buf, 0)
+        if magic == b'\x00' * 4:
+            struct.pack_into(HEADER_FORMAT, self.buf, 0, SHM_MAGIC, SHM_VERSION, 0)
+        elif magic != SHM_MAGIC or version != SHM_VERSION:
+            self.close()
+            raise ValueError(f"Shared memory block '{name}' has an incompatible layout")
+
+    def _open(self, name):
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=False)
+                created = False
+            except FileNotFoundError:
+                try:
+                    shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+                    created = True
+                except FileExistsError:
+                    continue #the other process created it first, attach on the next pass
+            if not created:
+                _set_tracked(shm, False)
+            if shm.size < SHM_SIZE:
+                shm.close()
+                raise ValueError(f"Shared memory block '{name}' is too small")
+            return shm, created
+
+    def _write_record(self, offset, fmt, *values):
+        with self._write_lock:
+            seq = struct.unpack_from(SEQ_FORMAT, self.buf, offset)[0]
+            seq += seq & 1 #a writer that died mid-record left it odd, get back in step
+            struct.pack_into(SEQ_FORMAT, self.buf, offset, seq + 1)
+            struct.pack_into(fmt, self.buf, offset + 8, *values)
+            struct.pack_into(SEQ_FORMAT, self.buf, offset, seq + 2)
+
+    def _read_record(self, offset, fmt, retries=1000):
+        for _ in range(retries):
+            seq_before = struct.unpack_from(SEQ_FORMAT, self.buf, offset)[0]
+            if seq_before & 1:
+                continue #writer is midway through the record
+            values = struct.unpack_from(fmt, self.buf, offset + 8)
+            if struct.unpack_from(SEQ_FORMAT, self.buf, offset)[0] == seq_before:
+                self._last_good[offset] = values
+                return values
+        #A writer that died between the two counter bumps would otherwise stall us forever.
+        #Never hand out a torn copy, the last consistent one is the best we have.
+        if offset in self._last_good:
+            return self._last_good[offset]
+        raise RuntimeError(f"Record at offset {offset} of '{self.name}' is stuck mid-write")
+
+    def write_eeg(self, beta_power, gamma_power, beta_channels, gamma_channels, sample_time, analysis_time):
+        channels = min(len(beta_channels), MAX_CHANNELS)
+        padding = [0.0] * (MAX_CHANNELS - channels)
+        self._write_record(EEG_RECORD_OFFSET, EEG_RECORD_FORMAT, beta_power, gamma_power, time.time(),
+                           sample_time, analysis_time, time.monotonic(), True, channels,
+                           *beta_channels[:channels], *padding, *gamma_channels[:channels], *padding)
+
+    def write_game(self, is_running):
+        self._write_record(GAME_RECORD_OFFSET, GAME_RECORD_FORMAT, time.time(), is_running)
+
+    def read(self):
+        record = self._read_record(EEG_RECORD_OFFSET, EEG_RECORD_FORMAT)
+        beta, gamma, _, sample_time, analysis_time, publish_time, is_eeg_running, channels = record[:8]
+        _, is_game_running = self._read_record(GAME_RECORD_OFFSET, GAME_RECORD_FORMAT)
+        return {
+            'beta_power': beta,
+            'gamma_power': gamma,
+            'beta_channels': list(record[8:8 + channels]),
+            'gamma_channels': list(record[8 + MAX_CHANNELS:8 + MAX_CHANNELS + channels]),
+            'sample_time': sample_time,
+            'analysis_time': analysis_time,
+            'publish_time': publish_time,
+            'is_game_running': is_game_running,
+            'is_eeg_running': is_eeg_running
+        }
+
+    def close(self, unlink=None):
+        #unlink defaults to whether this process created the block
+        if unlink is None:
+            unlink = self.created
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            _set_tracked(self.shm, True) #unlink() unregisters the block again
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class EEGDataBridge:
+    def __init__(self, data_file='eeg_data.json', transport=None, shm_name=None):
+        #transport is 'shm' or 'json', the EEG_TRANSPORT environment variable picks it when not given.
+        #shm_name (or EEG_SHM_NAME) swaps in another shared block, so benchmarks and tests stay off the live one
+        transport = transport or os.environ.get('EEG_TRANSPORT', 'shm')
+        shm_name = shm_name or os.environ.get('EEG_SHM_NAME', SHM_NAME)
+        self.data = {
+            'beta_power': 0,
+            'gamma_power': 0,
+            'beta_channels': [],
+            'gamma_channels': [],
+            'sample_time': 0.0,
+            'analysis_time': 0.0,
+            'publish_time': 0.0,
+            'is_game_running': False,
+            'is_eeg_running': False
+        }
+
+        self.transport = None
+        if transport == 'shm':
+            try:
+                self.transport = SharedMemoryTransport(shm_name)
+            except (OSError, ValueError) as e:
+                print(f"Shared memory unavailable ({e}), falling back to {data_file}")
+        if self.transport is None:
+            self.transport = JsonFileTransport(data_file)
+
+    def update_eeg_data(self, beta_power, gamma_power, beta_channels=None, gamma_channels=None, sample_time=0.0, analysis_time=0.0):
+        #beta_power/gamma_power are the combined values, the *_channels lists hold one value per electrode.
+        #sample_time/analysis_time are time.monotonic stamps of the newest sample and of the analysis,
+        #they travel with the powers so the game can measure latency (0 means unknown)
+        beta_channels = [float(beta_power)] if beta_channels is None else [float(value) for value in beta_channels]
+        gamma_channels = [float(gamma_power)] if gamma_channels is None else [float(value) for value in gamma_channels]
+        try:
+            self.transport.write_eeg(float(beta_power), float(gamma_power), beta_channels, gamma_channels,
+                                     float(sample_time), float(analysis_time))
+            return True
+        except Exception as e:
+            print(f"Error updating EEG data: {e}")
+            return False
+
+    def read_eeg_data(self):
+        try:
+            self.data = self.transport.read()
+            return self.data
+        except Exception as e:
+            print(f"Error reading EEG data: {e}")
+            return self.data
+
+    def set_game_status(self, is_running):
+        try:
+            self.transport.write_game(is_running)
+            return True
+        except Exception as e:
+            print(f"Error updating game status: {e}")
+
+            return False
+
+    def close(self, unlink=None):
+        #The shared block is unlinked by the process that created it unless unlink says otherwise
+        self.transport.close(unlink)
@@ -0,0 +1,191 @@
+import io
+import os
+import time
+import argparse
+import numpy as np
+from scipy import signal
+
+from serial_ingest import CSV_HEADER, SYNC_WORD, LSB_UV
+
+#Synthetic EEG source for load testing without the board. It produces the same byte stream as
+#EEG_collection.ino ('raw,voltage,filtered' lines, one column per channel, or binary frames) at any rate
+#and channel count, and serves it on a pseudo-terminal so serial.Serial(PORT, ...) opens it unchanged:
+#    python synthetic_eeg.py --rate 2000 --channels 8
+#    EEG_PORT=/dev/pts/N EEG_SAMPLING_RATE=2000 EEG_CHANNELS=8 python modified_eeg_processing.py --headless
+
+#Paul Kellet's pinking filter, turns white noise into roughly 1/f noise
+PINK_B = [0.049922035, -0.095993537, 0.050612699, -0.004408786]
+PINK_A = [1, -2.494956002, 2.017265875, -0.522189400]
+
+BAND_FREQS = {'beta': 20.0, 'gamma': 38.0}
+
+class SyntheticEEG:
+    def __init__(self, sampling_rate=250, channels=1, beta_amplitude=25.0, gamma_amplitude=10.0, noise_amplitude=15.0,
+                 burst_rate=0.5, burst_duration=(0.3, 1.2), artifact_rate=0.05, line_noise=2.0, seed=None):
+        self.fs = sampling_rate
+        self.channels = channels
+        self.amplitudes = {'beta': beta_amplitude, 'gamma': gamma_amplitude}
+        self.noise_amplitude = noise_amplitude
+        self.burst_rate = burst_rate            #random bursts per second and band
+        self.burst_duration = burst_duration    #seconds, drawn uniformly
+        self.artifact_rate = artifact_rate      #blinks per second
+        self.line_noise = line_noise            #60 Hz pickup left after the notch filters, in μV
+        self.rng = np.random.default_rng(seed)
+
+        self.sample = 0                         #index of the next sample
+        self.pink_state = np.zeros((channels, len(PINK_A) - 1))
+        self.phases = self.rng.uniform(0, 2 * np.pi, (2, channels))
+        self.bursts = {'beta': [], 'gamma': []} #(start, end) sample ranges
+        self.artifacts = []                     #(center, width, amplitude) in samples / μV
+
+    def trigger(self, band, duration, delay=0.0):
+        #Scripted burst, e.g. trigger('beta', 2.0) to hold the player's movement for two seconds
+        start = self.sample + int(delay * self.fs)
+        self.bursts[band].append((start, start + int(duration * self.fs)))
+
+    def _schedule_random(self, n):
+        seconds = n / self.fs
+        for band in self.bursts:
+            for _ in range(self.rng.poisson(self.burst_rate * seconds)):
+                start = self.sample + int(self.rng.integers(0, n))
+                length = int(self.rng.uniform(*self.burst_duration) * self.fs)
+                self.bursts[band].append((start, start + length))
+        for _ in range(self.rng.poisson(self.artifact_rate * seconds)):
+            center = self.sample + int(self.rng.integers(0, n))
+            self.artifacts.append((center, 0.08 * self.fs, self.rng.uniform(100, 250)))
+
+    def _envelope(self, ranges, index):
+        envelope = np.zeros(len(index))
+        for start, end in ranges:
+            inside = (index >= start) & (index < end)
+            if inside.any():
+                #Hann shaped burst so it ramps in and out instead of switching on a sample
+                envelope[inside] = np.maximum(envelope[inside], np.sin(np.pi * (index[inside] - start) / (end - start)) ** 2)
+        return envelope
+
+    def generate(self, n):
+        #Next n samples as (n, channels) in μV
+        self._schedule_random(n)
+        index = np.arange(self.sample, self.sample + n)
+        t = index / self.fs
+
+        white = self.rng.standard_normal((self.channels, n))
+        pink, self.pink_state = signal.lfilter(PINK_B, PINK_A, white, axis=-1, zi=self.pink_state)
+        data = pink * self.noise_amplitude * 4
+
+        for row, band in enumerate(('beta', 'gamma')):
+            envelope = self._envelope(self.bursts[band], index)
+            if envelope.any():
+                wave = np.sin(2 * np.pi * BAND_FREQS[band] * t[None, :] + self.phases[row][:, None])
+                data += self.amplitudes[band] * envelope[None, :] * wave
+
+        for center, width, amplitude in self.artifacts:
+            #Eye blinks show up on every frontal channel as one slow bump
+            data += amplitude * np.exp(-0.5 * ((index - center) / width) ** 2)[None, :]
+
+        if self.line_noise:
+            data += self.line_noise * np.sin(2 * np.pi * 60 * t)[None, :]
+
+        self.sample += n
+        self.bursts = {band: [r for r in ranges if r[1] > self.sample] for band, ranges in self.bursts.items()}
+        self.artifacts = [a for a in self.artifacts if a[0] + 5 * a[1] > self.sample]
+        return data.T
+
+def encode_csv(samples):
+    #'raw,voltage,filtered' for one channel like the Arduino prints, one column per channel otherwise
+    out = io.BytesIO()
+    if samples.shape[1] == 1:
+        raw = np.round(samples[:, 0] / LSB_UV)
+        np.savetxt(out, np.column_stack((raw, raw * LSB_UV, samples[:, 0])), fmt=['%d', '%.2f', '%.2f'], delimiter=',', newline='\r\n')
+    else:
+        np.savetxt(out, samples, fmt='%.2f', delimiter=',', newline='\r\n')
+    return out.getvalue()
+
+def csv_header(channels):
+    if channels == 1:
+        return CSV_HEADER + b'\r\n'
+    return ','.join(f'ch{i + 1}' for i in range(channels)).encode() + b'\r\n'
+
+class BinaryEncoder:
+    def __init__(self, channels):
+        self.frame = np.dtype([('sync', '<u2'), ('counter', '<u2'), ('samples', '<i2', (channels,))])
+        self.counter = 0
+
+    def encode(self, samples):
+        frames = np.empty(len(samples), dtype=self.frame)
+        frames['sync'] = SYNC_WORD
+        frames['counter'] = (self.counter + np.arange(len(samples))) % 65536
+        frames['samples'] = np.clip(np.round(samples / LSB_UV), -32768, 32767)
+        self.counter = (self.counter + len(samples)) % 65536
+        return frames.tobytes()
+
+def open_pseudo_serial():
+    #A pty pair: we write to the master end, the slave end behaves like a serial device for pyserial
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, os.ttyname(slave), slave
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic EEG stream on a pseudo serial port')
+    parser.add_argument('--rate', type=int, default=250, help='samples per second per channel')
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--format', choices=['csv', 'binary'], default='csv')
+    parser.add_argument('--beta', type=float, default=25.0, help='beta burst amplitude (μV)')
+    parser.add_argument('--gamma', type=float, default=10.0, help='gamma burst amplitude (μV)')
+    parser.add_argument('--noise', type=float, default=15.0, help='1/f background level (μV)')
+    parser.add_argument('--bursts', type=float, default=0.5, help='random bursts per second and band')
+    parser.add_argument('--artifacts', type=float, default=0.05, help='blink artifacts per second')
+    parser.add_argument('--port', help='write to this serial port (one end of a null-modem pair) instead of a pty')
+    parser.add_argument('--duration', type=float, default=0, help='seconds to run, 0 runs until interrupted')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    generator = SyntheticEEG(args.rate, args.channels, args.beta, args.gamma, args.noise,
+                             burst_rate=args.bursts, artifact_rate=args.artifacts, seed=args.seed)
+    encoder = BinaryEncoder(args.channels) if args.format == 'binary' else None
+
+    if args.port:
+        import serial
+        port = serial.Serial(args.port, 115200)
+        write = port.write
+        print(f"Writing synthetic EEG to {args.port}")
+    elif os.name == 'posix':
+        master, slave_name, _ = open_pseudo_serial()
+        write = lambda data: os.write(master, data)
+        print(f"Pseudo serial port: {slave_name}")
+        print(f"Run with EEG_PORT={slave_name} EEG_SAMPLING_RATE={args.rate} EEG_CHANNELS={args.channels} "
+              f"EEG_SERIAL_FORMAT={args.format}")
+    else:
+        print("No pty on this platform, pass --port with one end of a virtual null-modem pair (e.g. com0com)")
+        return
+
+    if encoder is None:
+        write(csv_header(args.channels))
+
+    #Blocks are written on a fixed tick. A reader that can't keep up shows up as backlog (the writes block
+    #once the pty buffer fills), the same point where the real board would start losing samples.
+    tick = 0.005
+    start = time.monotonic()
+    sent = 0
+    last_report = start
+    try:
+        while True:
+            now = time.monotonic()
+            if args.duration and now - start >= args.duration:
+                break
+            due = int((now - start) * args.rate) - sent
+            if due > 0:
+                samples = generator.generate(due)
+                write(encoder.encode(samples) if encoder else encode_csv(samples))
+                sent += due
+            if now - last_report >= 5:
+                backlog = (time.monotonic() - start) * args.rate - sent
+                print(f"{sent / (now - start):.0f} samples/s per channel, backlog {backlog:.0f} samples")
+                last_report = now
+            time.sleep(tick)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import time
+import numpy as np
+
+from analysis_worker import AnalysisWorker
+from band_power import StreamingBandPower
+from ring_buffer import RingBuffer
+
+FS = 256
+BANDS = {'beta': (13, 30), 'gamma': (30, 45)}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class FakeStop:
+    #Stands in for the worker's stop event: waiting just moves the fake clock on, and it stops after `ticks` hops
+    def __init__(self, worker, clock, ticks):
+        self.worker = worker
+        self.clock = clock
+        self.ticks = ticks
+        self.waits = []
+
+    def is_set(self):
+        return self.worker.ticks >= self.ticks
+
+    def wait(self, delay):
+        self.waits.append(delay)
+        self.clock.now += delay
+
+class SlowEngine:
+    #Each process() call takes the next cost off the list in fake time
+    def __init__(self, clock, costs):
+        self.clock = clock
+        self.costs = list(costs)
+        self.ready = False
+
+    def process(self, samples):
+        self.clock.now += self.costs.pop(0)
+        return {'beta': np.zeros(1), 'gamma': np.zeros(1)}
+
+def run_worker(costs, hop=0.02):
+    clock = FakeClock()
+    worker = AnalysisWorker(RingBuffer(64), SlowEngine(clock, costs), hop=hop, clock=clock)
+    worker._stop_event = FakeStop(worker, clock, len(costs))
+    starts = []
+    real_analyse = worker.analyse_once
+    worker.analyse_once = lambda: starts.append(clock.now) or real_analyse()
+    worker.run()
+    return worker, starts
+
+def test_hops_are_paced_from_the_schedule():
+    #Analysis time is taken out of the wait, so ticks stay on the hop grid
+    worker, starts = run_worker([0.001, 0.015, 0.0, 0.019, 0.005])
+    np.testing.assert_allclose(np.diff(starts), 0.02)
+    assert worker.ticks == 5 and worker.overruns == 0
+
+def test_overrun_skips_missed_hops_instead_of_bursting():
+    worker, starts = run_worker([0.005, 0.07, 0.005, 0.005, 0.03, 0.005])
+    assert worker.overruns == 2
+    #After a slow hop the next one starts right away, then the grid restarts from there
+    np.testing.assert_allclose(np.diff(starts), [0.02, 0.07, 0.02, 0.02, 0.03])
+    assert min(worker._stop_event.waits) == 0
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def update_eeg_data(self, *args):
+        self.calls.append(args)
+
+    def record(self, *args):
+        self.calls.append(args)
+
+def test_snapshots_after_warm_up():
+    clock = FakeClock()
+    ring = RingBuffer(1024)
+    engine = StreamingBandPower(BANDS, FS, window_size=512)
+    bridge, latency = Recorder(), Recorder()
+    worker = AnalysisWorker(ring, engine, bridge, latency=latency, clock=clock)
+    snapshots = []
+    worker.subscribe(snapshots.append)
+
+    t = np.arange(600) / FS
+    ring.extend(np.sin(2 * np.pi * 20 * t[:100]) * 30, t[:100])
+    assert worker.analyse_once() is None  #under a quarter window
+    ring.extend(np.sin(2 * np.pi * 20 * t[100:]) * 30, t[100:])
+    snapshot = worker.analyse_once()
+    assert snapshot is worker.latest and snapshots == [snapshot]
+    assert snapshot['sample_count'] == 600 and snapshot['sample_time'] == t[-1]
+    assert snapshot['beta_power'] > snapshot['gamma_power'] > 0
+    assert bridge.calls[-1][4:] == (t[-1], clock.now)
+    assert latency.calls == [('analysis', t[-1], clock.now), ('publish', t[-1])]
+
+    #A hop with no new samples republishes but records no latency
+    worker.analyse_once()
+    assert len(bridge.calls) == 2 and len(latency.calls) == 2 and len(snapshots) == 2
+
+def test_stop_ends_the_thread():
+    worker = AnalysisWorker(RingBuffer(64), StreamingBandPower(BANDS, FS, window_size=64), hop=0.005)
+    worker.start()
+    time.sleep(0.05)
+    worker.stop()
+    worker.join(timeout=1)
+    assert not worker.is_alive() and worker.ticks > 0
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from band_power import StreamingBandPower, band_bins, compute_band_power, hann_window, rfft_freqs
+
+FS = 256
+N = 512
+BANDS = {'beta': (13, 30), 'gamma': (30, 45)}
+
+def reference_powers(window):
+    #Mean |X|^2 over the band bins of the periodic Hann windowed spectrum, straight from np.fft
+    hann = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N) / N)
+    spectrum = np.fft.rfft(window * hann, axis=-1)
+    return {name: np.mean(np.abs(spectrum[:, band_bins(N, FS, low, high)]) ** 2, axis=-1)
+            for name, (low, high) in BANDS.items()}
+
+def signal_for(channels, length, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(length) / FS
+    return rng.standard_normal((channels, length)) * 10 + 20 * np.sin(2 * np.pi * 20 * t) + 5 * np.sin(2 * np.pi * 38 * t)
+
+@pytest.mark.parametrize('block_sizes', [[1], [7], [64, 3, 200], [N + 100, 5]])
+def test_streaming_power_matches_fft(block_sizes):
+    channels = 3
+    data = signal_for(channels, 4000)
+    engine = StreamingBandPower(BANDS, FS, window_size=N, channels=channels)
+    pos = i = 0
+    while pos < data.shape[-1]:
+        m = block_sizes[i % len(block_sizes)]
+        powers = engine.process(data[:, pos:pos + m])
+        pos += m
+        i += 1
+    expected = reference_powers(data[:, -N:])
+    for name in BANDS:
+        np.testing.assert_allclose(powers[name], expected[name], rtol=1e-9)
+        np.testing.assert_allclose(engine.powers()[name], expected[name], rtol=1e-9)
+
+def test_plot_window_matches_engine():
+    #The spectrum plot windows with hann_window, its band powers have to agree with the bars from the engine
+    data = signal_for(2, N, seed=2)
+    engine = StreamingBandPower(BANDS, FS, window_size=N, channels=2)
+    powers = engine.process(data)
+    spectrum = np.fft.rfft(data * hann_window(N), axis=-1)
+    for name, (low, high) in BANDS.items():
+        np.testing.assert_allclose(compute_band_power(spectrum, rfft_freqs(N, FS), low, high), powers[name], rtol=1e-9)
+
+def test_recursive_update_stays_accurate_without_resync():
+    #The sliding DFT on its own, a long run should only pick up float noise
+    data = signal_for(1, 50_000, seed=1)
+    engine = StreamingBandPower(BANDS, FS, window_size=N, resync_interval=10 ** 9)
+    for pos in range(0, data.shape[-1], 10):
+        engine.process(data[:, pos:pos + 10])
+    expected = reference_powers(data[:, -N:])
+    for name in BANDS:
+        np.testing.assert_allclose(engine.band_power(name), expected[name], rtol=1e-6)
+
+def test_ready_after_quarter_window():
+    engine = StreamingBandPower(BANDS, FS, window_size=N)
+    engine.process(np.zeros(N // 4 - 1))
+    assert not engine.ready
+    engine.process(np.zeros(1))
+    assert engine.ready
+
+def test_single_channel_accepts_flat_blocks():
+    engine = StreamingBandPower(BANDS, FS, window_size=N)
+    powers = engine.process(signal_for(1, N)[0])
+    assert powers['beta'].shape == (1,)
+    assert engine.process(np.empty(0))['beta'].shape == (1,)
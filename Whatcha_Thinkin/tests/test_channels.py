@@ -0,0 +1,71 @@
+import os
+import types
+import numpy as np
+
+from band_power import StreamingBandPower
+from ring_buffer import RingBuffer
+from serial_ingest import CsvParser
+from shared_data import EEGDataBridge, MAX_CHANNELS
+from synthetic_eeg import encode_csv, csv_header
+from modified_game import Game
+
+FS = 256
+BANDS = {'beta': (13, 30), 'gamma': (30, 45)}
+
+def test_each_channel_keeps_its_own_bands():
+    #Beta only on channel 1, gamma only on channel 2, noise everywhere: serial text to per-channel powers
+    channels = 4
+    t = np.arange(4 * FS) / FS
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal((len(t), channels)) * 2
+    samples[:, 1] += 40 * np.sin(2 * np.pi * 20 * t)
+    samples[:, 2] += 40 * np.sin(2 * np.pi * 38 * t)
+    stream = csv_header(channels) + encode_csv(np.round(samples, 3))
+
+    parser = CsvParser(channels)
+    ring = RingBuffer(FS, channels)
+    engine = StreamingBandPower(BANDS, FS, window_size=512, channels=channels)
+    seen = 0
+    for i in range(0, len(stream), 333):
+        block = parser.feed(stream[i:i + 333])
+        ring.extend(block, np.zeros(len(block)))
+        new, _, seen = ring.since(seen)
+        powers = engine.process(new)
+    assert parser.errors == 0 and seen == len(t)
+
+    beta, gamma = powers['beta'], powers['gamma']
+    assert beta.shape == gamma.shape == (channels,)
+    assert np.argmax(beta) == 1 and beta[1] > 100 * np.delete(beta, 1).max()
+    assert np.argmax(gamma) == 2 and gamma[2] > 100 * np.delete(gamma, 2).max()
+
+def test_bridge_carries_per_channel_values(tmp_path):
+    bridge = EEGDataBridge(str(tmp_path / 'eeg_data.json'), transport='json')
+    bridge.update_eeg_data(2.5, 1.5, [1.0, 2.0, 4.5], [0.5, 1.5, 2.5])
+    data = bridge.read_eeg_data()
+    assert data['beta_channels'] == [1.0, 2.0, 4.5] and data['gamma_channels'] == [0.5, 1.5, 2.5]
+    #One electrode, or a caller that only knows the combined values
+    bridge.update_eeg_data(7.0, 3.0)
+    data = bridge.read_eeg_data()
+    assert data['beta_channels'] == [7.0] and data['gamma_channels'] == [3.0]
+
+def test_shared_block_keeps_at_most_max_channels():
+    bridge = EEGDataBridge(transport='shm', shm_name=f'whatcha_thinkin_test_channels_{os.getpid()}')
+    try:
+        values = [float(i) for i in range(MAX_CHANNELS + 4)]
+        bridge.update_eeg_data(1.0, 2.0, values, values)
+        data = bridge.read_eeg_data()
+        assert data['beta_channels'] == values[:MAX_CHANNELS] and data['gamma_channels'] == values[:MAX_CHANNELS]
+    finally:
+        bridge.close()
+
+def test_game_weights_channels():
+    game = types.SimpleNamespace(channel_weights=None)
+    combine = lambda channels, combined: Game.combine_channels(game, channels, combined)
+    assert combine([100.0, 300.0], 200.0) == 200.0
+    game.channel_weights = [0.0, 1.0, 3.0]
+    assert combine([100.0, 300.0, 500.0], 0.0) == (300.0 + 1500.0) / 4
+    #Fewer channels than weights uses the first ones, all-zero weights fall back to the processor's average
+    assert combine([100.0, 300.0], 0.0) == 300.0
+    game.channel_weights = [0.0, 0.0]
+    assert combine([100.0, 300.0], 200.0) == 200.0
+    assert combine([], 50.0) == 50.0
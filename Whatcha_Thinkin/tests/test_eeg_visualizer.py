@@ -0,0 +1,58 @@
+import numpy as np
+
+from eeg_visualizer import minmax_decimate, ThresholdScale
+
+def test_short_lines_are_left_alone():
+    y = np.arange(10.0)
+    x, out = minmax_decimate(y, 5)
+    assert out is y and list(x) == list(range(-9, 1))
+    x, out = minmax_decimate(y, 0)
+    assert out is y and len(x) == 10
+
+def test_decimated_line_keeps_every_spike():
+    rng = np.random.default_rng(0)
+    n, buckets = 1000, 64
+    y = rng.standard_normal(n)
+    #One spike per bucket, each at a different place inside its bucket
+    per_bucket = n // buckets
+    start = n - per_bucket * buckets
+    spikes = start + np.arange(buckets) * per_bucket + np.arange(buckets) % per_bucket
+    y[spikes] = 50.0 * np.where(np.arange(buckets) % 2, 1, -1)
+    x, out = minmax_decimate(y, buckets)
+    assert len(x) == len(out) == 2 * buckets
+    assert np.all(np.diff(x) >= 0) and x[0] >= -n + 1 and x[-1] <= 0
+    np.testing.assert_array_equal(np.sort(out[np.abs(out) == 50.0]), np.sort(y[spikes]))
+    #Each bucket's pair brackets exactly the samples it covers
+    blocks = y[start:].reshape(buckets, per_bucket)
+    np.testing.assert_array_equal(out[0::2], blocks.min(axis=1))
+    np.testing.assert_array_equal(out[1::2], blocks.max(axis=1))
+
+def test_remainder_is_dropped_from_the_oldest_end():
+    y = np.zeros(103)
+    y[0] = -99.0  #only in the remainder
+    y[-1] = 99.0  #newest sample, must stay
+    x, out = minmax_decimate(y, 10)
+    assert out.max() == 99.0 and out.min() == 0.0
+    assert x[-1] == -4  #middle of the newest bucket, which covers -9 to 0
+
+def test_scale_holds_inside_the_limits():
+    scale = ThresholdScale(-100, 100)
+    assert scale.update(-90, 95) is None
+    assert scale.update(-10, 10) is None  #already at the base, nothing to shrink to
+    assert (scale.low, scale.high) == (-100, 100)
+
+def test_scale_grows_with_headroom_then_holds():
+    scale = ThresholdScale(-100, 100, headroom=1.5)
+    assert scale.update(-50, 200) == (-100, 300)
+    #Anything that still fits causes no redraw
+    for high in (250, 150, 290, 101):
+        assert scale.update(-80, high) is None
+    assert scale.update(-400, 100) == (-600, 150)
+
+def test_scale_shrinks_back_but_not_below_the_base():
+    scale = ThresholdScale(0, 10, headroom=1.0, shrink=0.25)
+    assert scale.update(0, 1000) == (0, 1000)
+    assert scale.update(0, 300) is None  #over a quarter of the span
+    assert scale.update(0, 200) == (0, 200)
+    assert scale.update(0, 1) == (0, 10)
+    assert scale.update(0, 0.5) is None
@@ -0,0 +1,60 @@
+import json
+import numpy as np
+import pytest
+
+from latency import LatencyTracker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 10.0
+
+    def __call__(self):
+        return self.now
+
+def test_percentiles_in_milliseconds():
+    clock = FakeClock()
+    tracker = LatencyTracker(clock=clock)
+    #1 to 100 ms from the sample time, out of order
+    for ms in np.random.default_rng(0).permutation(np.arange(1, 101)):
+        tracker.record('read', clock.now - ms / 1000)
+    p = tracker.percentiles('read')
+    assert p['count'] == 100
+    assert p['p50'] == pytest.approx(50.5)
+    assert p['p95'] == pytest.approx(95.05)
+    assert p['p99'] == pytest.approx(99.01)
+    assert p['max'] == pytest.approx(100.0)
+    assert tracker.percentiles('applied') is None
+
+def test_explicit_end_stamp():
+    tracker = LatencyTracker(clock=FakeClock())
+    tracker.record('analysis', 1.000, 1.004)
+    assert tracker.percentiles('analysis')['p50'] == pytest.approx(4.0)
+
+def test_only_the_newest_window_counts():
+    tracker = LatencyTracker(window=10, clock=FakeClock())
+    for _ in range(50):
+        tracker.record('publish', 0.0, 1.0)  #a slow start
+    for _ in range(10):
+        tracker.record('publish', 0.0, 0.002)
+    p = tracker.percentiles('publish')
+    assert p['count'] == 10 and p['max'] == pytest.approx(2.0)
+
+def test_summary_keeps_pipeline_order():
+    tracker = LatencyTracker(clock=FakeClock())
+    for stage in ('custom', 'applied', 'arrival', 'read'):
+        tracker.record(stage, 0.0, 0.01)
+    assert list(tracker.summary()) == ['arrival', 'read', 'applied', 'custom']
+    assert [line.split()[0] for line in tracker.lines()] == ['arrival', 'read', 'applied', 'custom']
+
+def test_stats_file_is_written_on_the_report_interval(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / 'latency.json'
+    tracker = LatencyTracker(stats_file=str(path), report_every=5.0, clock=clock)
+    tracker.record('arrival', 0.0, 0.003)
+    tracker.maybe_write()
+    assert not path.exists()
+    clock.now += 5.0
+    tracker.maybe_write()
+    stats = json.loads(path.read_text())
+    assert stats['unit'] == 'ms' and stats['stages']['arrival']['p50'] == pytest.approx(3.0)
+    assert not (tmp_path / 'latency.json.tmp').exists()
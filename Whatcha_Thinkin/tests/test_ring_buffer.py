@@ -0,0 +1,78 @@
+import sys
+import threading
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+def test_wraparound_keeps_newest_in_order():
+    ring = RingBuffer(8, channels=2)
+    written = 0
+    for n in (3, 5, 6, 1, 7, 4):
+        values = np.arange(written, written + n, dtype=float)
+        ring.extend(np.column_stack((values, -values)), values)
+        written += n
+        samples, timestamps = ring.latest()
+        expected = np.arange(max(0, written - 8), written, dtype=float)
+        np.testing.assert_array_equal(timestamps, expected)
+        np.testing.assert_array_equal(samples, [expected, -expected])
+    assert len(ring) == 8
+
+def test_block_longer_than_capacity():
+    ring = RingBuffer(4)
+    ring.extend(np.arange(10.0), np.arange(10.0))
+    np.testing.assert_array_equal(ring.latest()[1], [6, 7, 8, 9])
+    assert ring.count == 10
+
+def test_since_returns_only_new_samples():
+    ring = RingBuffer(8)
+    ring.extend(np.arange(5.0), np.arange(5.0))
+    _, timestamps, seen = ring.since(0)
+    np.testing.assert_array_equal(timestamps, np.arange(5))
+    ring.extend(np.arange(5.0, 12.0), np.arange(5.0, 12.0))
+    _, timestamps, seen = ring.since(seen)
+    np.testing.assert_array_equal(timestamps, np.arange(5, 12))
+    #A consumer more than a lap behind gets the last capacity samples
+    ring.extend(np.arange(12.0, 40.0), np.arange(12.0, 40.0))
+    _, timestamps, seen = ring.since(seen)
+    np.testing.assert_array_equal(timestamps, np.arange(32, 40))
+    assert seen == 40
+
+def test_latest_survives_next_write():
+    #Once full, the next extend reuses the oldest slots, what latest() handed out must not change with it
+    ring = RingBuffer(4)
+    ring.extend(np.arange(4.0), np.arange(4.0))
+    timestamps = ring.latest()[1]
+    ring.extend([4.0], [4.0])
+    np.testing.assert_array_equal(timestamps, [0, 1, 2, 3])
+
+def test_reader_never_sees_a_torn_window():
+    #Producer on its own thread lapping a small buffer, every window the reader gets must be one consecutive run
+    ring = RingBuffer(64, channels=2)
+    done = threading.Event()
+
+    def produce():
+        written = 0
+        while not done.is_set():
+            values = np.arange(written, written + 7, dtype=float)
+            ring.extend(np.column_stack((values, -values)), values)
+            written += 7
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        seen = 0
+        for _ in range(5000):
+            samples, timestamps = ring.latest(48)
+            np.testing.assert_array_equal(np.diff(timestamps), 1)
+            np.testing.assert_array_equal(samples, [timestamps, -timestamps])
+            samples, timestamps, count = ring.since(seen)
+            if len(timestamps):
+                np.testing.assert_array_equal(timestamps, np.arange(count - len(timestamps), count))
+                np.testing.assert_array_equal(samples[1], -timestamps)
+            seen = count
+    finally:
+        done.set()
+        producer.join()
+        sys.setswitchinterval(interval)
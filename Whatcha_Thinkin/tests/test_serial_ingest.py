@@ -0,0 +1,55 @@
+import numpy as np
+
+from serial_ingest import CsvParser, BinaryParser, LSB_UV
+from synthetic_eeg import encode_csv, csv_header, BinaryEncoder
+
+def feed_all(parser, stream, size):
+    blocks = [parser.feed(stream[i:i + size]) for i in range(0, len(stream), size)]
+    return np.concatenate(blocks)
+
+def test_csv_split_anywhere():
+    samples = np.round(np.random.default_rng(0).uniform(-100, 100, (200, 4)), 2)
+    stream = csv_header(4) + encode_csv(samples)
+    for size in (1, 7, 64, len(stream)):
+        parser = CsvParser(4)
+        np.testing.assert_allclose(feed_all(parser, stream, size), samples)
+        assert parser.errors == 0
+
+def test_csv_single_channel_keeps_filtered_column():
+    samples = np.round(np.random.default_rng(1).uniform(-100, 100, (50, 1)), 2)
+    parser = CsvParser(1)
+    np.testing.assert_allclose(parser.feed(csv_header(1) + encode_csv(samples)), samples)
+
+def test_csv_misaligned_block_drops_bad_lines():
+    #A short and a long line have the right total value count, they must not shift the columns
+    parser = CsvParser(1)
+    values = parser.feed(b'1,2,3\r\n4,5\r\n6,7,8,9\r\n')
+    assert values.ravel().tolist() == [3.0]
+    assert parser.errors == 2
+
+def test_csv_corrupt_line_keeps_the_rest():
+    parser = CsvParser(2)
+    values = parser.feed(b'1,2\n3,x\n5,6\n')
+    assert values.tolist() == [[1.0, 2.0], [5.0, 6.0]]
+    assert parser.errors == 1
+
+def test_csv_reset_drops_partial_first_line():
+    #Opening the port halfway through the header or a sample line is not an error
+    parser = CsvParser(8)
+    parser.reset()
+    assert len(parser.feed(b'h5,ch6,')) == 0
+    values = parser.feed(b'ch7,ch8\r\n' + b','.join([b'1'] * 8) + b'\r\n')
+    assert values.shape == (1, 8)
+    assert parser.errors == 0
+
+def test_binary_resyncs_and_counts_drops():
+    samples = np.round(np.random.default_rng(2).uniform(-100, 100, (100, 2)) / LSB_UV) * LSB_UV
+    encoder = BinaryEncoder(2)
+    first = encoder.encode(samples[:40])
+    encoder.encode(samples[40:50])  #ten frames lost on the way
+    last = encoder.encode(samples[50:])
+    parser = BinaryParser(2)
+    values = feed_all(parser, b'\x00\x17' + first + b'\x42' + last, 5)
+    np.testing.assert_allclose(values, np.concatenate((samples[:40], samples[50:])))
+    assert parser.dropped == 10
+    assert parser.errors > 0
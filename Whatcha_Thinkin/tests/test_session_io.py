@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import pytest
+
+from session_io import SessionRecorder, SessionReader, ReplaySource
+
+FS = 256
+
+def record(path, channels=3, blocks=(7, 1, 40, 13, 0, 100, 2), chunk_size=64):
+    #Blocks the size a serial reader hands over, timestamps with a little jitter
+    rng = np.random.default_rng(1)
+    total = sum(blocks)
+    samples = rng.standard_normal((total, channels)) * 50
+    times = 1000.0 + np.arange(total) / FS + rng.uniform(0, 1e-4, total)
+    recorder = SessionRecorder(str(path), FS, channels, chunk_size=chunk_size, board='test')
+    pos = 0
+    for n in blocks:
+        recorder.write(samples[pos:pos + n], times[pos:pos + n])
+        pos += n
+    recorder.close()
+    assert recorder.samples_written == total
+    return samples, times
+
+def test_round_trip(tmp_path):
+    samples, times = record(tmp_path / 'session.wts')
+    reader = SessionReader(str(tmp_path / 'session.wts'))
+    assert (reader.sampling_rate, reader.channels, reader.header['board']) == (FS, 3, 'test')
+    chunks = list(reader.chunks())
+    assert len(chunks) > 1
+    np.testing.assert_array_equal(np.concatenate([c[1] for c in chunks]), times)
+    np.testing.assert_array_equal(np.concatenate([c[0] for c in chunks]), samples.astype(np.float32))
+
+def test_blocks_reslice_the_chunks(tmp_path):
+    samples, times = record(tmp_path / 'session.wts')
+    blocks = list(SessionReader(str(tmp_path / 'session.wts')).blocks(10))
+    assert all(0 < len(t) <= 10 for _, t in blocks)
+    np.testing.assert_array_equal(np.concatenate([t for _, t in blocks]), times)
+
+def test_cut_off_recording_keeps_whole_chunks(tmp_path):
+    path = tmp_path / 'session.wts'
+    samples, times = record(path, chunk_size=32)
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size - 20)
+    kept = np.concatenate([t for _, t in SessionReader(str(path)).chunks()])
+    assert 0 < len(kept) < len(times)
+    np.testing.assert_array_equal(kept, times[:len(kept)])
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / 'eeg_data.json'
+    path.write_text('{"beta_power": 0.0}')
+    with pytest.raises(ValueError):
+        SessionReader(str(path))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 50.0
+
+    def __call__(self):
+        return self.now
+
+class FakeStop:
+    #Waiting just moves the fake clock on
+    def __init__(self, clock):
+        self.clock = clock
+        self.waits = []
+        self.set = False
+
+    def is_set(self):
+        return self.set
+
+    def wait(self, delay):
+        self.waits.append(delay)
+        self.clock.now += delay
+        return self.set
+
+def test_replay_delivers_the_session_from_now(tmp_path):
+    samples, times = record(tmp_path / 'session.wts')
+    clock = FakeClock()
+    replay = ReplaySource(str(tmp_path / 'session.wts'), speed=0, block_size=10, clock=clock)
+    got = []
+    replay.run(lambda s, t: got.append((s, t)))
+    np.testing.assert_allclose(np.concatenate([s for s, _ in got]), samples, rtol=1e-6)
+    np.testing.assert_allclose(np.concatenate([t for _, t in got]), times - times[0] + clock.now)
+    assert replay.samples_played == len(times)
+
+def test_replay_paces_at_the_given_speed(tmp_path):
+    samples, times = record(tmp_path / 'session.wts')
+    clock = FakeClock()
+    stop = FakeStop(clock)
+    replay = ReplaySource(str(tmp_path / 'session.wts'), speed=2.0, block_size=10, clock=clock)
+    arrivals = []
+    replay.run(lambda s, t: arrivals.append((clock.now, t[-1])), stop=stop)
+    #Each block is handed over when its last sample is due, at twice real time
+    for now, last in arrivals:
+        assert now == pytest.approx(50.0 + (last - 50.0) / 2.0)
+    assert clock.now == pytest.approx(50.0 + (times[-1] - times[0]) / 2.0)
+
+def test_replay_loops_until_stopped(tmp_path):
+    samples, times = record(tmp_path / 'session.wts')
+    clock = FakeClock()
+    stop = FakeStop(clock)
+    replay = ReplaySource(str(tmp_path / 'session.wts'), speed=0, block_size=10, clock=clock)
+    def sink(s, t):
+        if replay.samples_played + len(t) >= 2.5 * len(times):
+            stop.set = True
+    replay.run(sink, loop=True, stop=stop)
+    assert 2 * len(times) < replay.samples_played < 3 * len(times)
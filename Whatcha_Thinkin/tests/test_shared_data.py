@@ -0,0 +1,106 @@
+import os
+import struct
+import itertools
+import threading
+import pytest
+from multiprocessing import shared_memory
+
+from shared_data import EEGDataBridge, SharedMemoryTransport, EEG_RECORD_OFFSET, EEG_RECORD_FORMAT, SEQ_FORMAT
+
+names = itertools.count()
+
+@pytest.fixture
+def shm_name():
+    #A private block per test, removed again even when the test fails halfway
+    name = f'whatcha_thinkin_test_{os.getpid()}_{next(names)}'
+    yield name
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+def block_exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+def publish(bridge):
+    bridge.update_eeg_data(410.0, 95.5, [400.0, 420.0], [90.0, 101.0], sample_time=12.5, analysis_time=12.75)
+    bridge.set_game_status(True)
+
+def test_round_trip_through_shared_block(shm_name):
+    #Writer and reader each open the block like the processor and game do
+    writer = EEGDataBridge(transport='shm', shm_name=shm_name)
+    reader = EEGDataBridge(transport='shm', shm_name=shm_name)
+    assert writer.transport.created and not reader.transport.created
+    publish(writer)
+    data = reader.read_eeg_data()
+    assert data['beta_power'] == 410.0 and data['gamma_power'] == 95.5
+    assert data['beta_channels'] == [400.0, 420.0] and data['gamma_channels'] == [90.0, 101.0]
+    assert data['sample_time'] == 12.5 and data['analysis_time'] == 12.75
+    assert data['is_eeg_running'] and data['is_game_running']
+    reader.close()
+    writer.close()
+
+def test_creator_unlinks_on_close(shm_name):
+    owner = EEGDataBridge(transport='shm', shm_name=shm_name)
+    attached = EEGDataBridge(transport='shm', shm_name=shm_name)
+    attached.close()
+    assert block_exists(shm_name)
+    owner.close()
+    assert not block_exists(shm_name)
+
+def test_odd_counter_is_retried_until_the_write_lands(shm_name):
+    transport = SharedMemoryTransport(shm_name)
+    transport.write_eeg(1.0, 2.0, [1.0], [2.0], 0.0, 0.0)
+    #Freeze the record mid-write, then let the "writer" finish it a moment later
+    seq = struct.unpack_from(SEQ_FORMAT, transport.buf, EEG_RECORD_OFFSET)[0]
+    struct.pack_into(SEQ_FORMAT, transport.buf, EEG_RECORD_OFFSET, seq + 1)
+    struct.pack_into('<d', transport.buf, EEG_RECORD_OFFSET + 8, 7.0)
+
+    def finish():
+        struct.pack_into(SEQ_FORMAT, transport.buf, EEG_RECORD_OFFSET, seq + 2)
+    timer = threading.Timer(0.02, finish)
+    timer.start()
+    values = transport._read_record(EEG_RECORD_OFFSET, EEG_RECORD_FORMAT, retries=10 ** 9)
+    timer.join()
+    assert values[0] == 7.0
+    transport.close()
+
+def test_stuck_record_never_returns_a_torn_copy(shm_name):
+    transport = SharedMemoryTransport(shm_name)
+    transport.write_eeg(1.0, 2.0, [1.0], [2.0], 0.0, 0.0)
+    assert transport.read()['beta_power'] == 1.0
+    #Writer died between its two counter bumps with half a record written
+    seq = struct.unpack_from(SEQ_FORMAT, transport.buf, EEG_RECORD_OFFSET)[0]
+    struct.pack_into(SEQ_FORMAT, transport.buf, EEG_RECORD_OFFSET, seq + 1)
+    struct.pack_into('<d', transport.buf, EEG_RECORD_OFFSET + 8, 99.0)
+    assert transport.read()['beta_power'] == 1.0
+
+    #A fresh reader has no good copy to fall back on
+    fresh = SharedMemoryTransport(shm_name)
+    with pytest.raises(RuntimeError):
+        fresh.read()
+
+    #A restarted writer gets the counter back to even and readers recover
+    transport.write_eeg(3.0, 4.0, [3.0], [4.0], 0.0, 0.0)
+    assert struct.unpack_from(SEQ_FORMAT, transport.buf, EEG_RECORD_OFFSET)[0] % 2 == 0
+    assert fresh.read()['beta_power'] == 3.0
+    fresh.close()
+    transport.close()
+
+def test_json_and_shm_read_back_the_same(shm_name, tmp_path):
+    shm = EEGDataBridge(transport='shm', shm_name=shm_name)
+    json_bridge = EEGDataBridge(str(tmp_path / 'eeg_data.json'), transport='json')
+    results = []
+    for bridge in (shm, json_bridge):
+        publish(bridge)
+        data = dict(bridge.read_eeg_data())
+        assert data.pop('publish_time') > 0
+        results.append(data)
+        bridge.close()
+    assert results[0] == results[1]
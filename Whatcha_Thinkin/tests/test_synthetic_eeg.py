@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from band_power import hann_window, rfft_freqs, compute_band_power
+from serial_ingest import CsvParser, BinaryParser, LSB_UV
+from synthetic_eeg import SyntheticEEG, BinaryEncoder, encode_csv, csv_header
+
+FS = 250
+
+def quiet(channels=1, **kwargs):
+    #No random bursts or blinks, only what a test triggers on top of the background
+    options = dict(burst_rate=0, artifact_rate=0, line_noise=0, seed=3)
+    options.update(kwargs)
+    return SyntheticEEG(FS, channels, **options)
+
+def powers(samples):
+    #(beta, gamma) of the first channel over the whole block
+    x = samples[:, 0] - samples[:, 0].mean()
+    fft_result = np.fft.rfft(x * hann_window(len(x)))
+    freqs = rfft_freqs(len(x), FS)
+    return compute_band_power(fft_result, freqs, 13, 30), compute_band_power(fft_result, freqs, 30, 45)
+
+def test_blocks_continue_where_the_last_one_stopped():
+    whole = quiet(noise_amplitude=5.0).generate(1000)
+    split = quiet(noise_amplitude=5.0)
+    np.testing.assert_allclose(np.concatenate([split.generate(n) for n in (300, 1, 699)]), whole)
+    assert whole.shape == (1000, 1)
+
+def test_triggered_bursts_land_in_their_band():
+    generator = quiet(beta_amplitude=80.0, gamma_amplitude=80.0, noise_amplitude=2.0)
+    rest = generator.generate(FS)
+    generator.trigger('beta', 1.0)
+    beta = generator.generate(FS)
+    generator.trigger('gamma', 1.0)
+    gamma = generator.generate(FS)
+    rest_beta, rest_gamma = powers(rest)
+    beta_beta, beta_gamma = powers(beta)
+    gamma_beta, gamma_gamma = powers(gamma)
+    assert beta_beta > 50 * rest_beta and beta_beta > 10 * beta_gamma
+    assert gamma_gamma > 50 * rest_gamma and gamma_gamma > 10 * gamma_beta
+    #Bursts ramp in and out, they don't switch on at full amplitude
+    assert abs(beta[0, 0] - rest[-1, 0]) < 20
+
+def test_blink_is_shared_by_every_channel():
+    generator = quiet(channels=4, noise_amplitude=0.0)
+    generator.artifacts.append((FS // 2, 0.08 * FS, 200.0))
+    samples = generator.generate(FS)
+    np.testing.assert_allclose(samples[FS // 2], 200.0)
+    np.testing.assert_allclose(samples, samples[:, :1].repeat(4, axis=1))
+
+@pytest.mark.parametrize('channels', [1, 3])
+def test_csv_stream_parses_back(channels):
+    samples = quiet(channels, seed=7).generate(2 * FS)
+    stream = csv_header(channels) + encode_csv(samples)
+    parser = CsvParser(channels)
+    parsed = np.concatenate([parser.feed(stream[i:i + 97]) for i in range(0, len(stream), 97)])
+    assert parser.errors == 0
+    np.testing.assert_allclose(parsed, samples, atol=0.005 + 1e-9)
+
+@pytest.mark.parametrize('channels', [1, 3])
+def test_binary_stream_parses_back(channels):
+    generator = quiet(channels, beta_amplitude=80.0, seed=7)
+    generator.trigger('beta', 2.0)
+    encoder = BinaryEncoder(channels)
+    parser = BinaryParser(channels)
+    blocks = [generator.generate(n) for n in (100, 37, 363)]
+    parsed = np.concatenate([parser.feed(encoder.encode(block)) for block in blocks])
+    samples = np.concatenate(blocks)
+    assert (parser.errors, parser.dropped) == (0, 0)
+    np.testing.assert_allclose(parsed, samples, atol=LSB_UV / 2 + 1e-9)
+    #The band content survives the 16 bit quantisation
+    np.testing.assert_allclose(powers(parsed)[0], powers(samples)[0], rtol=0.02)
+
+def test_binary_counter_wraps_without_drops():
+    encoder = BinaryEncoder(1)
+    encoder.counter = 65530
+    parser = BinaryParser(1)
+    parser.feed(encoder.encode(np.zeros((10, 1))))
+    parser.feed(encoder.encode(np.zeros((10, 1))))
+    assert parser.dropped == 0 and encoder.counter == 14
@@ -0,0 +1,55 @@
+import numpy as np
+
+from timeline import SampleTimeline
+
+RATE = 250
+BLOCK = 10
+START = 100.0
+
+def feed(timeline, first_block, blocks, true_rate=RATE, delay=0.002, jitter=0.0, rng=None):
+    #Blocks first_block.. of BLOCK samples, each arriving `delay` (plus jitter) after its last sample was taken
+    for block in range(first_block, first_block + blocks):
+        last = (block + 1) * BLOCK - 1
+        extra = abs(rng.normal(0, jitter)) if rng is not None else 0.0
+        stamps = timeline.stamp(BLOCK, arrival=START + last / true_rate + delay + extra)
+    truth = START + np.arange(last - BLOCK + 1, last + 1) / true_rate
+    return stamps, truth
+
+def test_refit_follows_a_fast_crystal():
+    timeline = SampleTimeline(RATE)
+    stamps, truth = feed(timeline, 0, 400, true_rate=RATE * 1.01, jitter=0.003, rng=np.random.default_rng(0))
+    assert abs(timeline.rate - RATE * 1.01) < 0.5
+    assert np.max(np.abs(stamps - truth)) < 0.01
+    assert timeline.dropped == 0
+
+def test_rate_stays_near_nominal():
+    #A crystal way off is clamped to 5 percent instead of following noise
+    timeline = SampleTimeline(RATE)
+    feed(timeline, 0, 200, true_rate=RATE * 1.2)
+    assert timeline.rate <= RATE * 1.05 + 1e-9
+
+def test_counter_drops_move_the_index():
+    timeline = SampleTimeline(RATE)
+    first = timeline.stamp(10, arrival=1.0)
+    second = timeline.stamp(10, arrival=1.0 + 20 / RATE, dropped=10)
+    assert timeline.dropped == 10
+    assert abs((second[0] - first[-1]) * RATE - 11) < 1e-6
+
+def test_single_stall_is_not_a_drop():
+    timeline = SampleTimeline(RATE)
+    feed(timeline, 0, 20)
+    feed(timeline, 20, 1, delay=0.5)  #one block held up, then everything is on time again
+    feed(timeline, 21, 20)
+    assert timeline.dropped == 0
+
+def test_lost_samples_without_a_counter_are_estimated():
+    #50 samples never arrive: every later block trails the line by 0.2 s
+    timeline = SampleTimeline(RATE)
+    feed(timeline, 0, 20)
+    feed(timeline, 25, timeline.drop_confirm - 1)
+    stamps, truth = feed(timeline, 25 + timeline.drop_confirm - 1, 1)  #the block that confirms the gap
+    assert timeline.dropped == 50
+    assert len(stamps) == BLOCK
+    np.testing.assert_allclose(stamps, truth, atol=0.01)
+    stamps, truth = feed(timeline, 30, 20)
+    assert np.max(np.abs(stamps - truth)) < 0.01
@@ -0,0 +1,121 @@
+import time
+import numpy as np
+from collections import deque
+
+#Timestamps derived from a running sample counter instead of the moment Python dequeued each sample.
+#Sample i is placed at offset + i / rate. The line is refit against wall-clock arrival times every few
+#blocks to follow drift between the board's crystal and the host clock, and is pinned to the earliest
+#arrivals, since a block can show up late but never before its samples were taken.
+#All times come from time.monotonic so they can be compared across processes and stages.
+
+class SampleTimeline:
+    def __init__(self, sampling_rate, fit_window=64, refit_every=8, drop_threshold=0.1, drop_confirm=5, clock=time.monotonic):
+        self.nominal_rate = float(sampling_rate)
+        self.rate = float(sampling_rate)
+        self.offset = None
+        self.clock = clock
+
+        self.fit_window = fit_window
+        self.refit_every = refit_every
+        self.drop_threshold = drop_threshold   #seconds a block may trail the line before it counts as lost samples
+        self.drop_confirm = drop_confirm       #consecutive late blocks needed, a single stall then catch-up is not a drop
+
+        self.anchors = deque(maxlen=fit_window) #(index of the block's last sample, arrival time, samples received so far)
+        self.late_blocks = []
+        self.blocks = 0
+
+        self.sample_index = 0   #index the next sample gets, dropped samples included
+        self.received = 0
+        self.dropped = 0
+        self.lag = 0.0          #how far the newest block trailed the timeline, in seconds
+
+    def predict(self, index):
+        return self.offset + index / self.rate
+
+    def stamp(self, n, arrival=None, dropped=0):
+        #Timestamps for a block of n samples that just arrived. `dropped` is the number of samples
+        #a framing counter says went missing before this block, when the source has one.
+        arrival = self.clock() if arrival is None else arrival
+        if dropped:
+            self.sample_index += dropped
+            self.dropped += dropped
+
+        first = self.sample_index
+        self.sample_index += n
+        self.received += n
+        last = self.sample_index - 1
+
+        if self.offset is None:
+            self.offset = arrival - last / self.rate
+
+        self.lag = arrival - self.predict(last)
+        if self.lag < 0:
+            #Arrived earlier than the line allows, so the line sits too late
+            self.offset += self.lag
+            self.lag = 0.0
+        #A confirmed gap moves this block past the samples that never arrived
+        missing = self._check_dropped(last, arrival)
+        first += missing
+        last += missing
+
+        self.anchors.append((last, arrival, self.received))
+        self.blocks += 1
+        if self.blocks % self.refit_every == 0 and not self.late_blocks:
+            #Not while blocks are trailing the line, a fit across a gap would read it as a faster clock
+            self._refit()
+
+        return self.predict(np.arange(first, self.sample_index))
+
+    def _check_dropped(self, last, arrival):
+        #Returns how many samples were found missing before this block
+        if self.lag <= self.drop_threshold:
+            self.late_blocks.clear()
+            return 0
+        self.late_blocks.append(self.lag)
+        if len(self.late_blocks) < self.drop_confirm:
+            return 0
+
+        #Every recent block trails by about the same amount, so samples went missing on the way in
+        missing = int(round(min(self.late_blocks) * self.rate))
+        self.late_blocks.clear()
+        if missing <= 0:
+            return 0
+        self.dropped += missing
+        self.sample_index += missing
+        self.anchors.clear()
+        self.offset = arrival - (last + missing) / self.rate
+        self.lag = 0.0
+        return missing
+
+    def _refit(self):
+        if len(self.anchors) < 2:
+            return
+        index, arrival, _ = np.array(self.anchors).T
+        if index[-1] == index[0]:
+            return
+        slope = np.polyfit(index, arrival, 1)[0]
+        if slope <= 0:
+            return
+        #Stay within a few percent of the nominal rate so a short noisy window cannot run away
+        self.rate = float(np.clip(1.0 / slope, self.nominal_rate * 0.95, self.nominal_rate * 1.05))
+        self.offset = float(np.min(arrival - index / self.rate))
+
+    @property
+    def effective_rate(self):
+        #Samples actually received per second of wall-clock over the fit window
+        if len(self.anchors) < 2:
+            return 0.0
+        _, first_time, first_received = self.anchors[0]
+        _, last_time, last_received = self.anchors[-1]
+        if last_time <= first_time:
+            return 0.0
+        return (last_received - first_received) / (last_time - first_time)
+
+    def stats(self):
+        return {
+            'effective_rate': self.effective_rate,
+            'fitted_rate': self.rate,
+            'received': self.received,
+            'dropped': self.dropped,
+            'lag': self.lag,
+        }